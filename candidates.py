@@ -0,0 +1,219 @@
+"""
+Set-based candidate edits for a whole chunk.
+
+``Processor.process_new_fields_wbi`` decides per row and column whether a value from the
+NK ČR export is missing on Wikidata. The ``CandidateEngine`` does the same comparison for
+a whole chunk with pandas: multi-valued columns are exploded into (NK ČR ID, column,
+value) rows, left-joined with the exploded SPARQL snapshots and reduced to the values the
+snapshot does not have (an anti-join). The result is a superset of what the processors
+would add, so rows and columns without candidates can skip the processors.
+"""
+
+import logging
+import re
+from typing import Union, TYPE_CHECKING
+
+import numpy
+import pandas
+
+from cleaners import prepare_dates_from_descriptions
+from config import Config
+from sharding import get_target_qid
+
+if TYPE_CHECKING:
+    from context import PipelineContext
+
+log = logging.getLogger(__name__)
+
+# column: (attribute of the context with the snapshot, key of the values in the snapshot)
+SNAPSHOT_COLUMNS = {
+    '0247a-isni': ('non_deprecated_items', 'isni'),
+    '0247a-orcid': ('non_deprecated_items', 'orcid'),
+    '374a': ('non_deprecated_items_field_of_work_and_occupation', 'occup'),
+    '372a': ('non_deprecated_items_field_of_work_and_occupation', 'field'),
+    '377a': ('non_deprecated_items_languages', 'language'),
+    '370a': ('non_deprecated_items_places', 'birth'),
+    '370b': ('non_deprecated_items_places', 'death'),
+    '370f': ('non_deprecated_items_places', 'work'),
+}
+
+# date columns are candidates while the item has no date of the kind (keys of non_deprecated_items)
+DATE_COLUMNS = {
+    '046f': ['birth'],
+    '046g': ['death'],
+    '678a': ['birth', 'death'],
+}
+
+CANDIDATE_FIELDS = ['nkcr', 'qid', 'column', 'property', 'value']
+
+
+
+def explode_column(chunk: pandas.DataFrame, column: str, context: 'PipelineContext') -> pandas.DataFrame:
+    """
+    Explodes one column of a chunk into (nkcr, value) rows with the values prepared the same
+    way as ``cleaners.prepare_column_of_content`` does (without logging values not found);
+    places are looked up in ``context.get_place_index()``.
+
+    :param chunk: A chunk of NK ČR records (empty cells are empty strings).
+    :type chunk: pandas.DataFrame
+    :param column: One of the ``SNAPSHOT_COLUMNS``.
+    :type column: str
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :return: A DataFrame with columns nkcr and value.
+    :rtype: pandas.DataFrame
+    """
+    values = chunk[column].fillna('').astype(str)
+    values.index = chunk['_id']
+    if column == '0247a-isni':
+        values = values.str.replace(' ', '', regex=False)
+        values = values[values.str.fullmatch(r'\d{16}')]
+    elif column == '0247a-orcid':
+        values = values.str.replace(' ', '', regex=False)
+        values = values[values.str.fullmatch(r'(\d{4}-){3}\d{3}(\d|X)', flags=re.IGNORECASE)]
+    else:
+        values = values.str.strip()
+        values = values[values != '']
+        if column in ['374a', '372a']:
+            values = values.str.split('|').explode()
+            values = values.str.replace(r',$', '', regex=True).map(context.name_to_nkcr)
+        elif column == '377a':
+            values = values.str.split('$').explode().map(context.language_dict)
+        else:
+            pipe_separated = values.str.contains('|', regex=False) & ~values.str.contains('$', regex=False)
+            values = values.where(~pipe_separated, values.str.replace('|', '$', regex=False))
+            values = values.str.split('$').explode()
+            place_index = context.get_place_index()
+            values = values.map(lambda place: place_index.lookup(place)[1])
+    values = values.dropna()
+    return pandas.DataFrame({'nkcr': values.index.to_numpy(), 'value': values.to_numpy()})
+
+
+class CandidateEngine:
+    """
+    Computes candidate edits (QID, property, value) for whole chunks.
+
+    :ivar context: The loaded pipeline context.
+    :type context: PipelineContext
+    :ivar snapshot: Exploded snapshot values (nkcr, column, value), built on first use.
+    :type snapshot: Union[pandas.DataFrame, None]
+    :ivar missing_dates: NK ČR IDs of items missing a date of the column, for every date column.
+    :type missing_dates: dict[str, set[str]]
+    """
+
+    def __init__(self, context: 'PipelineContext'):
+        """
+        :param context: The loaded pipeline context.
+        :type context: PipelineContext
+        """
+        self.context = context
+        self.snapshot = None
+        self.missing_dates: dict[str, set[str]] = {}
+
+    def build_snapshot(self) -> pandas.DataFrame:
+        """
+        Explodes the SPARQL snapshots of the context into one (nkcr, column, value) table
+        and collects the items missing dates.
+
+        :return: The snapshot table.
+        :rtype: pandas.DataFrame
+        """
+        frames = []
+        for column, (attribute, key) in SNAPSHOT_COLUMNS.items():
+            items = getattr(self.context, attribute)
+            lists = pandas.Series({nkcr: entry[key] for nkcr, entry in items.items() if entry[key]}, dtype=object)
+            exploded = lists.explode()
+            frames.append(pandas.DataFrame({'nkcr': exploded.index.to_numpy(), 'column': column,
+                                            'value': exploded.to_numpy()}))
+        self.snapshot = pandas.concat(frames, ignore_index=True).drop_duplicates()
+        self.missing_dates = {column: {nkcr for nkcr, entry in self.context.non_deprecated_items.items()
+                                       if not all(entry[key] for key in keys)}
+                              for column, keys in DATE_COLUMNS.items()}
+        log.info('candidate snapshot built, size: ' + str(len(self.snapshot)))
+        return self.snapshot
+
+    def find_candidates(self, chunk: pandas.DataFrame, new_links: Union[set[str], None] = None) -> pandas.DataFrame:
+        """
+        Returns the values of the chunk that are missing in the snapshots.
+
+        Rows whose NK ČR ID is not on Wikidata yet only get candidates when they name an item
+        in 0247a-wikidata that the main loop will link (their snapshot is empty then).
+
+        :param chunk: A chunk of NK ČR records (empty cells are empty strings).
+        :type chunk: pandas.DataFrame
+        :param new_links: ``find_new_links`` of the chunk if the caller already has it.
+        :type new_links: Union[set[str], None]
+        :return: A DataFrame with columns nkcr, qid, column, property and value.
+        :rtype: pandas.DataFrame
+        """
+        if self.snapshot is None:
+            self.build_snapshot()
+
+        if new_links is None:
+            new_links = self.find_new_links(chunk)
+        targets = {row['_id']: get_target_qid(row, self.context)
+                   for row in chunk[['_id', '0247a-wikidata']].to_dict('records')}
+
+        frames = []
+        for column, (attribute, key) in SNAPSHOT_COLUMNS.items():
+            values = explode_column(chunk, column, self.context)
+            items = getattr(self.context, attribute)
+            eligible = values['nkcr'].isin(new_links) | values['nkcr'].isin(items.keys())
+            values = values[eligible].assign(column=column)
+            joined = values.merge(self.snapshot[self.snapshot['column'] == column], how='left',
+                                  on=['nkcr', 'column', 'value'], indicator=True)
+            missing = joined[(joined['_merge'] == 'left_only') | joined['nkcr'].isin(new_links)]
+            frames.append(missing[['nkcr', 'column', 'value']])
+
+        for column in DATE_COLUMNS:
+            values = chunk[['_id', column]].rename(columns={'_id': 'nkcr', column: 'value'})
+            values = values[values['value'].fillna('').astype(str).str.strip() != '']
+            eligible = values['nkcr'].isin(new_links) | values['nkcr'].isin(self.missing_dates[column])
+            if column == '678a':
+                # descriptions without a birth or death date give nothing to add
+                has_dates = [dates is not None for dates in prepare_dates_from_descriptions(values['value'])]
+                eligible = eligible & pandas.Series(has_dates, index=values.index, dtype=bool)
+            frames.append(values[eligible].assign(column=column)[['nkcr', 'column', 'value']])
+
+        candidates = pandas.concat(frames, ignore_index=True)
+        candidates['qid'] = candidates['nkcr'].map(targets)
+        candidates['property'] = candidates['column'].map(
+            lambda column: '|'.join(numpy.atleast_1d(Config.properties[column])))
+        return candidates[CANDIDATE_FIELDS]
+
+    def find_new_links(self, chunk: pandas.DataFrame) -> set[str]:
+        """
+        Returns NK ČR IDs of rows whose 0247a-wikidata item does not have the ID yet.
+
+        :param chunk: A chunk of NK ČR records (empty cells are empty strings).
+        :type chunk: pandas.DataFrame
+        :return: The NK ČR IDs.
+        :rtype: set[str]
+        """
+        new_links = set()
+        for nkcr, qid in zip(chunk['_id'], chunk['0247a-wikidata'].fillna('')):
+            if qid == '':
+                continue
+            target = get_target_qid({'_id': nkcr, '0247a-wikidata': qid}, self.context)
+            if target is not None and nkcr not in self.context.qid_to_nkcr.get(target, []):
+                new_links.add(nkcr)
+        return new_links
+
+    def columns_by_row(self, chunk: pandas.DataFrame) -> dict[str, set[str]]:
+        """
+        Returns the columns with candidate edits for every row that needs processing.
+
+        Rows missing in the result have nothing to add and can be skipped. Rows that link
+        a new item are always included, possibly with no columns.
+
+        :param chunk: A chunk of NK ČR records (empty cells are empty strings).
+        :type chunk: pandas.DataFrame
+        :return: A dictionary mapping NK ČR ID to the set of columns with candidates.
+        :rtype: dict[str, set[str]]
+        """
+        new_links = self.find_new_links(chunk)
+        columns: dict[str, set[str]] = {nkcr: set() for nkcr in new_links}
+        candidates = self.find_candidates(chunk, new_links)
+        for nkcr, column in zip(candidates['nkcr'], candidates['column']):
+            columns.setdefault(nkcr, set()).add(column)
+        return columns
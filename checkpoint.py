@@ -0,0 +1,128 @@
+"""
+Checkpoints for long pipeline runs.
+
+A checkpoint records how far the main loop got (the row position, counters and the
+offset of the edit journal) and optionally points to a pickled snapshot of the
+``PipelineContext``. A run started with ``--resume`` skips straight to the last
+committed position and, when a snapshot exists, also skips the Loader SPARQL stage.
+"""
+
+import dataclasses
+import json
+import logging
+import os
+import pickle
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Union
+
+from context import PipelineContext
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Checkpoint:
+    """
+    State of the main loop at the last committed position.
+
+    Attributes:
+        input_file: Input file of the run, a checkpoint is only resumed for the same input.
+        position: Number of rows of the main loop that were fully processed.
+        inserts: Number of items written so far.
+        journal_offset: Size of the edit journal (debug.csv, all segments) at the checkpoint.
+        not_found_occupations: Tally of occupations not found so far.
+        not_found_places: Tally of places not found so far.
+        context_snapshot: Path of the pickled PipelineContext, if one was saved.
+        finished: True once the run went through all rows.
+        saved_at: Time the checkpoint was written (ISO format).
+    """
+    input_file: str = ''
+    position: int = 0
+    inserts: int = 0
+    journal_offset: int = 0
+    not_found_occupations: dict = field(default_factory=dict)
+    not_found_places: dict = field(default_factory=dict)
+    context_snapshot: Union[str, None] = None
+    finished: bool = False
+    saved_at: str = ''
+
+
+def save_checkpoint(checkpoint: Checkpoint, file_name: str):
+    """
+    Atomically writes the checkpoint as JSON (write to a temporary file, then rename).
+
+    :param checkpoint: The checkpoint to save.
+    :type checkpoint: Checkpoint
+    :param file_name: Path of the checkpoint file.
+    :type file_name: str
+    :return: None
+    """
+    checkpoint.saved_at = datetime.now().isoformat()
+    tmp_file_name = file_name + '.tmp'
+    with open(tmp_file_name, 'w') as outfile:
+        json.dump(dataclasses.asdict(checkpoint), outfile, ensure_ascii=False)
+    os.replace(tmp_file_name, file_name)
+
+
+def load_checkpoint(file_name: str) -> Union[Checkpoint, None]:
+    """
+    Reads a checkpoint written by ``save_checkpoint``.
+
+    :param file_name: Path of the checkpoint file.
+    :type file_name: str
+    :return: The checkpoint, or None if the file does not exist.
+    :rtype: Union[Checkpoint, None]
+    """
+    if not os.path.isfile(file_name):
+        return None
+    with open(file_name) as infile:
+        return Checkpoint(**json.load(infile))
+
+
+def find_checkpoint(file_name: Union[str, None], input_file: str) -> Union[Checkpoint, None]:
+    """
+    Returns the checkpoint a ``--resume`` run continues from.
+
+    :param file_name: Path of the checkpoint file (None if checkpoints are disabled).
+    :type file_name: Union[str, None]
+    :param input_file: Input file of the current run.
+    :type input_file: str
+    :return: The checkpoint, or None if there is none for this input.
+    :rtype: Union[Checkpoint, None]
+    """
+    if file_name is None:
+        return None
+    checkpoint = load_checkpoint(file_name)
+    if checkpoint is None or checkpoint.input_file != input_file:
+        return None
+    return checkpoint
+
+
+def save_context_snapshot(context: PipelineContext, file_name: str):
+    """
+    Pickles the loaded lookup data of the context (without the CSV chunks).
+
+    :param context: The context returned by ``Loader.load()``.
+    :type context: PipelineContext
+    :param file_name: Path of the snapshot file.
+    :type file_name: str
+    :return: None
+    """
+    tmp_file_name = file_name + '.tmp'
+    with open(tmp_file_name, 'wb') as outfile:
+        pickle.dump(dataclasses.replace(context, chunks=None), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file_name, file_name)
+
+
+def load_context_snapshot(file_name: str) -> PipelineContext:
+    """
+    Loads a context saved by ``save_context_snapshot``.
+
+    :param file_name: Path of the snapshot file.
+    :type file_name: str
+    :return: The restored context without CSV chunks.
+    :rtype: PipelineContext
+    """
+    with open(file_name, 'rb') as infile:
+        return pickle.load(infile)
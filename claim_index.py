@@ -0,0 +1,214 @@
+"""
+Per-item index of claim values.
+
+Looking up the values of a property used to walk ``item.claims.get(prop)`` and rebuild
+the value list on every call (P31 and P691 in the main loop, P31 again in the processor,
+every processed property and P106 for every field of work). A ``ClaimIndex`` is attached
+to each loaded ``ItemEntity`` and builds the values of a property once, with sets of the
+deprecated and non-deprecated values for O(1) membership tests. Functions adding claims
+to an item invalidate the property, so the index follows the edits, and record the
+property as added, so the save decision and the edit summary do not rescan the claims.
+
+Dates are compared by ``time_value_key``, a hashable form of the whole time dict (equal keys
+mean equal dicts); ``summarize_time_values`` collects the keys and the highest precision of
+every property once, so a date is reconciled with set lookups.
+"""
+
+import weakref
+from typing import Any, Union
+
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.models import Claim
+from wikibaseintegrator.wbi_enums import WikibaseDatatype, WikibaseRank
+
+_indexes: 'weakref.WeakKeyDictionary[ItemEntity, ClaimIndex]' = weakref.WeakKeyDictionary()
+
+
+def normalize_claim_value(claim: Claim, property_of_item: str) -> Any:
+    """
+    Returns the value of a claim the way the pipeline compares it: the string of external IDs,
+    the QID of items and a copy of the datavalue dict of dates (with the property added).
+
+    :param claim: The claim.
+    :type claim: Claim
+    :param property_of_item: The property of the claim.
+    :type property_of_item: str
+    :return: The value, or None for claims without a value (somevalue, novalue).
+    :rtype: Any
+    """
+    datavalue = claim.mainsnak.datavalue
+    if not datavalue:
+        return None
+    value = datavalue['value']
+    if claim.mainsnak.datatype == WikibaseDatatype.TIME.value:
+        return dict(value, property=property_of_item)
+    if type(value) is dict:
+        return value['id'] if 'id' in value else value.get('literal')
+    return value
+
+
+def time_value_key(value: dict, property_of_item: Union[str, None] = None) -> tuple:
+    """
+    Returns a hashable key of a time value: its sorted (key, value) pairs, so all fields are compared
+    (time, timezone, before, after, precision, calendar model and property) like dict equality does.
+
+    :param value: A time dict (``cleaners.create_time_dict`` or a claim datavalue).
+    :type value: dict
+    :param property_of_item: The property, replaces the ``property`` key of the value if set.
+    :type property_of_item: Union[str, None]
+    :return: The key.
+    :rtype: tuple
+    """
+    if property_of_item is not None:
+        value = dict(value, property=property_of_item)
+    return tuple(sorted(value.items()))
+
+
+def summarize_time_values(values: list) -> dict[str, tuple[set, int]]:
+    """
+    Collects the keys and the highest precision of time values by property.
+
+    :param values: Values as returned by ``ClaimIndex.values`` (values that are not time dicts are skipped).
+    :type values: list
+    :return: The set of ``time_value_key`` keys and the highest precision of every property.
+    :rtype: dict[str, tuple[set, int]]
+    """
+    summary: dict[str, tuple[set, int]] = {}
+    for value in values:
+        if type(value) is not dict or 'time' not in value:
+            continue
+        property_of_item = value.get('property')
+        keys, highest_precision = summary.get(property_of_item, (set(), 0))
+        keys.add(time_value_key(value))
+        summary[property_of_item] = (keys, max(highest_precision, value.get('precision') or 0))
+    return summary
+
+
+class ClaimIndex:
+    """
+    Values of the claims of one item by property, built on first use of the property.
+
+    :ivar item: The indexed item.
+    :type item: ItemEntity
+    :ivar properties: Values of the indexed properties: a list of all values and sets of the
+        deprecated and non-deprecated (hashable) values.
+    :type properties: dict[str, tuple[list, set, set]]
+    :ivar added_properties: Properties new claims were added to since the item was loaded, in order.
+    :type added_properties: list[str]
+    """
+
+    def __init__(self, item: ItemEntity):
+        """
+        :param item: The indexed item.
+        :type item: ItemEntity
+        """
+        self.item = weakref.proxy(item)
+        self.properties: dict[str, tuple[list, set, set]] = {}
+        self.added_properties: list[str] = []
+
+    def _get(self, property_of_item: str) -> tuple[list, set, set]:
+        entry = self.properties.get(property_of_item)
+        if entry is None:
+            values = []
+            deprecated = set()
+            non_deprecated = set()
+            for claim in self.item.claims.get(property_of_item):
+                value = normalize_claim_value(claim, property_of_item)
+                if value is None:
+                    continue
+                values.append(value)
+                if type(value) is not dict:
+                    if claim.rank == WikibaseRank.DEPRECATED:
+                        deprecated.add(value)
+                    else:
+                        non_deprecated.add(value)
+            entry = (values, deprecated, non_deprecated)
+            self.properties[property_of_item] = entry
+        return entry
+
+    def values(self, property_of_item: str) -> list:
+        """
+        Returns the values of the property in the order of the claims (all ranks).
+
+        :param property_of_item: The property.
+        :type property_of_item: str
+        :return: A new list of the values.
+        :rtype: list
+        """
+        return list(self._get(property_of_item)[0])
+
+    def deprecated_values(self, property_of_item: str) -> set:
+        """
+        Returns the values of the deprecated claims of the property (dates are left out).
+
+        :param property_of_item: The property.
+        :type property_of_item: str
+        :return: The values; do not modify the set.
+        :rtype: set
+        """
+        return self._get(property_of_item)[1]
+
+    def non_deprecated_values(self, property_of_item: str) -> set:
+        """
+        Returns the values of the preferred and normal claims of the property (dates are left out).
+
+        :param property_of_item: The property.
+        :type property_of_item: str
+        :return: The values; do not modify the set.
+        :rtype: set
+        """
+        return self._get(property_of_item)[2]
+
+    def has_value(self, property_of_item: str, value: Any) -> bool:
+        """
+        Tells whether the item has a claim of the property with the value (any rank).
+
+        :param property_of_item: The property.
+        :type property_of_item: str
+        :param value: The value (a string or QID).
+        :type value: Any
+        :rtype: bool
+        """
+        _, deprecated, non_deprecated = self._get(property_of_item)
+        return value in non_deprecated or value in deprecated
+
+    def record_added(self, claim: Claim):
+        """
+        Records a claim passed to ``item.claims.add``. The property counts as changed only if the
+        claim was appended (an equal claim already on the item is updated in place instead).
+
+        :param claim: The added claim.
+        :type claim: Claim
+        :return: None
+        """
+        property_of_item = claim.mainsnak.property_number
+        self.invalidate(property_of_item)
+        if any(existing is claim for existing in self.item.claims.get(property_of_item)):
+            if property_of_item not in self.added_properties:
+                self.added_properties.append(property_of_item)
+
+    def invalidate(self, property_of_item: str):
+        """
+        Drops the values of the property, they are built again on next use (after the claims changed).
+
+        :param property_of_item: The property.
+        :type property_of_item: str
+        :return: None
+        """
+        self.properties.pop(property_of_item, None)
+
+
+def get_claim_index(item: ItemEntity) -> ClaimIndex:
+    """
+    Returns the claim index of the item, creating it on first use.
+
+    :param item: The loaded item.
+    :type item: ItemEntity
+    :return: The index, kept as long as the item exists.
+    :rtype: ClaimIndex
+    """
+    index = _indexes.get(item)
+    if index is None:
+        index = ClaimIndex(item)
+        _indexes[item] = index
+    return index
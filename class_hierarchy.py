@@ -0,0 +1,212 @@
+"""
+Local class hierarchy (P279 subclass of, P31 instance of).
+
+``is_item_subclass_of_wbi`` asks WDQS whether an item reaches a class through ``P279``
+(or ``P31`` followed by ``P279``). The ``ClassHierarchy`` answers the same question
+without network calls for any root class and at any depth: it keeps the P279 edges of
+all classes and the P31 edges of the items the pipeline checks in adjacency lists over
+numeric IDs and walks them breadth-first, caching the superclasses of every walked node.
+
+The edges are read from a snapshot (CSV rows ``item,property,value``, optionally
+gzip-compressed) or from a Wikidata JSON dump, and can be saved as a snapshot.
+"""
+
+import csv
+import gzip
+import logging
+from collections import deque
+from typing import Iterable, Union
+
+import rapidjson
+
+log = logging.getLogger(__name__)
+
+SUBCLASS_OF = 'P279'
+INSTANCE_OF = 'P31'
+# snapshot value of an item whose P31 edges were not loaded
+NOT_LOADED = '?'
+
+
+def _number(qid: str) -> Union[int, None]:
+    if type(qid) is str and qid.startswith('Q') and qid[1:].isdigit():
+        return int(qid[1:])
+    return None
+
+
+def _open_text(file_name: str, mode: str):
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, mode + 't', encoding='utf-8', newline='')
+    return open(file_name, mode, encoding='utf-8', newline='')
+
+
+class ClassHierarchy:
+    """
+    Subclass and instance edges over numeric item IDs with cached reachability.
+
+    :ivar superclasses: Direct superclasses (P279) by item.
+    :type superclasses: dict[int, list[int]]
+    :ivar classes: Direct classes (P31) by item.
+    :type classes: dict[int, list[int]]
+    :ivar partial: Items whose P31 edges were not loaded (``load_dump`` with ``instance_items``).
+    :type partial: set[int]
+    """
+
+    def __init__(self):
+        self.superclasses: dict[int, list[int]] = {}
+        self.classes: dict[int, list[int]] = {}
+        self.partial: set[int] = set()
+        self._ancestors: dict[int, frozenset[int]] = {}
+
+    def add_edge(self, item_qid: str, property_of_item: str, value_qid: str):
+        """
+        Adds a P279 or P31 edge; other properties and non-item values are ignored.
+
+        :param item_qid: The QID of the subject.
+        :type item_qid: str
+        :param property_of_item: P279 or P31.
+        :type property_of_item: str
+        :param value_qid: The QID of the class.
+        :type value_qid: str
+        :return: None
+        """
+        item = _number(item_qid)
+        value = _number(value_qid)
+        if item is None or value is None:
+            return
+        if property_of_item == SUBCLASS_OF:
+            self.superclasses.setdefault(item, []).append(value)
+        elif property_of_item == INSTANCE_OF:
+            self.classes.setdefault(item, []).append(value)
+        else:
+            return
+        self._ancestors = {}
+
+    def ancestors(self, number: int) -> frozenset[int]:
+        """
+        Returns all superclasses of a class (P279 at any depth), cached.
+
+        :param number: The numeric ID of the class.
+        :type number: int
+        :return: The numeric IDs of the superclasses, without the class itself unless it is in a cycle.
+        :rtype: frozenset[int]
+        """
+        ancestors = self._ancestors.get(number)
+        if ancestors is None:
+            found = set()
+            queue = deque(self.superclasses.get(number, ()))
+            while queue:
+                parent = queue.popleft()
+                if parent in found:
+                    continue
+                found.add(parent)
+                cached = self._ancestors.get(parent)
+                if cached is not None:
+                    found.update(cached)
+                    continue
+                queue.extend(self.superclasses.get(parent, ()))
+            ancestors = frozenset(found)
+            self._ancestors[number] = ancestors
+        return ancestors
+
+    def covers(self, item_qid: str) -> bool:
+        """
+        Tells whether the hierarchy knows the item (it has P279 or P31 edges and none of its edges were dropped).
+
+        :param item_qid: The QID of the item.
+        :type item_qid: str
+        :rtype: bool
+        """
+        item = _number(item_qid)
+        return (item is not None and item not in self.partial
+                and (item in self.superclasses or item in self.classes))
+
+    def is_subclass_of(self, item_qid: str, class_qid: str) -> Union[bool, None]:
+        """
+        Tells whether an item is a subclass of the class or an instance of one of its subclasses,
+        like ``is_item_subclass_of_wbi`` (``P279+`` or ``P31/P279+``).
+
+        :param item_qid: The QID of the item.
+        :type item_qid: str
+        :param class_qid: The QID of the class.
+        :type class_qid: str
+        :return: The result, or None if the hierarchy does not know the item.
+        :rtype: Union[bool, None]
+        """
+        if not self.covers(item_qid):
+            return None
+        item = _number(item_qid)
+        root = _number(class_qid)
+        if root in self.ancestors(item):
+            return True
+        return any(root in self.ancestors(cls) for cls in self.classes.get(item, ()))
+
+    def load(self, file_name: str):
+        """
+        Loads the edges of a snapshot written by ``save``.
+
+        :param file_name: CSV file (``.gz`` for compressed) with rows item,property,value.
+        :type file_name: str
+        :return: None
+        """
+        with _open_text(file_name, 'r') as snapshot:
+            for row in csv.reader(snapshot):
+                if len(row) != 3:
+                    continue
+                if row[1] == INSTANCE_OF and row[2] == NOT_LOADED:
+                    self.partial.add(_number(row[0]))
+                else:
+                    self.add_edge(row[0], row[1], row[2])
+        log.info('class hierarchy loaded, classes: ' + str(len(self.superclasses))
+                 + ', instances: ' + str(len(self.classes)))
+
+    def load_dump(self, file_name: str, instance_items: Union[Iterable[str], None] = None):
+        """
+        Loads the edges from a Wikidata JSON dump (one entity per line). P279 edges are kept for all
+        items, P31 edges only for ``instance_items`` (all items if not set). Items whose P31 edges
+        were dropped are not covered, so their checks fall back to the cache or a query.
+
+        :param file_name: The dump (``.gz`` for compressed).
+        :type file_name: str
+        :param instance_items: QIDs of the items whose P31 edges are kept.
+        :type instance_items: Union[Iterable[str], None]
+        :return: None
+        """
+        instance_numbers = None
+        if instance_items is not None:
+            instance_numbers = {_number(qid) for qid in instance_items}
+        with _open_text(file_name, 'r') as dump:
+            for line in dump:
+                line = line.strip().rstrip(',')
+                if not line.startswith('{'):
+                    continue
+                entity = rapidjson.loads(line)
+                claims = entity.get('claims', {})
+                properties = [SUBCLASS_OF]
+                if instance_numbers is None or _number(entity.get('id')) in instance_numbers:
+                    properties.append(INSTANCE_OF)
+                elif claims.get(INSTANCE_OF) and _number(entity.get('id')) is not None:
+                    self.partial.add(_number(entity['id']))
+                for property_of_item in properties:
+                    for claim in claims.get(property_of_item, []):
+                        datavalue = claim.get('mainsnak', {}).get('datavalue')
+                        if claim.get('rank') != 'deprecated' and datavalue:
+                            self.add_edge(entity['id'], property_of_item, datavalue['value'].get('id'))
+        log.info('class hierarchy loaded from dump, classes: ' + str(len(self.superclasses))
+                 + ', instances: ' + str(len(self.classes)))
+
+    def save(self, file_name: str):
+        """
+        Saves the edges as a snapshot readable by ``load``.
+
+        :param file_name: CSV file (``.gz`` for compressed).
+        :type file_name: str
+        :return: None
+        """
+        with _open_text(file_name, 'w') as snapshot:
+            writer = csv.writer(snapshot)
+            for property_of_item, edges in ((SUBCLASS_OF, self.superclasses), (INSTANCE_OF, self.classes)):
+                for item, values in edges.items():
+                    for value in values:
+                        writer.writerow(['Q' + str(item), property_of_item, 'Q' + str(value)])
+            for item in self.partial:
+                writer.writerow(['Q' + str(item), INSTANCE_OF, NOT_LOADED])
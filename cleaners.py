@@ -164,7 +164,6 @@ def prepare_places_from_nkcr(place_string: str, column, context: 'PipelineContex
              if none are found or the input is invalid.
     :rtype: list
     """
-    nkcr_to_qid = context.name_to_nkcr
     places: list = []
     if isinstance(place_string, str):
         if place_string.strip() == '':
@@ -173,31 +172,14 @@ def prepare_places_from_nkcr(place_string: str, column, context: 'PipelineContex
             splitted_places = place_string.strip().split('|')
         else:
             splitted_places = place_string.strip().split('$')
-        regex = r"(.*?),\W*(.*)"
-        subst = "\\1 (\\2)"
-        corrected_splitted_places: list = []
+        place_index = context.get_place_index()
         for place in splitted_places:
-            if (place.strip().find('(') != -1):
-                corrected_splitted_places.append(place)
+            corrected_place, qid = place_index.lookup(place)
+            if qid is not None:
+                places.append(qid)
             else:
-                result = re.sub(regex, subst, place.strip(), 0, re.MULTILINE)
-
-                if result:
-                    corrected_splitted_places.append(result)
-                else:
-                    corrected_splitted_places.append(place)
-
-        try:
-            places = []
-            for corrected_place in corrected_splitted_places:
-                if corrected_place in nkcr_to_qid:
-                    places.append(nkcr_to_qid[corrected_place])
-                else:
-                    context.log_not_found_place(corrected_place)
-                    log.warning('not found place: ' + corrected_place)
-        except KeyError as e:
-            context.log_not_found_place(corrected_place)
-            log.warning('not found place: ' + str(e))
+                context.log_not_found_place(corrected_place)
+                log.warning('not found place: ' + corrected_place)
     return places
 
 
@@ -287,6 +269,22 @@ def prepare_date_from_date_field(date: Any, column) -> Union[None, dict]:
             return create_time_dict(prop, str_time, WikibaseTimePrecision.YEAR.value)
     return None
 
+DESCRIPTION_DATE_PATTERN = re.compile(
+    r'\b(?:(?P<birth>narozen|narozena)|(?P<death>zemřel|zemřela))\s+'
+    r'(?:roku\s+(?P<year_only>\d{4})|(?P<day>\d{1,2})\.\s*(?P<month>\d{1,2})\.\s*(?P<year>\d{4}))\b',
+    re.IGNORECASE)
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _is_valid_date(year: int, month: int, day: int) -> bool:
+    if month < 1 or month > 12 or day < 1:
+        return False
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return day <= 29
+    return day <= _DAYS_IN_MONTH[month - 1]
+
+
 def prepare_date_from_description(description: str, column) -> Union[list[dict], None]:
     """
     Extracts and processes date information from a given textual description. Identifies dates or years related to
@@ -294,6 +292,9 @@ def prepare_date_from_description(description: str, column) -> Union[list[dict],
     of dictionaries. The extracted date information is formatted according to the Wikibase Time format and includes
     corresponding properties for birth (`P569`) or death (`P570`). If no dates are found, the function returns None.
 
+    All patterns are found in one pass of ``DESCRIPTION_DATE_PATTERN``; the dates are returned in the order
+    birth dates, birth years, death dates, death years.
+
     :param description: The text containing potential date-related data.
     :type description: str
     :param column: Unused parameter included in the function signature for compatibility purposes.
@@ -303,60 +304,41 @@ def prepare_date_from_description(description: str, column) -> Union[list[dict],
     if not isinstance(description, str):
         return None
 
-    dates = []
-
-    # Pattern 1: narozen/a DD.MM.YYYY
-    birth_date_matches = re.finditer(r'\b(narozen|narozena)\s+(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})\b', description,
-                                     re.IGNORECASE)
-    for match in birth_date_matches:
-        keyword, day, month, year = match.groups()
-        try:
-            date_obj = datetime(int(year), int(month), int(day))
-            if date_obj.year > 1600:
-                str_time = date_obj.strftime('+%Y-%m-%dT00:00:00Z')
-                dates.append(create_time_dict('P569', str_time, WikibaseTimePrecision.DAY.value))
-        except ValueError:
-            pass
-
-    # Pattern 2: narozen/a roku YYYY
-    birth_year_matches = re.finditer(r'\b(narozen|narozena)\s+roku\s+(\d{4})\b', description, re.IGNORECASE)
-    for match in birth_year_matches:
-        keyword, year = match.groups()
-        try:
-            year_int = int(year)
-            if 1600 < year_int <= datetime.now().year:
-                str_time = '+' + year + '-01-01T00:00:00Z'
-                dates.append(create_time_dict('P569', str_time, WikibaseTimePrecision.YEAR.value))
-        except ValueError:
-            pass
-
-    # Pattern 3: zemřel/a DD.MM.YYYY
-    death_date_matches = re.finditer(r'\b(zemřel|zemřela)\s+(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})\b', description,
-                                     re.IGNORECASE)
-    for match in death_date_matches:
-        keyword, day, month, year = match.groups()
-        try:
-            date_obj = datetime(int(year), int(month), int(day))
-            if date_obj.year > 1600:
-                str_time = date_obj.strftime('+%Y-%m-%dT00:00:00Z')
-                dates.append(create_time_dict('P570', str_time, WikibaseTimePrecision.DAY.value))
-        except ValueError:
-            pass
-
-    # Pattern 4: zemřel/a roku YYYY
-    death_year_matches = re.finditer(r'\b(zemřel|zemřela)\s+roku\s+(\d{4})\b', description, re.IGNORECASE)
-    for match in death_year_matches:
-        keyword, year = match.groups()
-        try:
-            year_int = int(year)
-            if 1600 < year_int <= datetime.now().year:
-                str_time = '+' + year + '-01-01T00:00:00Z'
-                dates.append(create_time_dict('P570', str_time, WikibaseTimePrecision.YEAR.value))
-        except ValueError:
-            pass
+    # birth dates, birth years, death dates, death years
+    groups: tuple[list, list, list, list] = ([], [], [], [])
+    current_year = None
+    for match in DESCRIPTION_DATE_PATTERN.finditer(description):
+        prop = 'P569' if match.group('birth') is not None else 'P570'
+        offset = 0 if prop == 'P569' else 2
+        year_only = match.group('year_only')
+        if year_only is not None:
+            if current_year is None:
+                current_year = datetime.now().year
+            if 1600 < int(year_only) <= current_year:
+                str_time = '+' + year_only + '-01-01T00:00:00Z'
+                groups[offset + 1].append(create_time_dict(prop, str_time, WikibaseTimePrecision.YEAR.value))
+        else:
+            year, month, day = int(match.group('year')), int(match.group('month')), int(match.group('day'))
+            if year > 1600 and _is_valid_date(year, month, day):
+                str_time = f'+{year:04d}-{month:02d}-{day:02d}T00:00:00Z'
+                groups[offset].append(create_time_dict(prop, str_time, WikibaseTimePrecision.DAY.value))
 
+    dates = groups[0] + groups[1] + groups[2] + groups[3]
     return dates if dates else None
 
+
+def prepare_dates_from_descriptions(descriptions) -> list[Union[list[dict], None]]:
+    """
+    Extracts the dates of many 678a descriptions (e.g. a chunk column), see ``prepare_date_from_description``.
+    The function is picklable and can be mapped over the parts of a column in a worker pool.
+
+    :param descriptions: An iterable of descriptions (non-strings give None).
+    :return: The extracted dates of every description, in order.
+    :rtype: list[Union[list[dict], None]]
+    """
+    return [prepare_date_from_description(description, '678a') for description in descriptions]
+
+
 def prepare_column_of_content(column: str, row, context: 'PipelineContext') -> Union[str, Union[str, list]]:
     """
     Prepare content for a specified column based on its corresponding preparation method.
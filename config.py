@@ -20,6 +20,7 @@ class Config:
         are not considered possible for NKCR.
     :ivar qid_blacklist: A list of QIDs blacklisted for specific operations.
     :ivar property_occupation: The property key used for defining an occupation (P106).
+    :ivar class_occupation: The class of occupations (Q12737077), its subclasses are loaded by the Loader.
     :ivar properties: A mapping of application-specific keys to their property IDs
         in the database. Keys denote application-specific identifiers, while the
         values point to database property keys.
@@ -104,6 +105,7 @@ class Config:
     ]
 
     property_occupation = 'P106'
+    class_occupation = 'Q12737077'
 
     # isni = P213
     # orcid = P496
@@ -10,6 +10,10 @@ from dataclasses import dataclass, field
 from typing import Union
 import pandas
 
+from class_hierarchy import ClassHierarchy
+from place_index import PlaceIndex
+from subclass_cache import SubclassCache
+
 
 @dataclass
 class PipelineContext:
@@ -30,10 +34,24 @@ class PipelineContext:
         non_deprecated_items_field_of_work_and_occupation: Items with field of work/occupation claims.
         non_deprecated_items_places: Items with place-related claims.
         non_deprecated_items_languages: Items with language claims.
+        deprecated_nkcr: Numeric IDs of the items an NK ČR ID is deprecated on (P691 with deprecated
+            rank), by NK ČR ID.
         not_found_occupations: Tracking dict for occupations not found during processing.
         not_found_places: Tracking dict for places not found during processing.
+        place_index: Raw NK ČR place strings mapped to their QIDs, built from name_to_nkcr on first use.
         subclass_cache: Cache for is_item_subclass_of_wbi SPARQL query results.
-        chunks: DataFrame containing NK ČR CSV data in chunks.
+        subclass_store: Persistent cache of the subclass results kept across runs; replaces
+            subclass_cache when set.
+        class_closures: Numeric IDs of all subclasses and instances of a class (e.g. occupation),
+            loaded once by the Loader, by the QID of the class.
+        class_closure_domains: Numeric IDs of the QIDs a closure was computed for (checked without
+            a query), by the QID of the class.
+        class_hierarchy: Local P279/P31 graph answering subclass checks for any class without
+            a query (loaded from a snapshot or dump), None if not loaded.
+        offline: Subclass checks are answered only from the closures, the hierarchy and the caches,
+            never by a query (planner ``--offline``).
+        chunks: DataFrame chunks with NK ČR records, read from the CSV export or
+            streamed from the MARC XML dump.
     """
 
     # Lookup dictionaries (read-only after initialization)
@@ -46,13 +64,24 @@ class PipelineContext:
     non_deprecated_items_field_of_work_and_occupation: dict = field(default_factory=dict)
     non_deprecated_items_places: dict = field(default_factory=dict)
     non_deprecated_items_languages: dict = field(default_factory=dict)
+    deprecated_nkcr: dict[str, set[int]] = field(default_factory=dict)
 
     # Tracking dictionaries (mutated during processing)
     not_found_occupations: dict = field(default_factory=dict)
     not_found_places: dict = field(default_factory=dict)
 
+    # Place lookup built from name_to_nkcr
+    place_index: Union[PlaceIndex, None] = None
+
     # Cache for subclass queries
     subclass_cache: dict = field(default_factory=dict)
+    subclass_store: Union[SubclassCache, None] = None
+
+    # Precomputed class hierarchies
+    class_closures: dict[str, set[int]] = field(default_factory=dict)
+    class_closure_domains: dict[str, set[int]] = field(default_factory=dict)
+    class_hierarchy: Union[ClassHierarchy, None] = None
+    offline: bool = False
 
     # CSV data
     chunks: Union[pandas.DataFrame, None] = None
@@ -65,8 +94,31 @@ class PipelineContext:
         """Record a place that was not found in the lookup dictionary."""
         self.not_found_places[place] = self.not_found_places.get(place, 0) + 1
 
+    def set_deprecated_nkcr(self, pairs) -> None:
+        """Index (NK ČR ID, QID) pairs of deprecated P691 claims."""
+        self.deprecated_nkcr = {}
+        for nkcr, qid in pairs:
+            if qid.startswith('Q') and qid[1:].isdigit():
+                self.deprecated_nkcr.setdefault(nkcr, set()).add(int(qid[1:]))
+
+    def is_nkcr_deprecated(self, nkcr: str, qid: str) -> bool:
+        """Check whether the NK ČR ID is deprecated on the item (according to the loaded snapshot)."""
+        items = self.deprecated_nkcr.get(nkcr)
+        if items is None or not qid.startswith('Q') or not qid[1:].isdigit():
+            return False
+        return int(qid[1:]) in items
+
+    def get_place_index(self) -> PlaceIndex:
+        """Return the place lookup, building it from name_to_nkcr on first use."""
+        if self.place_index is None:
+            self.place_index = PlaceIndex(self.name_to_nkcr)
+        return self.place_index
+
     def cache_subclass_result(self, subclass_qid: str, item_qid: str, is_subclass: bool) -> None:
         """Cache the result of a subclass check."""
+        if self.subclass_store is not None:
+            self.subclass_store.put(subclass_qid, item_qid, is_subclass)
+            return
         if subclass_qid not in self.subclass_cache:
             self.subclass_cache[subclass_qid] = {}
         self.subclass_cache[subclass_qid][item_qid] = is_subclass
@@ -76,9 +128,54 @@ class PipelineContext:
         Get cached subclass result.
 
         Returns:
-            True/False if cached, None if not in cache.
+            True/False if cached, None if not in cache (or expired in the persistent cache).
         """
+        if self.subclass_store is not None:
+            return self.subclass_store.get(subclass_qid, item_qid)
         try:
             return self.subclass_cache[subclass_qid][item_qid]
         except KeyError:
             return None
+
+    def set_subclass_store(self, subclass_store: SubclassCache) -> None:
+        """Load the persistent subclass cache and use it for the subclass results."""
+        subclass_store.load()
+        self.subclass_store = subclass_store
+
+    def set_class_closure(self, class_qid: str, members: set[int], domain: set[int]) -> None:
+        """Store the subclasses and instances of a class (numeric IDs) and the QIDs the closure covers."""
+        self.class_closures[class_qid] = members
+        self.class_closure_domains[class_qid] = domain
+
+    def get_class_closure_result(self, class_qid: str, item_qid: str) -> Union[bool, None]:
+        """
+        Look up whether an item is a subclass or instance of a class in the precomputed closure.
+
+        Returns:
+            True if the item is in the closure, False if the closure covers the item but does not
+            contain it, None if the closure is not loaded or does not cover the item.
+        """
+        closure = self.class_closures.get(class_qid)
+        if closure is None or not item_qid.startswith('Q') or not item_qid[1:].isdigit():
+            return None
+        number = int(item_qid[1:])
+        if number in closure:
+            return True
+        if number in self.class_closure_domains.get(class_qid, ()):
+            return False
+        return None
+
+    def set_class_hierarchy(self, class_hierarchy: ClassHierarchy) -> None:
+        """Use a loaded local class hierarchy for the subclass checks."""
+        self.class_hierarchy = class_hierarchy
+
+    def get_class_hierarchy_result(self, class_qid: str, item_qid: str) -> Union[bool, None]:
+        """
+        Look up whether an item is a subclass or instance of a class in the local class hierarchy.
+
+        Returns:
+            True/False if the hierarchy knows the item, None if it is not loaded or does not know the item.
+        """
+        if self.class_hierarchy is None:
+            return None
+        return self.class_hierarchy.is_subclass_of(item_qid, class_qid)
@@ -0,0 +1,153 @@
+"""
+Delta stage for the NK ČR export.
+
+The NK ČR dump changes only a small fraction of records between runs. This module keeps
+a compact on-disk index of a per-record content hash keyed on ``_id`` and filters the
+chunks of a new export down to the records that are new or changed since the index was
+last committed.
+"""
+
+import logging
+import sqlite3
+from typing import Iterator, Iterable
+
+import numpy
+import pandas
+
+log = logging.getLogger(__name__)
+
+
+def hash_rows(chunk: pandas.DataFrame) -> numpy.ndarray:
+    """
+    Computes a stable 64-bit content hash for every row of a chunk.
+
+    Empty cells are hashed as empty strings, so a record hashes the same whether it
+    was read from the CSV export or from the MARC XML dump.
+
+    :param chunk: A chunk of NK ČR records.
+    :type chunk: pandas.DataFrame
+    :return: Array of signed 64-bit hashes (signed so they fit into SQLite integers).
+    :rtype: numpy.ndarray
+    """
+    columns = sorted(chunk.columns)
+    hashes = pandas.util.hash_pandas_object(chunk[columns].fillna('').astype(str), index=False)
+    return hashes.to_numpy().view('int64')
+
+
+class DeltaIndex:
+    """
+    Persistent index of record content hashes used to skip unchanged records.
+
+    New hashes are only staged while chunks are filtered and written by ``commit()``,
+    so records from an interrupted run are offered again on the next one. Records that
+    failed (processing error or failed write) are dropped with ``discard()`` and keep
+    their old hash, so they are offered again as well.
+
+    :ivar file_name: Path of the SQLite file holding the index.
+    :type file_name: str
+    :ivar hashes: Hashes from the last committed run, indexed by ``_id``.
+    :type hashes: pandas.Series
+    :ivar staged: Pairs of ``_id`` and hash arrays waiting for ``commit()``.
+    :type staged: list
+    :ivar discarded: IDs of failed records whose staged hashes are not committed.
+    :type discarded: set[str]
+    :ivar emitted: Number of records passed to the main loop.
+    :type emitted: int
+    :ivar skipped: Number of unchanged records filtered out.
+    :type skipped: int
+    """
+    # shard workers write to the same file, wait for their locks instead of failing
+    connect_timeout: float = 60.0
+
+    def __init__(self, file_name: str):
+        """
+        Opens (or creates) the index file.
+
+        :param file_name: Path of the SQLite file holding the index.
+        :type file_name: str
+        """
+        self.file_name: str = file_name
+        self.hashes: pandas.Series = pandas.Series(dtype='int64')
+        self.staged: list = []
+        self.discarded: set[str] = set()
+        self.emitted: int = 0
+        self.skipped: int = 0
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS delta (id TEXT PRIMARY KEY, hash INTEGER NOT NULL) WITHOUT ROWID')
+
+    def load(self):
+        """
+        Loads hashes of the previous export into memory.
+
+        :return: None
+        """
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            rows = connection.execute('SELECT id, hash FROM delta').fetchall()
+        ids = [row[0] for row in rows]
+        self.hashes = pandas.Series([row[1] for row in rows], index=ids, dtype='int64')
+        log.info('delta index loaded, size: ' + str(len(self.hashes)))
+
+    def filter_chunk(self, chunk: pandas.DataFrame, full: bool = False) -> pandas.DataFrame:
+        """
+        Returns the rows of the chunk that are new or changed and stages their hashes.
+
+        :param chunk: A chunk of NK ČR records.
+        :type chunk: pandas.DataFrame
+        :param full: Emit every row (a forced full pass); hashes are still staged.
+        :type full: bool
+        :return: The filtered chunk.
+        :rtype: pandas.DataFrame
+        """
+        ids = chunk['_id'].astype(str).to_numpy()
+        hashes = hash_rows(chunk)
+        positions = self.hashes.index.get_indexer(ids)
+        known = positions != -1
+        changed = numpy.ones(len(ids), dtype=bool)
+        changed[known] = self.hashes.to_numpy()[positions[known]] != hashes[known]
+        self.staged.append((ids[changed], hashes[changed]))
+        if full:
+            self.emitted += len(chunk)
+            return chunk
+        self.emitted += int(changed.sum())
+        self.skipped += int(len(chunk) - changed.sum())
+        return chunk[changed]
+
+    def filter_chunks(self, chunks: Iterable[pandas.DataFrame], full: bool = False) -> Iterator[pandas.DataFrame]:
+        """
+        Wraps a chunk iterator so only new or changed records reach the main loop.
+
+        :param chunks: Chunks of NK ČR records (CSV or MARC XML reader).
+        :type chunks: Iterable[pandas.DataFrame]
+        :param full: Emit every row (a forced full pass); the index is still refreshed.
+        :type full: bool
+        :return: A generator of filtered chunks.
+        :rtype: Iterator[pandas.DataFrame]
+        """
+        for chunk in chunks:
+            yield self.filter_chunk(chunk, full)
+
+    def discard(self, nkcr_aut: str):
+        """
+        Drops the staged hash of a record that failed, so the next run offers it again.
+
+        :param nkcr_aut: The ``_id`` of the record.
+        :type nkcr_aut: str
+        :return: None
+        """
+        self.discarded.add(nkcr_aut)
+
+    def commit(self):
+        """
+        Writes the staged hashes (except the discarded ones) to the index file.
+
+        :return: None
+        """
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            for ids, hashes in self.staged:
+                connection.executemany('INSERT OR REPLACE INTO delta (id, hash) VALUES (?, ?)',
+                                       ((nkcr_aut, row_hash) for nkcr_aut, row_hash in zip(ids.tolist(), hashes.tolist())
+                                        if nkcr_aut not in self.discarded))
+        log.info('delta index committed, emitted: ' + str(self.emitted) + ', skipped: ' + str(self.skipped)
+                 + ', failed: ' + str(len(self.discarded)))
+        self.staged = []
+        self.discarded = set()
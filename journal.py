@@ -0,0 +1,274 @@
+"""
+Buffered edit journal (``debug.csv``).
+
+Every added claim and every failed write is recorded in the journal. Records are kept in
+memory and written in batches, by count or by time (a background timer flushes records
+that wait longer than the flush interval), to a file that stays open. The
+journal can be split into segments of a maximum size (``debug.csv``, ``debug.1.csv``,
+...) and gzip-compressed; each flush is written as its own gzip member, so the journal
+can still be truncated at any flushed offset when a run resumes from a checkpoint.
+Records carry the ID of the run and the NK ČR ID of the row they come from, so the
+journal serves as an audit log of the edits and can be replayed.
+"""
+
+import csv
+import gzip
+import io
+import logging
+import os
+import threading
+import time
+from typing import Union
+
+log = logging.getLogger(__name__)
+
+JOURNAL_FIELDS = ['item', 'prop', 'value', 'run', 'row']
+
+
+class EditJournal:
+    """
+    Append-only CSV journal with buffered writes, optional compression and segment rotation.
+
+    Offsets used by checkpoints count the bytes of all segments together.
+
+    :ivar file_name: Path of the first segment.
+    :type file_name: str
+    :ivar run_id: ID of the run added to every record.
+    :type run_id: str
+    :ivar flush_records: Number of buffered records that triggers a flush.
+    :type flush_records: int
+    :ivar flush_interval: Seconds after which buffered records are flushed by the timer.
+    :type flush_interval: float
+    :ivar compress: Write gzip-compressed segments.
+    :type compress: bool
+    :ivar segment_size: Size in bytes after which a new segment is started (None for one file).
+    :type segment_size: Union[int, None]
+    """
+
+    def __init__(self, file_name: str, run_id: str = '', flush_records: int = 1000, flush_interval: float = 5.0,
+                 compress: bool = False, segment_size: Union[int, None] = None):
+        """
+        :param file_name: Path of the journal, ``.gz`` is appended when compressed.
+        :type file_name: str
+        :param run_id: ID of the run added to every record.
+        :type run_id: str
+        :param flush_records: Number of buffered records that triggers a flush.
+        :type flush_records: int
+        :param flush_interval: Seconds after which buffered records are flushed by the timer.
+        :type flush_interval: float
+        :param compress: Write gzip-compressed segments.
+        :type compress: bool
+        :param segment_size: Size in bytes after which a new segment is started (None for one file).
+        :type segment_size: Union[int, None]
+        """
+        if compress and not file_name.endswith('.gz'):
+            file_name = file_name + '.gz'
+        self.file_name: str = file_name
+        self.run_id: str = run_id
+        self.flush_records: int = flush_records
+        self.flush_interval: float = flush_interval
+        self.compress: bool = compress
+        self.segment_size: Union[int, None] = segment_size
+        self.buffer: list[dict] = []
+        self.last_flush: float = time.monotonic()
+        self.lock = threading.RLock()
+        # a forked shard worker inherits the journal of the parent, only the owner writes it
+        self.owner_pid: int = os.getpid()
+        self.file = None
+        self.segment: int = 0
+        self.timer: Union[threading.Thread, None] = None
+        self.timer_pid: Union[int, None] = None
+        self.stopped = threading.Event()
+
+    def segment_file_name(self, segment: int) -> str:
+        """
+        Returns the path of a segment, e.g. ``debug.csv``, ``debug.1.csv``, ``debug.2.csv``.
+
+        :param segment: Index of the segment.
+        :type segment: int
+        :return: The path.
+        :rtype: str
+        """
+        if segment == 0:
+            return self.file_name
+        name = self.file_name[:-3] if self.compress else self.file_name
+        root, extension = os.path.splitext(name)
+        return root + '.' + str(segment) + extension + ('.gz' if self.compress else '')
+
+    def segment_file_names(self) -> list[str]:
+        """
+        Returns the paths of the existing segments in order.
+
+        :return: The paths.
+        :rtype: list[str]
+        """
+        file_names = []
+        segment = 0
+        while os.path.isfile(self.segment_file_name(segment)):
+            file_names.append(self.segment_file_name(segment))
+            segment += 1
+        return file_names
+
+    def write(self, fields: dict):
+        """
+        Adds a record; it is written when the buffer is full or the flush interval passed.
+
+        :param fields: The record (item, prop, value and optionally row).
+        :type fields: dict
+        :return: None
+        """
+        with self.lock:
+            self.buffer.append(dict(fields, run=self.run_id))
+            if len(self.buffer) >= self.flush_records or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+            elif self.timer_pid != os.getpid():
+                self._start_timer()
+
+    def _start_timer(self):
+        # threads do not survive a fork, a shard worker starts its own timer
+        self.stopped = threading.Event()
+        self.timer_pid = os.getpid()
+        self.timer = threading.Thread(target=self._run_timer, args=(self.stopped,), name='journal-flush', daemon=True)
+        self.timer.start()
+
+    def _run_timer(self, stopped: threading.Event):
+        while not stopped.wait(self.flush_interval / 2):
+            with self.lock:
+                if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+                    self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records.
+
+        :return: None
+        """
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if len(self.buffer) == 0 or os.getpid() != self.owner_pid:
+                return
+            text = io.StringIO()
+            writer = csv.DictWriter(text, fieldnames=JOURNAL_FIELDS, extrasaction='ignore')
+            writer.writerows(self.buffer)
+            self.buffer = []
+            self._append(text.getvalue().encode('utf-8'))
+
+    def _append(self, data: bytes):
+        if self.file is None:
+            self.segment = max(len(self.segment_file_names()) - 1, 0)
+            self.file = open(self.segment_file_name(self.segment), 'ab')
+        if self.compress:
+            data = gzip.compress(data)
+        self.file.write(data)
+        self.file.flush()
+        if self.segment_size is not None and self.file.tell() >= self.segment_size:
+            self.file.close()
+            self.segment += 1
+            self.file = open(self.segment_file_name(self.segment), 'ab')
+
+    def append_journal(self, other: 'EditJournal'):
+        """
+        Appends the segments of another journal (of a shard worker) and removes them.
+
+        :param other: The journal to append, written with the same compression.
+        :type other: EditJournal
+        :return: None
+        """
+        with self.lock:
+            self.flush()
+            for file_name in other.segment_file_names():
+                with open(file_name, 'rb') as source:
+                    data = source.read()
+                if data:
+                    if self.file is None:
+                        self.segment = max(len(self.segment_file_names()) - 1, 0)
+                        self.file = open(self.segment_file_name(self.segment), 'ab')
+                    self.file.write(data)
+                    self.file.flush()
+                os.remove(file_name)
+
+    def offset(self) -> int:
+        """
+        Flushes the journal and returns its size (of all segments), used as the journal offset in checkpoints.
+
+        :return: Size of the journal in bytes.
+        :rtype: int
+        """
+        with self.lock:
+            self.flush()
+            return sum(os.path.getsize(file_name) for file_name in self.segment_file_names())
+
+    def truncate(self, offset: int):
+        """
+        Truncates the journal to an offset returned by ``offset``, dropping records written after a checkpoint.
+
+        :param offset: The journal offset stored in the checkpoint.
+        :type offset: int
+        :return: None
+        """
+        with self.lock:
+            self.buffer = []
+            self._close_file()
+            remaining = offset
+            for file_name in self.segment_file_names():
+                size = os.path.getsize(file_name)
+                if remaining >= size:
+                    remaining -= size
+                    continue
+                if remaining > 0 or file_name == self.file_name:
+                    with open(file_name, 'ab') as segment_file:
+                        segment_file.truncate(remaining)
+                else:
+                    os.remove(file_name)
+                remaining = 0
+
+    def reset(self, header: bool = False):
+        """
+        Starts an empty journal, removing all segments.
+
+        :param header: Write a header record first.
+        :type header: bool
+        :return: None
+        """
+        with self.lock:
+            self.buffer = []
+            self._close_file()
+            for file_name in self.segment_file_names():
+                os.remove(file_name)
+            open(self.file_name, 'wb').close()
+            if header:
+                self.buffer.append({'item': 'item', 'prop': 'property', 'value': 'value', 'run': 'run', 'row': 'row'})
+                self.flush()
+
+    def read(self) -> list[dict]:
+        """
+        Reads the records of all segments (flushing first).
+
+        :return: The records.
+        :rtype: list[dict]
+        """
+        with self.lock:
+            self.flush()
+            records = []
+            for file_name in self.segment_file_names():
+                opener = gzip.open if self.compress else open
+                with opener(file_name, 'rt', encoding='utf-8', newline='') as segment_file:
+                    records.extend(csv.DictReader(segment_file, fieldnames=JOURNAL_FIELDS))
+            return records
+
+    def close(self):
+        """
+        Flushes the buffered records, stops the timer and closes the file.
+
+        :return: None
+        """
+        with self.lock:
+            self.stopped.set()
+            self.timer_pid = None
+            self.flush()
+            self._close_file()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,124 @@
+"""
+Revision-aware skip ledger for already synchronized items.
+
+The ledger remembers, per NK ČR ID, the hash of the CSV row and the ``lastrevid`` of the
+Wikidata item from the last successful check or write. When a row has not changed and a
+cheap batched revision lookup shows the item has not changed either, the row can be
+skipped without downloading the entity.
+"""
+
+import logging
+import sqlite3
+from typing import Callable, Iterable
+
+log = logging.getLogger(__name__)
+
+
+class SyncLedger:
+    """
+    Persistent ledger keyed by NK ČR ID.
+
+    Entries are staged by ``record()`` and written by ``commit()``, which the main loop
+    calls once a chunk is finished.
+
+    :ivar file_name: Path of the SQLite file holding the ledger.
+    :type file_name: str
+    :ivar staged: Entries waiting for ``commit()``, keyed by NK ČR ID.
+    :type staged: dict[str, tuple[int, str, int]]
+    :ivar skipped: Number of rows skipped thanks to the ledger.
+    :type skipped: int
+    """
+    lookup_batch_size: int = 500
+    # shard workers write to the same file, wait for their locks instead of failing
+    connect_timeout: float = 60.0
+
+    def __init__(self, file_name: str):
+        """
+        Opens (or creates) the ledger file.
+
+        :param file_name: Path of the SQLite file holding the ledger.
+        :type file_name: str
+        """
+        self.file_name: str = file_name
+        self.staged: dict[str, tuple[int, str, int]] = {}
+        self.skipped: int = 0
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS ledger ('
+                               'nkcr TEXT PRIMARY KEY, row_hash INTEGER NOT NULL, qid TEXT NOT NULL, lastrevid INTEGER NOT NULL'
+                               ') WITHOUT ROWID')
+
+    def lookup(self, nkcr_auts: list[str]) -> dict[str, tuple[int, str, int]]:
+        """
+        Reads ledger entries for the given NK ČR IDs.
+
+        :param nkcr_auts: NK ČR IDs of the rows in the current chunk.
+        :type nkcr_auts: list[str]
+        :return: A dictionary mapping NK ČR ID to ``(row_hash, qid, lastrevid)``.
+        :rtype: dict[str, tuple[int, str, int]]
+        """
+        entries = {}
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            for start in range(0, len(nkcr_auts), self.lookup_batch_size):
+                batch = nkcr_auts[start:start + self.lookup_batch_size]
+                placeholders = ','.join('?' * len(batch))
+                for nkcr, row_hash, qid, lastrevid in connection.execute(
+                        'SELECT nkcr, row_hash, qid, lastrevid FROM ledger WHERE nkcr IN (' + placeholders + ')', batch):
+                    entries[nkcr] = (row_hash, qid, lastrevid)
+        return entries
+
+    def find_skippable(self, nkcr_auts: Iterable[str], row_hashes: Iterable[int],
+                       get_revisions: Callable[[list[str]], dict[str, int]]) -> set[str]:
+        """
+        Finds rows that are unchanged since the last run and whose item did not move.
+
+        :param nkcr_auts: NK ČR IDs of the rows in the current chunk.
+        :type nkcr_auts: Iterable[str]
+        :param row_hashes: Row hashes in the same order as ``nkcr_auts``.
+        :type row_hashes: Iterable[int]
+        :param get_revisions: Function returning current revision ids for a list of QIDs
+            (``tools.get_last_revisions``).
+        :type get_revisions: Callable[[list[str]], dict[str, int]]
+        :return: NK ČR IDs of the rows that can be skipped.
+        :rtype: set[str]
+        """
+        hashes = dict(zip(nkcr_auts, row_hashes))
+        entries = self.lookup(list(hashes))
+        unchanged = {nkcr: entry for nkcr, entry in entries.items() if entry[0] == hashes[nkcr]}
+        if not unchanged:
+            return set()
+
+        revisions = get_revisions(sorted({entry[1] for entry in unchanged.values()}))
+        skippable = {nkcr for nkcr, (row_hash, qid, lastrevid) in unchanged.items() if revisions.get(qid) == lastrevid}
+        self.skipped += len(skippable)
+        return skippable
+
+    def record(self, nkcr_aut: str, row_hash: int, qid: str, lastrevid: int):
+        """
+        Stages the result of a successful check or write of an item.
+
+        :param nkcr_aut: NK ČR ID of the row.
+        :type nkcr_aut: str
+        :param row_hash: Hash of the row (``delta.hash_rows``).
+        :type row_hash: int
+        :param qid: QID of the checked item.
+        :type qid: str
+        :param lastrevid: Revision id of the item after the check or write.
+        :type lastrevid: int
+        :return: None
+        """
+        if qid is None or lastrevid is None:
+            return
+        self.staged[nkcr_aut] = (int(row_hash), qid, int(lastrevid))
+
+    def commit(self):
+        """
+        Writes the staged entries to the ledger file.
+
+        :return: None
+        """
+        if not self.staged:
+            return
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.executemany('INSERT OR REPLACE INTO ledger (nkcr, row_hash, qid, lastrevid) VALUES (?, ?, ?, ?)',
+                                   [(nkcr,) + entry for nkcr, entry in self.staged.items()])
+        self.staged = {}
@@ -1,21 +1,34 @@
 import argparse
 import logging
+import signal
+import sys
 import time
 import timeit
 from logging.handlers import TimedRotatingFileHandler, RotatingFileHandler
 
-from wikibaseintegrator.wbi_enums import WikibaseRank
 from wikibaseintegrator.wbi_exceptions import MissingEntityException, MWApiError, ModificationFailed, SaveFailed, \
     NonExistentEntityError, MaxRetriesReachedException
 from wikibaseintegrator.wbi_login import LoginError
 
 import config
 import tools
+from candidates import CandidateEngine, explode_column
+from claim_index import get_claim_index
+from class_hierarchy import ClassHierarchy
+from checkpoint import Checkpoint, save_checkpoint, find_checkpoint, save_context_snapshot, load_context_snapshot
 from cleaners import clean_qid
+from delta import DeltaIndex, hash_rows
+from ledger import SyncLedger
 from memory_profiler import start_tracemalloc, log_memory, log_memory_snapshot
 from nkcr_exceptions import BadItemException
+from planner import EntityCache, PlanWriter, apply_plan, merge_plans
 from processor import Processor
+from sharding import ShardResult, get_target_qid, group_rows_by_target, apply_group, shard_file_name, \
+    merge_tallies, run_sharded
+from scheduler import WriteScheduler
 from sources import Loader
+from subclass_cache import SubclassCache
+from writer import ItemWriter
 from tools import *
 
 from wikibaseintegrator.wbi_config import config as wbi_config
@@ -24,11 +37,61 @@ from wikibaseintegrator import WikibaseIntegrator, wbi_login
 log = logging.getLogger(__name__)
 
 parser = argparse.ArgumentParser(description='NKČR catmandu pipeline.')
-parser.add_argument('-i', '--input', help='NKČR CSV file name', required=True)
+parser.add_argument('-i', '--input', help='NKČR CSV file name or MARC XML dump (aut.xml, aut.xml.gz)')
+parser.add_argument('--marc-workers', help='Number of processes parsing the MARC XML dump', type=int, default=1)
+parser.add_argument('--delta', help='Process only records changed since the previous export (index file)',
+                    nargs='?', const='delta_index.sqlite', default=None)
+parser.add_argument('--ledger', help='Skip unchanged rows whose item revision did not move (ledger file)',
+                    nargs='?', const='sync_ledger.sqlite', default=None)
+parser.add_argument('--subclass-cache', help='Keep subclass check results across runs (cache file)',
+                    nargs='?', const='subclass_cache.sqlite', default=None)
+parser.add_argument('--subclass-cache-ttl-days', help='Days after which a cached subclass result expires',
+                    type=float, default=30)
+parser.add_argument('--subclass-cache-size', help='Maximum number of cached subclass results', type=int,
+                    default=100000)
+parser.add_argument('--class-hierarchy', help='Answer subclass checks from a local P279/P31 snapshot (CSV file)',
+                    default=None)
+parser.add_argument('--class-hierarchy-dump', help='Build the local class hierarchy from a Wikidata JSON dump '
+                    '(saved to --class-hierarchy if set)', default=None)
+parser.add_argument('--full', help='Force a full pass over all records (refreshes the delta index and ledger)', action='store_true')
+parser.add_argument('--checkpoint', help='Write periodic checkpoints to this file',
+                    nargs='?', const='checkpoint.json', default=None)
+parser.add_argument('--checkpoint-every', help='Number of rows between checkpoints', type=int, default=1000)
+parser.add_argument('--resume', help='Resume from the last checkpoint', action='store_true')
+parser.add_argument('--context-snapshot', help='Save loaded data to this file so --resume can skip the Loader', default=None)
+parser.add_argument('--shards', help='Number of worker processes, rows are split by the QID of the edited item',
+                    type=int, default=1)
+parser.add_argument('--write-queue', help='Number of edits waiting for the background writer', type=int, default=100)
+parser.add_argument('--edit-rate', help='Initial edit rate (edits/s) of the adaptive maxlag-aware scheduler',
+                    type=float, default=None)
+parser.add_argument('--max-edit-rate', help='Upper bound of the adaptive edit rate (edits/s)', type=float, default=5.0)
+parser.add_argument('--maxlag', help='maxlag parameter sent with edits (seconds)', type=int, default=5)
+parser.add_argument('--group-window', help='Rows edited together when they target the same item (1 = row by row)',
+                    type=int, default=1)
+parser.add_argument('--candidates', help='Compute candidate edits per chunk with pandas joins and skip rows without any',
+                    action='store_true')
+parser.add_argument('--journal-compress', help='Write the edit journal (debug.csv) gzip-compressed', action='store_true')
+parser.add_argument('--journal-segment-mb', help='Start a new edit journal segment after this many MB', type=int,
+                    default=None)
+parser.add_argument('--journal-flush-records', help='Number of journal records buffered before they are written',
+                    type=int, default=1000)
+parser.add_argument('--max-runtime', help='Stop cleanly at a checkpoint after this many seconds', type=int, default=None)
+parser.add_argument('--plan', help='Planner mode: write intended edits to this JSONL plan instead of saving items', default=None)
+parser.add_argument('--entity-cache', help='Entity cache used by the planner', default='entity_cache.sqlite')
+parser.add_argument('--offline', help='Planner mode: fail on entities and subclass checks missing in the caches '
+                                      'instead of querying Wikidata',
+                    action='store_true')
+parser.add_argument('--apply', help='Apply a plan written by --plan and exit', default=None)
+parser.add_argument('--apply-workers', help='Number of items written concurrently by --apply', type=int, default=1)
 args = parser.parse_args()
+if args.input is None and args.apply is None:
+    parser.error('the following arguments are required: -i/--input')
 
 file_name = args.input
 
+set_journal_options(compress=args.journal_compress, flush_records=args.journal_flush_records,
+                    segment_size=args.journal_segment_mb * 1024 * 1024 if args.journal_segment_mb is not None else None)
+
 logging.basicConfig(
         handlers=[RotatingFileHandler('catmandu.log',
                                mode='a',
@@ -50,12 +113,17 @@ log.info("Input file: %s" % args.input)
 print_info(config.Config.debug)
 gc.enable()
 
-bot_password = get_bot_password('bot_password')
-
 wbi_config['USER_AGENT'] = 'Frettiebot/1.0 (https://www.wikidata.org/wiki/User:Frettiebot)'
 wbi_config['SPARQL_ENDPOINT_URL'] = 'https://query-main.wikidata.org/sparql'
-login_instance = wbi_login.Login(user='Frettiebot', password=bot_password)
-wbi = WikibaseIntegrator(login=login_instance, is_bot=True)
+if args.plan is not None:
+    # the planner only reads items, through the entity cache which stands in for WikibaseIntegrator
+    login_instance = None
+    entity_cache = EntityCache(args.entity_cache, WikibaseIntegrator(), args.offline)
+    wbi = entity_cache
+else:
+    bot_password = get_bot_password('bot_password')
+    login_instance = wbi_login.Login(user='Frettiebot', password=bot_password)
+    wbi = WikibaseIntegrator(login=login_instance, is_bot=True)
 
 
 def relogin():
@@ -64,267 +132,525 @@ def relogin():
     login_instance = wbi_login.Login(user='Frettiebot', password=bot_password)
     wbi = WikibaseIntegrator(login=login_instance, is_bot=True)
     log.info('Přihlášení obnoveno.')
+    return login_instance
+
+
+
+def commit_checkpoint(checkpoint, checkpoint_file, writer, ledger, context, count, inserts, finished=False):
+    """
+    Waits for queued edits, commits the ledger and the subclass cache and writes the checkpoint with the current
+    position of the main loop.
+    """
+    writer.flush()
+    if ledger is not None:
+        ledger.commit()
+    if context.subclass_store is not None:
+        context.subclass_store.flush()
+    if checkpoint_file is None:
+        return
+    checkpoint.position = count
+    checkpoint.inserts = inserts
+    checkpoint.journal_offset = get_log_offset()
+    checkpoint.not_found_occupations = context.not_found_occupations
+    checkpoint.not_found_places = context.not_found_places
+    checkpoint.finished = finished
+    save_checkpoint(checkpoint, checkpoint_file)
+    log_with_date_time('checkpoint: ' + str(count))
+
+
+def prefetch_occupation_subclasses(chunk, context):
+    """Resolves the occupations of a chunk unknown to the class closure and the subclass cache in batched queries."""
+    occupations = explode_column(chunk, '374a', context)['value']
+    occupations = occupations[~occupations.isin(config.Config.occupations_not_used_in_occupation_because_is_in_function)]
+    resolved = resolve_subclasses_of_wbi(occupations, config.Config.class_occupation, context)
+    if resolved > 0:
+        log_with_date_time('resolved occupation subclasses: ' + str(resolved))
+
+
+def get_checkpoint_file(shard=0):
+    """Returns the checkpoint file of the shard (None if checkpoints are disabled)."""
+    checkpoint_file = args.checkpoint
+    if args.resume and checkpoint_file is None:
+        checkpoint_file = 'checkpoint.json'
+    if checkpoint_file is not None and args.shards > 1:
+        checkpoint_file = shard_file_name(checkpoint_file, shard)
+    return checkpoint_file
+
+
+def find_resume_checkpoint(checkpoint_file):
+    """Returns the checkpoint to resume from, None if there is no checkpoint of this input."""
+    if not args.resume:
+        return None
+    return find_checkpoint(checkpoint_file, file_name)
+
+
+def process_columns(processor, properties, non_deprecated_items, columns=None):
+    """Runs the processor over the given columns, only over those in ``columns`` (candidate columns) if set."""
+    if columns is not None:
+        properties = {column: prop for column, prop in properties.items() if column in columns}
+        # an empty dict would enable all columns
+        if len(properties) == 0:
+            return
+    processor.set_enabled_columns(properties)
+    processor.process_occupation_type(non_deprecated_items)
+
+
+def process_row(row, processor, context, shared_item=None, columns=None, label=None):
+    """
+    Applies one row of the NK ČR export to its item (``shared_item`` if an earlier row of the group loaded it).
+    Only ``columns`` are processed if set (the candidate columns of the row). ``label`` is the cs label
+    precomputed for the chunk. Rows whose NK ČR ID is deprecated on the target item (``context.deprecated_nkcr``)
+    are skipped before the item is loaded.
+
+    :return: The checked item (None if there is nothing to save), whether it changed, the changed properties and
+        whether the row failed with an error (it is offered again by the next delta run).
+    """
+    time_start = time.time()
+    nkcr_aut = row['_id']
+    save = True
+    changed = False
+    change_text_array = []
+    checked_item = None
+    item = None
+    failed = False
+
+    target_qid = get_target_qid(row, context)
+    if target_qid is not None and context.is_nkcr_deprecated(nkcr_aut, target_qid):
+        # the item marks the NK ČR ID as deprecated, nothing is added to it
+        log_with_date_time('deprecated NK ČR ID ' + nkcr_aut + ' on ' + target_qid + ', row skipped')
+        return checked_item, changed, change_text_array, failed
+
+    try:
+        qid = row['0247a-wikidata']
+        if qid != '':
+            name = row['100a']
+
+            qid = clean_qid(qid)
 
-if __name__ == '__main__':
-    # Start memory tracking
-    start_tracemalloc()
-    log_memory('Pipeline start')
-
+            try:
+                nkcr_auts = context.qid_to_nkcr.get(qid, [])
+                if nkcr_aut not in nkcr_auts:
+                    item = shared_item if shared_item is not None else wbi.item.get(qid)
+                    time_load_item = time.time()
+                    # log_with_date_time('time_from_start_to_load_item:' + str(time_load_item-time_start))
+                    datas = item
+                    instances_from_item = get_claim_from_item_by_property_wbi(datas, 'P31')
+                    for instance_from_item in instances_from_item:
+                        # if instance_from_item.getID() in Config.instances_not_possible_for_nkcr: #pywikibot
+                        if instance_from_item in Config.instances_not_possible_for_nkcr:
+                            save = False
+                            raise ValueError('Nepovolená instance položky: ' + instance_from_item)
+
+                        if qid in Config.qid_blacklist:
+                            save = False
+                            lab = item.labels.get('cs')
+                            if lab is None:
+                                lab = item.labels.get('en')
+                                if lab is None:
+                                    lab = "label not in cz and en"
+                            raise ValueError('Blacklistovaná položka: ' + qid + ' – ' + lab.value)
+                    # nkcr_auts_from_wd = get_nkcr_auts_from_item(datas)
+                    nkcr_auts_from_wd = get_nkcr_auts_from_item_wbi(datas)
+                    if nkcr_aut not in nkcr_auts_from_wd:
+                        try:
+                            # if item.isRedirectPage():
+                            #     item = item.getRedirectTarget()
+                            #     item.get(get_redirect=True)
+                            if save:
+                                # add_nkcr_aut_to_item(Config.debug, repo, item, nkcr_aut, name)
+                                item = add_nkcr_aut_to_item_wbi(item, nkcr_aut, name)
+
+                            context.non_deprecated_items[nkcr_aut] = {
+                                'qid': qid,
+                                'isni': [],
+                                'orcid': []
+                            }
+                            context.non_deprecated_items_field_of_work_and_occupation[nkcr_aut] = {
+                                'qid': qid,
+                                'field': [],
+                                'occup': []
+                            }
+                            context.non_deprecated_items_places[nkcr_aut] = {
+                                'qid': qid,
+                                'birth': [],
+                                'death': [],
+                                'work': [],
+                            }
+                            context.non_deprecated_items_languages[nkcr_aut] = {
+                                'qid': qid,
+                                'language': [],
+                            }
+                        except ValueError as e:
+                            log.error(str(e))
+            except KeyError as e:
+                log.warning('key err:' + str(e))
+            except ValueError as e:
+                log.error(str(e))
+        ms = time.time()
+        if save:
+            time_process = time.time()
+            processor.set_nkcr_aut(nkcr_aut)
+            processor.set_qid(qid)
+            processor.set_wbi(wbi)
+            processor.reset_instances_from_item(None)
+            if item is not None:
+                processor.set_item(item)
+            else:
+                processor.set_item(shared_item)
+            processor.set_row(row)
+
+            properties = {
+                '0247a-isni': 'P213',
+                '0247a-orcid': 'P496',
+            }
+            process_columns(processor, properties, context.non_deprecated_items, columns)
+
+            properties = {
+                '374a': 'P106',
+                '372a': 'P101',
+            }
+            process_columns(processor, properties, context.non_deprecated_items_field_of_work_and_occupation, columns)
+
+            properties = {
+                '377a': 'P1412',
+            }
+            process_columns(processor, properties, context.non_deprecated_items_languages, columns)
+
+            properties = {
+                '370a': 'P19',
+                '370b': 'P20',
+                '370f': 'P937',
+            }
+            process_columns(processor, properties, context.non_deprecated_items_places, columns)
+
+            properties = {
+                '046f': 'P569',
+                '046g': 'P570',
+                '678a': ['P569', 'P570'],
+            }
+            process_columns(processor, properties, context.non_deprecated_items, columns)
+            time_process_after = time.time()
+            if (time_process_after - time_start > 1):
+                log_with_date_time('time_from_start_to_process_after:' + str(time_process_after - time_start))
+                log_with_date_time('long AUT:' + nkcr_aut)
+            # if processor.item is None:
+            #     log_with_date_time('non item AUT:' + nkcr_aut)
+            if processor.item is not None and Config.debug is not True:
+                change_text_array = []
+                changed = False
+                label_edit = False
+
+                if (processor.get_item().labels.get('cs') is None) and len(row['100a']) > 0:
+                    # the label is precomputed for the chunk, only items without a cs label use it
+                    whole_name = label if label is not None else tools.cs_label(row['100a'])
+                    if whole_name != processor.get_item().labels.get('mul'):
+                        processor.get_item().labels.set('cs', whole_name, ActionIfExists.REPLACE_ALL)
+                        log_with_date_time('New CS label for ' + nkcr_aut + ' is ' + whole_name)
+                        changed = True
+                        change_text_array.append('cs label')
+                        label_edit = True
+
+                if nkcr_aut in get_claim_index(processor.get_item()).deprecated_values('P691'):
+                    changed = False
+
+                if changed is not True or label_edit is True:
+                    # properties the tools added claims to (on this row or an earlier row of the group)
+                    for prop in get_claim_index(processor.get_item()).added_properties:
+                        change_text_array.append(prop)
+                        changed = True
+
+                time_after_save = time.time()
+                # log_with_date_time('time_from_start_to_save_item:' + str(time_after_save - time_start))
+                checked_item = processor.item
+    except BadItemException as e:
+        failed = True
+        log.error(str(e))
+    except MissingEntityException as e:
+        failed = True
+        log.error(str(e))
+    except requests.exceptions.ConnectionError as e:
+        failed = True
+        log.error(str(e))
+    except SaveFailed as e:
+        failed = True
+        log.error(str(e))
+    except NonExistentEntityError as e:
+        failed = True
+        log.error(str(e))
+    except ModificationFailed as e:
+        failed = True
+        log.error(str(e))
+    except MaxRetriesReachedException as e:
+        failed = True
+        log.error(str(e))
+    except MWApiError as e:
+        failed = True
+        log.error(str(e))
+    except LoginError as e:
+        failed = True
+        log.error('LoginError: ' + str(e))
+        try:
+            relogin()
+        except Exception as retry_e:
+            log.error('Re-login selhal: ' + str(retry_e))
+    return checked_item, changed, change_text_array, failed
+
+
+def process_group(rows, processor, context, writer, ledger=None, row_hashes=None, candidate_columns=None,
+                  labels=None, delta_index=None):
+    """
+    Applies rows editing the same item to one loaded item and queues a single write, returns True if an edit was queued.
+    Rows that failed (or whose write failed) are dropped from the delta index, so the next delta run offers them again.
+    """
+    def apply_row(row, item):
+        columns = candidate_columns.get(row['_id']) if candidate_columns is not None else None
+        label = labels.get(row['_id']) if labels is not None else None
+        return process_row(row, processor, context, item, columns, label)
+
+    return apply_group(rows, apply_row, writer, ledger, row_hashes, delta_index)
+
+
+def run_rows(context, chunks, shard=0, shards=1, resume=False):
+    """
+    Runs the main loop over the chunks (the rows of the given shard if sharded, see ``run_sharded``).
+
+    :return: Counters and tallies of the run.
+    :rtype: ShardResult
+    """
     processor = Processor()
-
-    loader = Loader()
-    loader.set_file_name(file_name)
-    context = loader.load()
     processor.set_context(context)
 
-    log_memory('After data loading')
-
-    head = {'item': 'item', 'prop': 'property', 'value': 'value'}
-    write_log(head, True)
+    checkpoint_file = get_checkpoint_file(shard)
+    resume_checkpoint = find_resume_checkpoint(checkpoint_file) if resume else None
+    if resume_checkpoint is not None and resume_checkpoint.finished:
+        log_with_date_time('shard ' + str(shard) + ' already finished')
+        return ShardResult(shard=shard, count=resume_checkpoint.position, inserts=resume_checkpoint.inserts,
+                           not_found_occupations=resume_checkpoint.not_found_occupations,
+                           not_found_places=resume_checkpoint.not_found_places, log_file=tools.log_file_name)
+
+    delta_index = None
+    if args.delta is not None:
+        delta_index = DeltaIndex(args.delta)
+        delta_index.load()
+        chunks = delta_index.filter_chunks(chunks, full=args.full)
+
+    ledger = None
+    if args.ledger is not None and args.plan is None:
+        ledger = SyncLedger(args.ledger)
+
+    scheduler = None
+    if args.plan is not None:
+        plan_file = shard_file_name(args.plan, shard) if shards > 1 else args.plan
+        writer = PlanWriter(plan_file, entity_cache, append=resume_checkpoint is not None)
+    else:
+        if args.edit_rate is not None:
+            scheduler = WriteScheduler(maxlag=args.maxlag, rate=args.edit_rate, max_rate=args.max_edit_rate)
+        writer = ItemWriter(lambda: login_instance, relogin, args.write_queue, scheduler)
+
+    candidate_engine = CandidateEngine(context) if args.candidates else None
 
     count = 0
     inserts = 0
 
-    for chunk in context.chunks:
+    checkpoint = Checkpoint(input_file=file_name, context_snapshot=args.context_snapshot)
+    resume_position = 0
+    if resume_checkpoint is not None:
+        checkpoint = resume_checkpoint
+        resume_position = checkpoint.position
+        inserts = checkpoint.inserts
+        context.not_found_occupations = checkpoint.not_found_occupations
+        context.not_found_places = checkpoint.not_found_places
+        truncate_log(checkpoint.journal_offset)
+        log_with_date_time('resuming from line: ' + str(resume_position))
+    elif shards > 1:
+        reset_debug_file()
+    else:
+        head = {'item': 'item', 'prop': 'property', 'value': 'value'}
+        write_log(head, True)
+
+    last_checkpoint = resume_position
+    deadline = time.time() + args.max_runtime if args.max_runtime is not None else None
+    stopped = False
+
+    for chunk in chunks:
         chunk.fillna('', inplace=True)
         chunk = chunk[chunk['100a'] != '']
-        for row in chunk.to_dict('records'):
-            time_start = time.time()
-            nkcr_aut = row['_id']
-            save = True
-            count = count + 1
-            changed = False
-            change_text_array = []
+        if count + len(chunk) <= resume_position:
+            count = count + len(chunk)
+            continue
+        row_hashes = {}
+        skippable = set()
+        if ledger is not None:
+            row_hashes = dict(zip(chunk['_id'], hash_rows(chunk)))
+            if not args.full:
+                skippable = ledger.find_skippable(list(row_hashes), list(row_hashes.values()), get_last_revisions)
+        candidate_columns = None
+        if candidate_engine is not None:
+            candidate_columns = candidate_engine.columns_by_row(chunk)
+        if not args.offline:
+            prefetch_occupation_subclasses(chunk, context)
+        labels = dict(zip(chunk['_id'], tools.cs_labels(chunk['100a'])))
+        rows = chunk.to_dict('records')
+        for start in range(0, len(rows), args.group_window):
+            if count - last_checkpoint >= args.checkpoint_every:
+                commit_checkpoint(checkpoint, checkpoint_file, writer, ledger, context, count, inserts)
+                last_checkpoint = count
+            if deadline is not None and time.time() >= deadline:
+                log_with_date_time('max runtime reached at line: ' + str(count))
+                stopped = True
+                break
+            window = []
+            for row in rows[start:start + args.group_window]:
+                nkcr_aut = row['_id']
+                count = count + 1
+                if count <= resume_position:
+                    continue
+
+                if count % 10000 == 0:
+                    log_with_date_time('line: ' + str(count))
+                    log_memory(f'Processing row {count}')
+
+                if (count % 1000) == 0:
+                    log_with_date_time('line: ' + str(count) + ' - ' + nkcr_aut)
+
+                if nkcr_aut in skippable:
+                    continue
+                if candidate_columns is not None and nkcr_aut not in candidate_columns:
+                    continue
+                window.append(row)
+
+            for target_qid, group in group_rows_by_target(window, context):
+                # a queued edit of the same item has to be saved before the item is loaded again
+                writer.wait_for(target_qid)
+                if process_group(group, processor, context, writer, ledger, row_hashes, candidate_columns, labels,
+                                 delta_index):
+                    inserts = inserts + 1
+        if ledger is not None:
+            writer.flush()
+            ledger.commit()
+        if stopped:
+            break
+
+    writer.close()
+    flush_log()
+    log_with_date_time('written items: ' + str(writer.written) + ', failed writes: ' + str(writer.failed))
+    if args.plan is not None:
+        log_with_date_time('entity cache hits: ' + str(entity_cache.hits) + ', misses: ' + str(entity_cache.misses))
+    if scheduler is not None:
+        log_with_date_time('edit rate: ' + format(scheduler.rate, '.3f') + '/s, lagged responses: ' + str(scheduler.throttled))
+    commit_checkpoint(checkpoint, checkpoint_file, writer, ledger, context, count, inserts, finished=not stopped)
+    if delta_index is not None and not stopped and args.plan is None:
+        delta_index.commit()
+    if ledger is not None:
+        log_with_date_time('ledger skipped rows: ' + str(ledger.skipped))
+    if context.subclass_store is not None:
+        log_with_date_time(context.subclass_store.stats())
+
+    return ShardResult(shard=shard, count=count, inserts=inserts,
+                       not_found_occupations=context.not_found_occupations,
+                       not_found_places=context.not_found_places, log_file=tools.log_file_name, stopped=stopped)
+
+
+def run_shard(shard, chunks):
+    """Runs one shard in a forked worker with its own login and edit journal over the chunks of the shard."""
+    set_log_file(shard_file_name(tools.log_file_name, shard))
+    if args.plan is None:
+        relogin()
+    context.not_found_occupations = {}
+    context.not_found_places = {}
+    return run_rows(context, chunks, shard, args.shards, resume)
+
 
-            if count % 10000 == 0:
-                log_with_date_time('line: ' + str(count))
-                log_memory(f'Processing row {count}')
+if __name__ == '__main__':
+    # buffered journal records are written when the run is terminated
+    signal.signal(signal.SIGTERM, close_log_on_signal)
+    signal.signal(signal.SIGHUP, close_log_on_signal)
 
-            if (count % 1000) == 0:
-                log_with_date_time('line: ' + str(count) + ' - ' + nkcr_aut)
+    # Start memory tracking
+    start_tracemalloc()
+    log_memory('Pipeline start')
 
-            item = None
+    if args.apply is not None:
+        write_log({'item': 'item', 'prop': 'property', 'value': 'value'}, True)
+        scheduler = None
+        if args.edit_rate is not None:
+            scheduler = WriteScheduler(maxlag=args.maxlag, rate=args.edit_rate, max_rate=args.max_edit_rate)
+        written, failed = apply_plan(args.apply, wbi, lambda: login_instance, args.apply_workers, scheduler, relogin)
+        log_with_date_time('plan applied, written items: ' + str(written) + ', failed writes: ' + str(failed))
+        sys.exit(0)
+
+    shards = max(args.shards, 1)
+    resume_checkpoints = [find_resume_checkpoint(get_checkpoint_file(shard)) for shard in range(shards)]
+    unfinished = [checkpoint for checkpoint in resume_checkpoints if checkpoint is not None and not checkpoint.finished]
+    resume = len(unfinished) > 0
+    if args.resume and not resume:
+        log_with_date_time('no checkpoint to resume, starting from the beginning')
 
-            try:
-                qid = row['0247a-wikidata']
-                if qid != '':
-                    name = row['100a']
-
-                    qid = clean_qid(qid)
-
-                    try:
-                        nkcr_auts = context.qid_to_nkcr.get(qid, [])
-                        if nkcr_aut not in nkcr_auts:
-                            item = wbi.item.get(qid)
-                            time_load_item = time.time()
-                            # log_with_date_time('time_from_start_to_load_item:' + str(time_load_item-time_start))
-                            datas = item
-                            instances_from_item = get_claim_from_item_by_property_wbi(datas, 'P31')
-                            for instance_from_item in instances_from_item:
-                                # if instance_from_item.getID() in Config.instances_not_possible_for_nkcr: #pywikibot
-                                if instance_from_item in Config.instances_not_possible_for_nkcr:
-                                    save = False
-                                    raise ValueError('Nepovolená instance položky: ' + instance_from_item)
-
-                                if qid in Config.qid_blacklist:
-                                    save = False
-                                    lab = item.labels.get('cs')
-                                    if lab is None:
-                                        lab = item.labels.get('en')
-                                        if lab is None:
-                                            lab = "label not in cz and en"
-                                    raise ValueError('Blacklistovaná položka: ' + qid + ' – ' + lab.value)
-                            # nkcr_auts_from_wd = get_nkcr_auts_from_item(datas)
-                            nkcr_auts_from_wd = get_nkcr_auts_from_item_wbi(datas)
-                            if nkcr_aut not in nkcr_auts_from_wd:
-                                try:
-                                    # if item.isRedirectPage():
-                                    #     item = item.getRedirectTarget()
-                                    #     item.get(get_redirect=True)
-                                    if save:
-                                        # add_nkcr_aut_to_item(Config.debug, repo, item, nkcr_aut, name)
-                                        item = add_nkcr_aut_to_item_wbi(item, nkcr_aut, name)
-
-                                    context.non_deprecated_items[nkcr_aut] = {
-                                        'qid': qid,
-                                        'isni': [],
-                                        'orcid': []
-                                    }
-                                    context.non_deprecated_items_field_of_work_and_occupation[nkcr_aut] = {
-                                        'qid': qid,
-                                        'field': [],
-                                        'occup': []
-                                    }
-                                    context.non_deprecated_items_places[nkcr_aut] = {
-                                        'qid': qid,
-                                        'birth': [],
-                                        'death': [],
-                                        'work': [],
-                                    }
-                                    context.non_deprecated_items_languages[nkcr_aut] = {
-                                        'qid': qid,
-                                        'language': [],
-                                    }
-                                except ValueError as e:
-                                    log.error(str(e))
-                    except KeyError as e:
-                        log.warning('key err:' + str(e))
-                    except ValueError as e:
-                        log.error(str(e))
-                ms = time.time()
-                if save:
-                    time_process = time.time()
-                    processor.set_nkcr_aut(nkcr_aut)
-                    processor.set_qid(qid)
-                    processor.set_wbi(wbi)
-                    processor.reset_instances_from_item(None)
-                    if item is not None:
-                        processor.set_item(item)
-                    else:
-                        processor.set_item(None)
-                    processor.set_row(row)
-
-                    properties = {
-                        '0247a-isni': 'P213',
-                        '0247a-orcid': 'P496',
-                    }
-                    processor.set_enabled_columns(properties)
-                    processor.process_occupation_type(context.non_deprecated_items)
-
-                    properties = {
-                        '374a': 'P106',
-                        '372a': 'P101',
-                    }
-                    processor.set_enabled_columns(properties)
-                    processor.process_occupation_type(context.non_deprecated_items_field_of_work_and_occupation)
-
-                    properties = {
-                        '377a': 'P1412',
-                    }
-
-                    processor.set_enabled_columns(properties)
-                    processor.process_occupation_type(context.non_deprecated_items_languages)
-
-                    properties = {
-                        '370a': 'P19',
-                        '370b': 'P20',
-                        '370f': 'P937',
-                    }
-                    processor.set_enabled_columns(properties)
-                    processor.process_occupation_type(context.non_deprecated_items_places)
-
-                    properties = {
-                        '046f': 'P569',
-                        '046g': 'P570',
-                        '678a': ['P569', 'P570'],
-                    }
-                    processor.set_enabled_columns(properties)
-                    processor.process_occupation_type(context.non_deprecated_items)
-                    time_process_after = time.time()
-                    if (time_process_after - time_start > 1):
-                        log_with_date_time('time_from_start_to_process_after:' + str(time_process_after - time_start))
-                        log_with_date_time('long AUT:' + nkcr_aut)
-                    # if processor.item is None:
-                    #     log_with_date_time('non item AUT:' + nkcr_aut)
-                    if processor.item is not None and Config.debug is not True:
-                        change_text_array = []
-                        changed = False
-                        label_edit = False
-
-                        if (processor.get_item().labels.get('cs') is None) and len(row['100a']) > 0:
-                            whole_name = tools.first_name(row['100a']) + ' ' + tools.last_name(row['100a'])
-                            if whole_name != processor.get_item().labels.get('mul'):
-                                processor.get_item().labels.set('cs', whole_name, ActionIfExists.REPLACE_ALL)
-                                log_with_date_time('New CS label for ' + nkcr_aut + ' is ' + whole_name)
-                                changed = True
-                                change_text_array.append('cs label')
-                                label_edit = True
-
-                        nkcrs_wd = processor.get_item().claims.get('P691')
-                        for nkcr in nkcrs_wd:
-                            if nkcr.rank == WikibaseRank.DEPRECATED and nkcr.mainsnak.datavalue.get('value') == nkcr_aut:
-                                changed = False
-
-                        if changed is not True or label_edit is True:
-                            for prop in Config.properties.values():
-                                try:
-                                    if (type(prop) is list):
-                                        proplist = prop
-                                        for prop in proplist:
-                                            values = processor.get_item().claims.get(prop)
-                                            for value in values:
-                                                id = value.id
-                                                if (id is None):
-                                                    change_text_array.append(prop)
-                                                    changed = True
-                                    else:
-                                        values = processor.get_item().claims.get(prop)
-                                        for value in values:
-                                            id = value.id
-                                            if (id is None):
-                                                change_text_array.append(prop)
-                                                changed = True
-                                except KeyError as e:
-                                    pass
-
-                        time_after_save = time.time()
-                        # log_with_date_time('time_from_start_to_save_item:' + str(time_after_save - time_start))
-                        if changed:
-                            inserts = inserts + 1
-                            # if inserts % 10 == 0:
-                            #     log_with_date_time('inserted: ' + str(inserts))
-                            #TADY kontrolovat časové
-                            processor.item.write(
-                                summary="Update NK ČR – " + ', '.join(set(change_text_array)),
-                                is_bot=True,
-                                retry_after=10,
-                                tags=['Czech-Authorities-Sync'])
-            except BadItemException as e:
-                log.error(str(e))
-            except MissingEntityException as e:
-                log.error(str(e))
-            except requests.exceptions.ConnectionError as e:
-                log.error(str(e))
-            except SaveFailed as e:
-                log.error(str(e))
-            except NonExistentEntityError as e:
-                log.error(str(e))
-            except ModificationFailed as e:
-                log.error(str(e))
-            except MaxRetriesReachedException as e:
-                log.error(str(e))
-            except MWApiError as e:
-                msg = str(e)
-                if '"bot" right' in msg or 'permissiondenied' in msg.lower():
-                    log.error('MWApiError – chybí bot právo, pokus o relogin a retry: ' + msg)
-                    try:
-                        relogin()
-                        if processor.item is not None and changed:
-                            processor.item.write(
-                                summary="Update NK ČR – " + ', '.join(set(change_text_array)),
-                                is_bot=True,
-                                retry_after=10,
-                                tags=['Czech-Authorities-Sync'])
-                    except Exception as retry_e:
-                        log.error('Re-login nebo zápis po re-loginu selhal: ' + str(retry_e))
-                else:
-                    log.error(msg)
-            except LoginError as e:
-                log.error('LoginError: ' + str(e))
-                try:
-                    relogin()
-                    # processor.set_wbi(wbi)
-                    if processor.item is not None and changed:
-                        processor.item.write(
-                            summary="Update NK ČR – " + ', '.join(set(change_text_array)),
-                            is_bot=True,
-                            retry_after=10,
-                            tags=['Czech-Authorities-Sync'])
-                except Exception as retry_e:
-                    log.error('Re-login nebo zápis po re-loginu selhal: ' + str(retry_e))
+    loader = Loader()
+    loader.set_file_name(file_name)
+    loader.set_marc_workers(args.marc_workers)
+    if (resume and unfinished[0].context_snapshot is not None
+            and os.path.isfile(unfinished[0].context_snapshot)):
+        context = load_context_snapshot(unfinished[0].context_snapshot)
+        context.chunks = loader.load_records() if shards == 1 else None
+        log_with_date_time('context loaded from snapshot: ' + unfinished[0].context_snapshot)
+    elif args.plan is not None and args.context_snapshot is not None and os.path.isfile(args.context_snapshot):
+        # plans are recomputed from the snapshot and the entity cache without querying Wikidata
+        context = load_context_snapshot(args.context_snapshot)
+        context.chunks = loader.load_records() if shards == 1 else None
+        log_with_date_time('context loaded from snapshot: ' + args.context_snapshot)
+    else:
+        context = loader.load()
+        if args.context_snapshot is not None:
+            save_context_snapshot(context, args.context_snapshot)
+    if args.class_hierarchy_dump is not None:
+        class_hierarchy = ClassHierarchy()
+        class_hierarchy.load_dump(args.class_hierarchy_dump, context.name_to_nkcr.values())
+        if args.class_hierarchy is not None:
+            class_hierarchy.save(args.class_hierarchy)
+        context.set_class_hierarchy(class_hierarchy)
+    elif args.class_hierarchy is not None:
+        class_hierarchy = ClassHierarchy()
+        class_hierarchy.load(args.class_hierarchy)
+        context.set_class_hierarchy(class_hierarchy)
+    if args.subclass_cache is not None:
+        context.set_subclass_store(SubclassCache(args.subclass_cache, ttl=args.subclass_cache_ttl_days * 24 * 3600,
+                                                 max_entries=args.subclass_cache_size))
+    context.offline = args.offline
+
+    log_memory('After data loading')
+
+    if shards == 1:
+        results = [run_rows(context, context.chunks, resume=resume)]
+    else:
+        # the parent reads the input once and hands every worker the rows of its shard
+        chunks = context.chunks if context.chunks is not None else loader.load_records()
+        context.chunks = None
+        if not resume:
+            write_log({'item': 'item', 'prop': 'property', 'value': 'value'}, True)
+        results = run_sharded(run_shard, shards, chunks, context)
+        context.not_found_occupations = {}
+        context.not_found_places = {}
+        for result in results:
+            log_with_date_time('shard ' + str(result.shard) + ': lines: ' + str(result.count)
+                               + ', inserts: ' + str(result.inserts)
+                               + (', stopped' if result.stopped else '')
+                               + (', error: ' + result.error if result.error is not None else ''))
+            merge_tallies(context.not_found_occupations, result.not_found_occupations)
+            merge_tallies(context.not_found_places, result.not_found_places)
+        if all(not result.stopped and result.error is None for result in results):
+            merge_logs([shard_file_name(tools.log_file_name, shard) for shard in range(shards)])
+            if args.plan is not None:
+                merge_plans(args.plan, [shard_file_name(args.plan, shard) for shard in range(shards)])
+        else:
+            log_with_date_time('shards not finished, shard journals kept for --resume')
+
+    log_with_date_time('lines: ' + str(sum(result.count for result in results))
+                       + ', inserts: ' + str(sum(result.inserts for result in results)))
 
     log_memory('Pipeline complete')
     log_memory_snapshot('Final memory snapshot', top_n=15)
 
     print(context.not_found_occupations)
     print(context.not_found_places)
+    close_log()
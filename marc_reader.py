@@ -0,0 +1,397 @@
+"""
+Streaming MARC XML reader for the NK ČR authority dump.
+
+This module replaces the ``catmandu convert MARC --fix biografickapole-pro-frettieho.fix``
+step. It streams ``aut.xml`` (optionally gzip compressed) with an incremental parser,
+extracts the same columns the fix file produces and yields pandas DataFrame chunks
+with the same layout as ``tools.load_nkcr_items`` reads from ``output.csv``.
+
+The mapping mirrors catmandu semantics: the fix runs inside ``marc_each()``, so every
+MARC field is mapped on its own. Plain ``marc_map`` keeps the value of the last matching
+field, ``$append`` mappings collect one value per field which ``join_field`` then joins
+with ``|``, and ``marc_match`` conditions only look at the current field.
+
+For multi-core machines the dump can be split at record boundaries and the segments
+parsed in a process pool (``load_nkcr_items_from_marc_parallel``).
+"""
+
+import argparse
+import gzip
+import io
+import logging
+import multiprocessing
+import re
+from collections import deque
+from typing import Iterator, Union
+from xml.etree.ElementTree import iterparse
+
+import pandas
+
+log = logging.getLogger(__name__)
+
+# Column order of the CSV export (see --fields in run.sh)
+CSV_FIELDS: list[str] = [
+    '_id', '100a', '100b', '100d', '100q', '151a', '046f', '046g', '370a', '370b', '370f',
+    '372a', '374a', '375a', '377a', '400ia', '500ia7', '0247a-isni', '0247a-wikidata',
+    '0247a', '0247a-orcid', '678a',
+]
+
+# marc_map(path, column[.$append], join:...) rules from biografickapole-pro-frettieho.fix
+# (marc path, column, append, join)
+MARC_MAPPINGS: list[tuple[str, str, bool, str]] = [
+    ('100a', '100a', False, ''),
+    ('100b', '100b', False, ''),
+    ('100d', '100d', False, ''),
+    ('100q', '100q', False, ''),
+    ('151a', '151a', False, ''),
+    ('046f', '046f', False, ''),
+    ('046g', '046g', False, ''),
+    ('370a', '370a', False, ''),
+    ('370b', '370b', False, ''),
+    ('370f', '370f', True, '$'),
+    ('372a', '372a', True, '|'),
+    ('374a', '374a', True, '|'),
+    ('375a', '375a', True, '|'),
+    ('377a', '377a', True, '$'),
+    ('400ia', '400ia', True, '$'),
+    ('500ia7', '500ia7', True, '$'),
+    ('678a', '678a', True, ''),
+]
+
+# if marc_match(match path, regex) marc_map(path, column) end
+# (match path, regex, marc path, column)
+MARC_CONDITIONAL_MAPPINGS: list[tuple[str, str, str, str]] = [
+    ('02472', 'isni', '0247a', '0247a-isni'),
+    ('02472', 'wikidata', '0247a', '0247a-wikidata'),
+    ('02472', 'orcid', '0247a', '0247a-orcid'),
+]
+
+# join_field(column, '|') applied to the appended columns after marc_each()
+JOIN_FIELD_SEPARATOR = '|'
+
+CHUNK_SIZE = 10000
+
+# Record boundaries in the raw dump, used to split it into segments for worker processes
+RECORD_START = re.compile(rb'<(?:[\w.-]+:)?record[\s>]')
+RECORD_END = re.compile(rb'</(?:[\w.-]+:)?record\s*>')
+ROOT_START = re.compile(rb'<([\w.:-]+)[^<>]*>\s*$')
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def _split_marc_path(marc_path: str) -> tuple[str, str]:
+    """Split a catmandu MARC path (e.g. ``400ia``) into the field tag and subfield codes."""
+    return marc_path[:3], marc_path[3:]
+
+
+def _build_rules() -> dict[str, list[tuple]]:
+    """
+    Index the fix rules by MARC field tag so every datafield is matched with one dict hit.
+
+    :return: Mapping of field tag to a list of ``('map', codes, column, append, join)``
+        and ``('match', match_codes, regex, codes, column)`` rules.
+    :rtype: dict[str, list[tuple]]
+    """
+    rules: dict[str, list[tuple]] = {}
+    for marc_path, column, append, join in MARC_MAPPINGS:
+        tag, codes = _split_marc_path(marc_path)
+        rules.setdefault(tag, []).append(('map', codes, column, append, join))
+    for match_path, regex, marc_path, column in MARC_CONDITIONAL_MAPPINGS:
+        match_tag, match_codes = _split_marc_path(match_path)
+        tag, codes = _split_marc_path(marc_path)
+        assert match_tag == tag
+        rules.setdefault(tag, []).append(('match', match_codes, re.compile(regex), codes, column))
+    return rules
+
+
+_FIELD_RULES = _build_rules()
+
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace (``{http://www.loc.gov/MARC21/slim}record`` -> ``record``)."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _subfield_values(subfields: list[tuple[str, str]], codes: str) -> Union[list[str], None]:
+    """Return values of subfields whose code is in ``codes`` (in field order) or None if none match."""
+    values = [value for code, value in subfields if code in codes]
+    return values if values else None
+
+
+def parse_marc_record(record) -> dict:
+    """
+    Converts a single MARC XML ``record`` element into a row dictionary.
+
+    The row contains every column from ``CSV_FIELDS``; columns the record does not
+    produce are set to None, which is what pandas reads for empty CSV cells.
+
+    :param record: The ``record`` element produced by the XML parser.
+    :type record: xml.etree.ElementTree.Element
+    :return: A dictionary mapping CSV column names to their values.
+    :rtype: dict
+    """
+    row: dict = dict.fromkeys(CSV_FIELDS)
+    appended: dict[str, list[str]] = {}
+
+    for field in record:
+        element_name = _local_name(field.tag)
+        if element_name == 'controlfield':
+            if field.get('tag') == '001':
+                row['_id'] = field.text
+            continue
+        if element_name != 'datafield':
+            continue
+
+        rules = _FIELD_RULES.get(field.get('tag'))
+        if rules is None:
+            continue
+
+        subfields = [(subfield.get('code'), subfield.text or '') for subfield in field]
+        for rule in rules:
+            if rule[0] == 'map':
+                _, codes, column, append, join = rule
+                values = _subfield_values(subfields, codes)
+                if values is None:
+                    continue
+                if append:
+                    appended.setdefault(column, []).append(join.join(values))
+                else:
+                    row[column] = join.join(values)
+            else:
+                _, match_codes, regex, codes, column = rule
+                match_values = _subfield_values(subfields, match_codes)
+                if match_values is None or regex.search(''.join(match_values)) is None:
+                    continue
+                values = _subfield_values(subfields, codes)
+                if values is not None:
+                    row[column] = ''.join(values)
+
+    for column, values in appended.items():
+        row[column] = JOIN_FIELD_SEPARATOR.join(values)
+
+    return row
+
+
+def is_gzip_file(file_name: str) -> bool:
+    """Check the gzip magic bytes of the given file."""
+    with open(file_name, 'rb') as file:
+        return file.read(2) == b'\x1f\x8b'
+
+
+def is_marc_xml_file(file_name: str) -> bool:
+    """
+    Decides whether the pipeline input is the MARC XML dump rather than the CSV export.
+
+    :param file_name: Path of the input file.
+    :type file_name: str
+    :return: True for ``.xml`` and ``.xml.gz`` files.
+    :rtype: bool
+    """
+    return file_name.endswith('.xml') or file_name.endswith('.xml.gz')
+
+
+def open_marc_file(file_name: str):
+    """Open the MARC XML dump for binary reading, transparently decompressing gzip."""
+    if is_gzip_file(file_name):
+        return gzip.open(file_name, 'rb')
+    return open(file_name, 'rb')
+
+
+def iter_marc_records(file_name: str) -> Iterator[dict]:
+    """
+    Streams the MARC XML dump and yields one row dictionary per authority record.
+
+    Parsed records are cleared right after conversion, so memory usage does not grow
+    with the size of the dump.
+
+    :param file_name: Path to ``aut.xml`` or ``aut.xml.gz``.
+    :type file_name: str
+    :return: A generator of row dictionaries (see ``parse_marc_record``).
+    :rtype: Iterator[dict]
+    """
+    with open_marc_file(file_name) as source:
+        root = None
+        for event, element in iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if _local_name(element.tag) == 'record':
+                yield parse_marc_record(element)
+                root.clear()
+
+
+def rows_to_chunk(rows: list[dict], start: int = 0) -> pandas.DataFrame:
+    """
+    Builds a DataFrame chunk with the CSV column layout from row dictionaries.
+
+    :param rows: Row dictionaries produced by ``parse_marc_record``.
+    :type rows: list[dict]
+    :param start: Index of the first row, so chunk indexes continue like ``read_csv`` chunks.
+    :type start: int
+    :return: A DataFrame with ``CSV_FIELDS`` columns.
+    :rtype: pandas.DataFrame
+    """
+    return pandas.DataFrame(rows, columns=CSV_FIELDS, dtype=object,
+                            index=pandas.RangeIndex(start, start + len(rows)))
+
+
+def load_nkcr_items_from_marc(file_name: str, chunksize: int = CHUNK_SIZE) -> Iterator[pandas.DataFrame]:
+    """
+    Reads the MARC XML dump and yields DataFrame chunks, a drop-in replacement for
+    ``tools.load_nkcr_items`` on the CSV export.
+
+    :param file_name: Path to ``aut.xml`` or ``aut.xml.gz``.
+    :type file_name: str
+    :param chunksize: Number of records per yielded chunk.
+    :type chunksize: int
+    :return: A generator yielding pandas DataFrame chunks.
+    :rtype: Iterator[pandas.DataFrame]
+    """
+    rows: list[dict] = []
+    start = 0
+    for row in iter_marc_records(file_name):
+        rows.append(row)
+        if len(rows) == chunksize:
+            yield rows_to_chunk(rows, start)
+            start += len(rows)
+            rows = []
+    if rows:
+        yield rows_to_chunk(rows, start)
+
+
+def iter_marc_segments(file_name: str, records_per_segment: int) -> Iterator[tuple[bytes, bytes, bytes]]:
+    """
+    Splits the raw MARC XML dump at record boundaries without parsing it.
+
+    Every segment is returned together with the document header (XML declaration and the
+    opening root tag with its namespace declarations) and the matching closing tag, so a
+    worker can parse it as a standalone document.
+
+    :param file_name: Path to ``aut.xml`` or ``aut.xml.gz``.
+    :type file_name: str
+    :param records_per_segment: Number of records in one segment.
+    :type records_per_segment: int
+    :return: A generator of ``(header, segment, footer)`` byte strings.
+    :rtype: Iterator[tuple[bytes, bytes, bytes]]
+    """
+    header = None
+    footer = b''
+    buffer = bytearray()
+    count = 0
+    cut = 0
+    scan_from = 0
+    with open_marc_file(file_name) as source:
+        while True:
+            block = source.read(READ_BLOCK_SIZE)
+            buffer += block
+            if header is None:
+                start = RECORD_START.search(buffer)
+                if start is None:
+                    if not block:
+                        return
+                    continue
+                header = bytes(buffer[:start.start()])
+                root = ROOT_START.search(header)
+                footer = b'</' + root.group(1) + b'>' if root else b''
+                del buffer[:start.start()]
+
+            for end in RECORD_END.finditer(buffer, scan_from):
+                scan_from = end.end()
+                count += 1
+                if count == records_per_segment:
+                    yield header, bytes(buffer[cut:scan_from]), footer
+                    cut = scan_from
+                    count = 0
+            if not block:
+                if count:
+                    yield header, bytes(buffer[cut:scan_from]), footer
+                return
+            del buffer[:cut]
+            scan_from -= cut
+            cut = 0
+
+
+def parse_marc_segment(task: tuple[int, bytes, bytes, bytes]) -> tuple[int, dict[str, list]]:
+    """
+    Parses one segment of the dump into column batches (runs in a worker process).
+
+    :param task: Tuple of ``(segment index, header, segment, footer)``.
+    :type task: tuple[int, bytes, bytes, bytes]
+    :return: The segment index and a mapping of CSV column name to the list of its values.
+    :rtype: tuple[int, dict[str, list]]
+    """
+    index, header, segment, footer = task
+    columns: dict[str, list] = {column: [] for column in CSV_FIELDS}
+    for event, element in iterparse(io.BytesIO(header + segment + footer), events=('end',)):
+        if _local_name(element.tag) == 'record':
+            for column, value in parse_marc_record(element).items():
+                columns[column].append(value)
+            element.clear()
+    return index, columns
+
+
+def load_nkcr_items_from_marc_parallel(file_name: str, workers: int,
+                                       chunksize: int = CHUNK_SIZE) -> Iterator[pandas.DataFrame]:
+    """
+    Parallel variant of ``load_nkcr_items_from_marc``.
+
+    The dump is split into segments of ``chunksize`` records which are parsed in a
+    process pool. Only a bounded number of segments is in flight, and chunks are
+    yielded in record order.
+
+    :param file_name: Path to ``aut.xml`` or ``aut.xml.gz``.
+    :type file_name: str
+    :param workers: Number of worker processes.
+    :type workers: int
+    :param chunksize: Number of records per yielded chunk.
+    :type chunksize: int
+    :return: A generator yielding pandas DataFrame chunks.
+    :rtype: Iterator[pandas.DataFrame]
+    """
+    start = 0
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        segments = iter_marc_segments(file_name, chunksize)
+        index = 0
+        while True:
+            while len(pending) < workers * 2:
+                task = next(segments, None)
+                if task is None:
+                    break
+                pending.append(pool.apply_async(parse_marc_segment, ((index,) + task,)))
+                index += 1
+            if not pending:
+                return
+            _, columns = pending.popleft().get()
+            length = len(columns['_id'])
+            yield pandas.DataFrame(columns, columns=CSV_FIELDS, dtype=object,
+                                   index=pandas.RangeIndex(start, start + length))
+            start += length
+
+
+def export_csv(file_name: str, output_file_name: str, workers: int = 1):
+    """
+    Writes the extracted columns to a CSV file, the same export catmandu used to produce.
+
+    :param file_name: Path to ``aut.xml`` or ``aut.xml.gz``.
+    :param output_file_name: Path of the CSV file to write.
+    :param workers: Number of worker processes, 1 parses in the current process.
+    :return: None
+    """
+    if workers > 1:
+        chunks = load_nkcr_items_from_marc_parallel(file_name, workers)
+    else:
+        chunks = load_nkcr_items_from_marc(file_name)
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(output_file_name, mode='w' if header else 'a', header=header, index=False)
+        header = False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert NKČR MARC XML dump to CSV.')
+    parser.add_argument('-i', '--input', help='NKČR MARC XML file name (aut.xml or aut.xml.gz)', required=True)
+    parser.add_argument('-o', '--output', help='CSV file name', required=True)
+    parser.add_argument('-w', '--workers', help='Number of parsing processes', type=int, default=1)
+    args = parser.parse_args()
+    export_csv(args.input, args.output, args.workers)
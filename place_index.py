@@ -0,0 +1,88 @@
+"""
+Lookup of NK ČR place strings.
+
+NK ČR writes places as ``Name, Qualifier`` while the names loaded from Wikidata use
+``Name (Qualifier)``. ``prepare_places_from_nkcr`` used to rewrite every place with a
+regular expression before looking it up in ``name_to_nkcr``; the same places repeat in
+370a, 370b and 370f of most records. The ``PlaceIndex`` maps raw place strings directly
+to their normalized name and QID: the entries for the known names (and their
+``Name, Qualifier`` spelling) are built once, other observed strings are memoized in a
+bounded cache.
+"""
+
+import re
+from typing import Union
+
+PLACE_REGEX = r"(.*?),\W*(.*)"
+PLACE_SUBST = r"\1 (\2)"
+
+_place_pattern = re.compile(PLACE_REGEX, re.MULTILINE)
+
+
+def normalize_place(place: str) -> str:
+    """
+    Rewrites ``Name, Qualifier`` to ``Name (Qualifier)``; places with a parenthesis are kept as they are.
+
+    :param place: One place of an NK ČR field.
+    :type place: str
+    :return: The normalized name.
+    :rtype: str
+    """
+    if place.strip().find('(') != -1:
+        return place
+    result = _place_pattern.sub(PLACE_SUBST, place.strip())
+    return result if result else place
+
+
+class PlaceIndex:
+    """
+    Raw place strings mapped to (normalized name, QID or None).
+
+    :ivar prebuilt: Entries built from the known names.
+    :type prebuilt: dict[str, tuple[str, Union[str, None]]]
+    :ivar memo: Entries of other observed strings, the oldest are dropped beyond ``max_size``.
+    :type memo: dict[str, tuple[str, Union[str, None]]]
+    :ivar max_size: Maximum number of memoized entries.
+    :type max_size: int
+    """
+
+    def __init__(self, name_to_nkcr: dict, max_size: int = 100000):
+        """
+        :param name_to_nkcr: Names (``Name (Qualifier)``) mapped to QIDs.
+        :type name_to_nkcr: dict
+        :param max_size: Maximum number of memoized entries.
+        :type max_size: int
+        """
+        self.name_to_nkcr = name_to_nkcr
+        self.max_size: int = max_size
+        self.prebuilt: dict[str, tuple[str, Union[str, None]]] = {}
+        self.memo: dict[str, tuple[str, Union[str, None]]] = {}
+        for name, qid in name_to_nkcr.items():
+            if type(name) is not str:
+                continue
+            if normalize_place(name) == name:
+                self.prebuilt[name] = (name, qid)
+            if name.endswith(')') and ' (' in name:
+                raw = name[:-1].replace(' (', ', ', 1)
+                if normalize_place(raw) == name:
+                    self.prebuilt.setdefault(raw, (name, qid))
+
+    def lookup(self, place: str) -> tuple[str, Union[str, None]]:
+        """
+        Returns the normalized name of a raw place and its QID.
+
+        :param place: One place of an NK ČR field.
+        :type place: str
+        :return: The normalized name and the QID, None if the name is unknown.
+        :rtype: tuple[str, Union[str, None]]
+        """
+        entry = self.prebuilt.get(place)
+        if entry is None:
+            entry = self.memo.get(place)
+            if entry is None:
+                name = normalize_place(place)
+                entry = (name, self.name_to_nkcr.get(name))
+                if len(self.memo) >= self.max_size:
+                    self.memo.pop(next(iter(self.memo)))
+                self.memo[place] = entry
+        return entry
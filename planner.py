@@ -0,0 +1,368 @@
+"""
+Offline edit planning and plan application.
+
+In planner mode (``main.py --plan plan.jsonl``) the main loop runs as usual, but instead
+of saving items it writes the intended changes (new claims, removed claims and labels)
+to a JSONL plan. Items are read through an ``EntityCache``, so a plan can be computed
+again from the cached entities and a context snapshot without touching Wikidata. The plan
+is applied later by ``apply_plan`` (``main.py --apply plan.jsonl``) with a chosen number
+of concurrent writers.
+"""
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Union
+
+from wikibaseintegrator import WikibaseIntegrator
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.models import Claim
+from wikibaseintegrator.wbi_enums import ActionIfExists
+from wikibaseintegrator.wbi_exceptions import MissingEntityException, MWApiError
+from wikibaseintegrator.wbi_helpers import mediawiki_api_call_helper
+from wikibaseintegrator.wbi_login import LoginError, _Login
+
+from scheduler import WriteScheduler
+from tools import write_log
+from writer import TAGS
+
+log = logging.getLogger(__name__)
+
+
+class EntityCache:
+    """
+    On-disk cache of entity JSON as returned by ``wbgetentities``.
+
+    The cache can stand in for ``WikibaseIntegrator`` where the pipeline only loads items
+    (``cache.item.get(qid)``).
+
+    :ivar file_name: Path of the SQLite file holding the cache.
+    :type file_name: str
+    :ivar wbi: Used to fetch entities missing in the cache.
+    :type wbi: WikibaseIntegrator
+    :ivar offline: Raise ``MissingEntityException`` for entities missing in the cache instead of fetching them.
+    :type offline: bool
+    :ivar hits: Number of entities served from the cache.
+    :type hits: int
+    :ivar misses: Number of entities fetched from Wikidata.
+    :type misses: int
+    """
+    connect_timeout: float = 60.0
+
+    def __init__(self, file_name: str, wbi: WikibaseIntegrator, offline: bool = False):
+        """
+        Opens (or creates) the cache file.
+
+        :param file_name: Path of the SQLite file holding the cache.
+        :type file_name: str
+        :param wbi: Used to fetch entities missing in the cache.
+        :type wbi: WikibaseIntegrator
+        :param offline: Raise ``MissingEntityException`` for entities missing in the cache.
+        :type offline: bool
+        """
+        self.file_name: str = file_name
+        self.wbi: WikibaseIntegrator = wbi
+        self.offline: bool = offline
+        self.hits: int = 0
+        self.misses: int = 0
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS entity (id TEXT PRIMARY KEY, json TEXT NOT NULL) WITHOUT ROWID')
+
+    @property
+    def item(self) -> 'EntityCache':
+        """Drop-in for ``WikibaseIntegrator.item``, only ``get()`` is supported."""
+        return self
+
+    def get_json(self, entity_id: str) -> Union[dict, None]:
+        """
+        Returns the cached entity JSON.
+
+        :param entity_id: QID of the item.
+        :type entity_id: str
+        :return: The entity JSON, or None if the entity is not cached.
+        :rtype: Union[dict, None]
+        """
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            row = connection.execute('SELECT json FROM entity WHERE id = ?', (entity_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def get(self, entity_id: str, **kwargs) -> ItemEntity:
+        """
+        Loads an item from the cache, fetching (and caching) it if it is missing.
+
+        :param entity_id: QID of the item.
+        :type entity_id: str
+        :return: The item.
+        :rtype: ItemEntity
+        :raises MissingEntityException: If the item is not cached and the cache is offline.
+        """
+        entity_json = self.get_json(entity_id)
+        if entity_json is not None:
+            self.hits += 1
+        elif self.offline:
+            raise MissingEntityException('entity not cached: ' + entity_id)
+        else:
+            self.misses += 1
+            result = mediawiki_api_call_helper(data={'action': 'wbgetentities', 'ids': entity_id, 'format': 'json'},
+                                               allow_anonymous=True)
+            entity_json = next(iter(result['entities'].values()))
+            if 'missing' in entity_json:
+                raise MissingEntityException('entity not found: ' + entity_id)
+            with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+                connection.execute('INSERT OR REPLACE INTO entity (id, json) VALUES (?, ?)',
+                                   (entity_id, json.dumps(entity_json, ensure_ascii=False)))
+        return ItemEntity(api=self.wbi).from_json(json_data=entity_json)
+
+
+class PlanWriter:
+    """
+    Writes planned edits to a JSONL plan instead of saving items.
+
+    It has the interface of ``writer.ItemWriter``, so the main loop runs unchanged in
+    planner mode. Each line holds the changes of one item::
+
+        {"qid": "Q1", "base_revid": 1, "summary": "...", "labels": {"cs": "..."},
+         "add": [<claim JSON>], "remove": [{"property": "P106", "id": "Q1$..."}]}
+
+    :ivar file_name: Path of the plan file.
+    :type file_name: str
+    :ivar cache: Entity cache the planned items were loaded from.
+    :type cache: EntityCache
+    :ivar written: Number of planned item edits.
+    :type written: int
+    :ivar failed: Always 0, kept for the interface of ``ItemWriter``.
+    :type failed: int
+    """
+
+    def __init__(self, file_name: str, cache: EntityCache, append: bool = False):
+        """
+        :param file_name: Path of the plan file.
+        :type file_name: str
+        :param cache: Entity cache the planned items were loaded from.
+        :type cache: EntityCache
+        :param append: Append to an existing plan (on resume) instead of starting a new one.
+        :type append: bool
+        """
+        self.file_name: str = file_name
+        self.cache: EntityCache = cache
+        self.written: int = 0
+        self.failed: int = 0
+        self.plan_file = open(file_name, 'a' if append else 'w', encoding='utf-8')
+
+    def submit(self, item: ItemEntity, summary: str, on_written: Union[Callable[[ItemEntity], None], None] = None,
+               on_failed: Union[Callable[[ItemEntity], None], None] = None):
+        """
+        Writes the changes of the item to the plan. The callbacks are not called, nothing was saved.
+
+        :param item: The edited item.
+        :type item: ItemEntity
+        :param summary: Edit summary.
+        :type summary: str
+        :param on_written: Ignored.
+        :param on_failed: Ignored.
+        :return: None
+        """
+        entry = plan_item_changes(item, self.cache.get_json(item.id) or {})
+        entry['summary'] = summary
+        self.plan_file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.written += 1
+
+    def wait_for(self, qid: Union[str, None]):
+        """Nothing is queued in planner mode."""
+
+    def flush(self):
+        """
+        Flushes the plan file.
+
+        :return: None
+        """
+        self.plan_file.flush()
+
+    def close(self):
+        """
+        Closes the plan file.
+
+        :return: None
+        """
+        self.plan_file.close()
+
+
+def plan_item_changes(item: ItemEntity, original_json: dict) -> dict:
+    """
+    Collects the changes made to a loaded item.
+
+    :param item: The edited item.
+    :type item: ItemEntity
+    :param original_json: Entity JSON the item was loaded from (for the label changes).
+    :type original_json: dict
+    :return: A plan entry without the summary.
+    :rtype: dict
+    """
+    original_labels = original_json.get('labels', {})
+    labels = {}
+    for language, label in item.labels.get_json().items():
+        if original_labels.get(language, {}).get('value') != label['value']:
+            labels[language] = label['value']
+    added = []
+    removed = []
+    for claim in item.claims:
+        if claim.removed:
+            if claim.id is not None:
+                removed.append({'property': claim.mainsnak.property_number, 'id': claim.id})
+        elif claim.id is None:
+            added.append(claim.get_json())
+    return {'qid': item.id, 'base_revid': item.lastrevid, 'labels': labels, 'add': added, 'remove': removed}
+
+
+def read_plan(file_name: str) -> Iterator[dict]:
+    """
+    Reads the entries of a plan file.
+
+    :param file_name: Path of the plan file.
+    :type file_name: str
+    :return: A generator of plan entries.
+    :rtype: Iterator[dict]
+    """
+    with open(file_name, encoding='utf-8') as plan_file:
+        for line in plan_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_plans(file_name: str, file_names: list[str]):
+    """
+    Concatenates plans written by shard workers into one plan and removes them.
+
+    :param file_name: Path of the merged plan.
+    :type file_name: str
+    :param file_names: Paths of the shard plans.
+    :type file_names: list[str]
+    :return: None
+    """
+    with open(file_name, 'w', encoding='utf-8') as target:
+        for shard_file_name in file_names:
+            if not os.path.isfile(shard_file_name):
+                continue
+            with open(shard_file_name, encoding='utf-8') as source:
+                for line in source:
+                    target.write(line)
+            os.remove(shard_file_name)
+
+
+def apply_item_changes(item: ItemEntity, entries: list[dict]):
+    """
+    Applies plan entries to a freshly loaded item. Claims that meanwhile appeared on the
+    item are not added again and labels are only added where the item has none.
+
+    :param item: The item to change.
+    :type item: ItemEntity
+    :param entries: Plan entries of the item.
+    :type entries: list[dict]
+    :return: None
+    """
+    for entry in entries:
+        for language, value in entry['labels'].items():
+            item.labels.set(language, value, ActionIfExists.KEEP)
+        for claim_json in entry['add']:
+            # new claims have no id yet, from_json requires one
+            claim = Claim().from_json(dict(copy.deepcopy(claim_json), id=''))
+            claim.reset_id()
+            if claim not in item.claims.get(claim.mainsnak.property_number):
+                item.claims.add(claim, ActionIfExists.FORCE_APPEND)
+        for removal in entry['remove']:
+            for claim in item.claims.get(removal['property']):
+                if claim.id == removal['id']:
+                    claim.remove()
+
+
+def apply_plan(file_name: str, wbi: WikibaseIntegrator, get_login: Callable[[], _Login], workers: int = 1,
+               scheduler: Union[WriteScheduler, None] = None,
+               relogin: Union[Callable[[], _Login], None] = None) -> tuple[int, int]:
+    """
+    Applies a plan, writing up to ``workers`` items concurrently. Entries of the same item
+    are applied together in one edit. A write rejected for an expired login (``LoginError`` or
+    a missing bot right) is retried once after logging in again, like ``ItemWriter`` does.
+
+    :param file_name: Path of the plan file.
+    :type file_name: str
+    :param wbi: Used to load the current version of the items.
+    :type wbi: WikibaseIntegrator
+    :param get_login: Returns the current login of the bot.
+    :type get_login: Callable[[], _Login]
+    :param workers: Number of concurrent writers.
+    :type workers: int
+    :param scheduler: Paces the edits by the lag reported by the API, if set.
+    :type scheduler: Union[WriteScheduler, None]
+    :param relogin: Logs the bot in again and returns the new login; without it the write is not retried.
+    :type relogin: Union[Callable[[], _Login], None]
+    :return: Numbers of written and failed items.
+    :rtype: tuple[int, int]
+    """
+    entries_by_qid: dict[str, list[dict]] = {}
+    for entry in read_plan(file_name):
+        entries_by_qid.setdefault(entry['qid'], []).append(entry)
+    log.info('plan loaded, items: ' + str(len(entries_by_qid)))
+
+    counts = {'written': 0, 'failed': 0}
+    counts_lock = threading.Lock()
+    login_lock = threading.Lock()
+
+    def write(item: ItemEntity, summary: str, login: _Login):
+        if scheduler is None:
+            item.write(summary=summary, is_bot=True, retry_after=10, tags=TAGS, login=login)
+        else:
+            scheduler.install(login.get_session())
+            scheduler.acquire()
+            item.write(summary=summary, is_bot=True, retry_after=10, tags=TAGS, login=login, maxlag=scheduler.maxlag)
+
+    def renew_login(expired: _Login) -> _Login:
+        # concurrent workers hit the same expired session, only the first one logs in again
+        with login_lock:
+            login = get_login()
+            if login is expired:
+                login = relogin()
+            return login
+
+    def write_with_relogin(item: ItemEntity, summary: str):
+        login = get_login()
+        try:
+            write(item, summary, login)
+        except MWApiError as e:
+            msg = str(e)
+            if relogin is None or ('"bot" right' not in msg and 'permissiondenied' not in msg.lower()):
+                raise
+            log.error('MWApiError – chybí bot právo, pokus o relogin a retry: ' + msg)
+            write(item, summary, renew_login(login))
+        except LoginError as e:
+            if relogin is None:
+                raise
+            log.error('LoginError: ' + str(e))
+            write(item, summary, renew_login(login))
+
+    def apply_entries(qid: str, entries: list[dict]):
+        try:
+            item = wbi.item.get(qid)
+            if item.lastrevid != entries[0]['base_revid']:
+                log.info(qid + ' changed since it was planned, applying to the current revision')
+            apply_item_changes(item, entries)
+            summary = ' | '.join(dict.fromkeys(entry['summary'] for entry in entries))
+            write_with_relogin(item, summary)
+            outcome = 'written'
+        except Exception as e:
+            log.error('zápis selhal: ' + qid + ' – ' + str(e))
+            write_log({'item': qid, 'prop': 'write failed', 'value': str(e)})
+            outcome = 'failed'
+        with counts_lock:
+            counts[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for qid, entries in entries_by_qid.items():
+            executor.submit(apply_entries, qid, entries)
+
+    return counts['written'], counts['failed']
@@ -9,14 +9,7 @@ from config import *
 
 if TYPE_CHECKING:
     from context import PipelineContext
-from property_processor.property_processor_370a import PropertyProcessor370a
-from property_processor.property_processor_370b import PropertyProcessor370b
-from property_processor.property_processor_370f import PropertyProcessor370f
-from property_processor.property_processor_372a import PropertyProcessor372a
-from property_processor.property_processor_374a import PropertyProcessor374a
-from property_processor.property_processor_377a import PropertyProcessor377a
-from property_processor.property_processor_dates import PropertyProcessorDates
-from property_processor.property_processor_one import PropertyProcessorOne
+from property_processor.registry import PropertyProcessorRegistry
 from tools import log_with_date_time, get_claim_from_item_by_property_wbi
 from wikibaseintegrator.datatypes import Item, ExternalID, Time, String
 
@@ -47,6 +40,8 @@ class Processor:
     :type instances_from_item: Any
     :ivar save: A boolean flag indicating whether the current item should be saved.
     :type save: bool
+    :ivar property_processors: Property processors of the columns, reused for all rows.
+    :type property_processors: PropertyProcessorRegistry
     """
     def __init__(self):
         """
@@ -75,6 +70,7 @@ class Processor:
         self.instances_from_item = None
         self.save = True
         self.context: 'PipelineContext' = None
+        self.property_processors = PropertyProcessorRegistry()
 
     def get_instances_from_item(self):
         """
@@ -207,63 +203,11 @@ class Processor:
                     claim_direct_from_wd = get_claim_from_item_by_property_wbi(datas_from_wd,
                                                                            property_for_new_field)  # pro kontrolu
 
-                    if type(row_new_fields[column]) is list:
-                        if column == '374a':
-                            property_processor = PropertyProcessor374a(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field,
-                                context=self.context)
-                            property_processor.process()
-                        elif column == '372a':
-                            property_processor = PropertyProcessor372a(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.set_datas_from_wd(datas_from_wd)
-
-                            property_processor.process()
-                        elif column == '370a':
-                            property_processor = PropertyProcessor370a(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.process()
-                        elif column == '370b':
-                            property_processor = PropertyProcessor370b(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.process()
-                        elif column == '370f':
-                            property_processor = PropertyProcessor370f(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.process()
-                        elif column == '377a':
-                            property_processor = PropertyProcessor377a(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.process()
-                        elif time_fields:
-                            property_processor = PropertyProcessorDates(
-                                wbi=self.wbi, property_for_new_field=property_for_new_field,
-                                column=column, row_new_fields=row_new_fields,
-                                claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                            property_processor.process()
-                    elif time_fields:
-                        property_processor = PropertyProcessorDates(
-                            wbi=self.wbi, property_for_new_field=property_for_new_field,
-                            column=column, row_new_fields=row_new_fields,
-                            claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
-                        property_processor.process()
-                    else:
-                        property_processor = PropertyProcessorOne(
-                            wbi=self.wbi, property_for_new_field=property_for_new_field,
-                            column=column, row_new_fields=row_new_fields,
-                            claim_direct_from_wd=claim_direct_from_wd, item_new_field=item_new_field)
+                    property_processor = self.property_processors.get(
+                        column, row_new_fields, claim_direct_from_wd, property_for_new_field, item_new_field,
+                        self.wbi, time_fields)
+                    if property_processor is not None:
+                        property_processor.set_datas_from_wd(datas_from_wd)
                         property_processor.process()
 
             except ValueError as ve:
@@ -366,6 +310,7 @@ class Processor:
         :type context: PipelineContext
         """
         self.context = context
+        self.property_processors.set_context(context)
 
     def process_occupation_type(self, non_deprecated_items):
         """
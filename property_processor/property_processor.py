@@ -27,6 +27,8 @@ class BasePropertyProcessor:
     :ivar wbi: Instance of WikibaseIntegrator for facilitating data operations.
     :type wbi: WikibaseIntegrator
     :ivar claim_direct_from_wd: List of claims directly retrieved from Wikibase.
+    :ivar datas_from_wd: The whole item loaded from Wikibase, for processors comparing with other properties.
+    :type datas_from_wd: Union[ItemEntity, None]
     """
     def __init__(self, column, row_new_fields, claim_direct_from_wd, property_for_new_field, item_new_field, wbi, context: 'PipelineContext' = None):
         """
@@ -54,6 +56,43 @@ class BasePropertyProcessor:
         self.wbi: WikibaseIntegrator = wbi
         self.claim_direct_from_wd = claim_direct_from_wd
         self.context: 'PipelineContext' = context
+        self.datas_from_wd: Union[ItemEntity, None] = None
+
+    def reset(self, column, row_new_fields, claim_direct_from_wd, property_for_new_field, item_new_field, wbi):
+        """
+        Resets the per-row state, so one instance can process all rows (see ``PropertyProcessorRegistry``).
+
+        :param column: The name of the column to process.
+        :type column: str
+        :param row_new_fields: A dictionary containing the new field mappings for a row.
+        :type row_new_fields: dict
+        :param claim_direct_from_wd: The claim directly obtained from Wikidata.
+        :type claim_direct_from_wd: Any
+        :param property_for_new_field: The property identifier for the new field.
+        :type property_for_new_field: str
+        :param item_new_field: An instance of ItemEntity to add the new field to.
+        :type item_new_field: ItemEntity
+        :param wbi: An instance of the WikibaseIntegrator used for interacting with the Wikibase system.
+        :type wbi: WikibaseIntegrator
+        :return: None
+        """
+        self.column = column
+        self.row_new_fields = row_new_fields
+        self.claim_direct_from_wd = claim_direct_from_wd
+        self.property_for_new_field = property_for_new_field
+        self.item_new_field = item_new_field
+        self.wbi = wbi
+        self.datas_from_wd = None
+
+    def set_datas_from_wd(self, datas_from_wd: ItemEntity):
+        """
+        Sets the data received from the WD source.
+
+        :param datas_from_wd: The data entity to be set.
+        :type datas_from_wd: ItemEntity
+        :return: None
+        """
+        self.datas_from_wd = datas_from_wd
 
     def set_claim_direct_from_wd(self, claim_direct_from_wd):
         """
@@ -1,8 +1,7 @@
-from wikibaseintegrator.entities import ItemEntity
-
+from claim_index import get_claim_index
 from config import Config
 from property_processor.property_processor import BasePropertyProcessor
-from tools import get_claim_from_item_by_property_wbi, add_new_field_to_item_wbi
+from tools import add_new_field_to_item_wbi
 
 
 class PropertyProcessor372a(BasePropertyProcessor):
@@ -17,16 +16,6 @@ class PropertyProcessor372a(BasePropertyProcessor):
         used as the data source during processing.
     :type datas_from_wd: ItemEntity
     """
-    def set_datas_from_wd(self, datas_from_wd: ItemEntity):
-        """
-        Sets the data received from the WD source.
-
-        :param datas_from_wd: The data entity to be set.
-        :type datas_from_wd: ItemEntity
-        :return: None
-        """
-        self.datas_from_wd = datas_from_wd
-
     def process(self):
         """
         Processes the new fields for a given item by comparing them with claims from Wikidata.
@@ -44,14 +33,8 @@ class PropertyProcessor372a(BasePropertyProcessor):
             item_occupation = item_in_list
 
             if item_occupation not in qid_claims_direct_from_wd and item_occupation not in Config.fields_of_work_not_used_in_field_of_work_because_is_not_ok:
-                occupations_direct_from_wd = get_claim_from_item_by_property_wbi(
-                    self.datas_from_wd,
-                    Config.property_occupation)  # pro kontrolu
-                qid_occupations_claims_direct_from_wd = []
-                for odfwd in occupations_direct_from_wd:
-                    # if type(odfwd) is pywikibot.ItemPage:
-                    qid_occupations_claims_direct_from_wd.append(odfwd)
-                if item_occupation not in qid_occupations_claims_direct_from_wd:
+                # pro kontrolu
+                if not get_claim_index(self.datas_from_wd).has_value(Config.property_occupation, item_occupation):
                     if self.row_new_fields[self.column] not in self.claim_direct_from_wd:
                         self.item_new_field = add_new_field_to_item_wbi(
                             self.item_new_field,
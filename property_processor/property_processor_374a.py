@@ -16,7 +16,7 @@ class PropertyProcessor374a(BasePropertyProcessor):
     :ivar QID_OCCUPATION: The Wikidata identifier for the "occupation" class.
     :type QID_OCCUPATION: str
     """
-    QID_OCCUPATION = 'Q12737077'
+    QID_OCCUPATION = Config.class_occupation
 
     def process(self):
         """
@@ -1,6 +1,7 @@
 from wikibaseintegrator.datatypes import Time
 from wikibaseintegrator.models import Claims
 
+from claim_index import get_claim_index, summarize_time_values, time_value_key
 from property_processor.property_processor import BasePropertyProcessor
 from tools import add_new_field_to_item_wbi
 
@@ -39,24 +40,19 @@ class PropertyProcessorDates(BasePropertyProcessor):
 
         :return: None
         """
-        qid_claims_direct_from_wd = self.get_qid_claims_direct_from_wd_wbi()
+        # keys and highest precision of the dates on the item, built once per call
+        summary = summarize_time_values(self.get_qid_claims_direct_from_wd_wbi())
 
         if type(self.row_new_fields[self.column]) is list:
             for item_date in self.row_new_fields[self.column]:
                 item_date: dict
                 prop = item_date.get('property')
-                if item_date not in qid_claims_direct_from_wd:
+                keys, highest_precisions = summary.get(prop, (set(), 0))
+                if time_value_key(item_date) not in keys:
                     new_item_precision = item_date.get('precision', 0)
-                    get_qid_claims_direct_from_wd_by_precision = self.get_qid_claims_direct_from_wd_by_precision(prop)
-                    precisions = get_qid_claims_direct_from_wd_by_precision.keys()
-
-                    if len(precisions) == 0:
-                        highest_precisions = 0
-                    else:
-                        highest_precisions = max(precisions)
-
                     if (new_item_precision > highest_precisions):
                         self.item_new_field.claims.remove(prop)
+                        get_claim_index(self.item_new_field).invalidate(prop)
                     self.item_new_field = add_new_field_to_item_wbi(
                         self.item_new_field,
                         self.property_for_new_field,
@@ -67,14 +63,9 @@ class PropertyProcessorDates(BasePropertyProcessor):
                 item_date = self.row_new_fields[self.column]
                 item_date: dict
                 prop = item_date.get('property')
-                if (item_date not in qid_claims_direct_from_wd):
+                keys, highest_precisions = summary.get(prop, (set(), 0))
+                if time_value_key(item_date) not in keys:
                     new_item_precision = item_date.get('precision', 0)
-                    get_qid_claims_direct_from_wd_by_precision = self.get_qid_claims_direct_from_wd_by_precision(prop)
-                    precisions = get_qid_claims_direct_from_wd_by_precision.keys()
-                    if len(precisions) == 0:
-                        highest_precisions = 0
-                    else:
-                        highest_precisions = max(precisions)
                     if (new_item_precision > highest_precisions):
                         self.item_new_field = add_new_field_to_item_wbi(
                             self.item_new_field,
@@ -0,0 +1,132 @@
+from typing import Union, TYPE_CHECKING
+
+from wikibaseintegrator import WikibaseIntegrator
+
+from property_processor.property_processor import BasePropertyProcessor
+from property_processor.property_processor_370a import PropertyProcessor370a
+from property_processor.property_processor_370b import PropertyProcessor370b
+from property_processor.property_processor_370f import PropertyProcessor370f
+from property_processor.property_processor_372a import PropertyProcessor372a
+from property_processor.property_processor_374a import PropertyProcessor374a
+from property_processor.property_processor_377a import PropertyProcessor377a
+from property_processor.property_processor_dates import PropertyProcessorDates
+from property_processor.property_processor_one import PropertyProcessorOne
+
+if TYPE_CHECKING:
+    from context import PipelineContext
+
+# processors of list columns, new column handlers are registered here
+PROPERTY_PROCESSORS: dict[str, type[BasePropertyProcessor]] = {
+    '374a': PropertyProcessor374a,
+    '372a': PropertyProcessor372a,
+    '370a': PropertyProcessor370a,
+    '370b': PropertyProcessor370b,
+    '370f': PropertyProcessor370f,
+    '377a': PropertyProcessor377a,
+}
+
+
+class PropertyProcessorRegistry:
+    """
+    Maps columns to property processors and keeps one instance of every processor class.
+
+    The instances are reused for all rows and columns; ``get`` resets them with the state
+    of the current column instead of constructing a new processor each time.
+
+    :ivar processor_classes: Processors of list columns by column name.
+    :type processor_classes: dict[str, type[BasePropertyProcessor]]
+    :ivar context: Pipeline context passed to the processors.
+    :type context: PipelineContext
+    :ivar instances: The created processors by class.
+    :type instances: dict[type[BasePropertyProcessor], BasePropertyProcessor]
+    """
+
+    def __init__(self, processor_classes: Union[dict[str, type[BasePropertyProcessor]], None] = None,
+                 context: 'PipelineContext' = None):
+        """
+        :param processor_classes: Processors of list columns by column name, ``PROPERTY_PROCESSORS`` if not set.
+        :type processor_classes: Union[dict[str, type[BasePropertyProcessor]], None]
+        :param context: Pipeline context passed to the processors.
+        :type context: PipelineContext
+        """
+        self.processor_classes: dict[str, type[BasePropertyProcessor]] = dict(
+            PROPERTY_PROCESSORS if processor_classes is None else processor_classes)
+        self.context: 'PipelineContext' = context
+        self.instances: dict[type[BasePropertyProcessor], BasePropertyProcessor] = {}
+
+    def register(self, column: str, processor_class: type[BasePropertyProcessor]):
+        """
+        Registers the processor of a list column.
+
+        :param column: The column name.
+        :type column: str
+        :param processor_class: The processor handling the column.
+        :type processor_class: type[BasePropertyProcessor]
+        :return: None
+        """
+        self.processor_classes[column] = processor_class
+
+    def set_context(self, context: 'PipelineContext'):
+        """
+        Sets the pipeline context of the registry and of the processors created so far.
+
+        :param context: Pipeline context passed to the processors.
+        :type context: PipelineContext
+        :return: None
+        """
+        self.context = context
+        for processor in self.instances.values():
+            processor.context = context
+
+    def get_processor_class(self, column: str, value, time_fields: bool) -> Union[type[BasePropertyProcessor], None]:
+        """
+        Returns the processor class handling a prepared value of the column.
+
+        :param column: The column name.
+        :type column: str
+        :param value: The prepared value of the column (see ``prepare_column_of_content``).
+        :param time_fields: True if the value holds dates.
+        :type time_fields: bool
+        :return: The processor class, or None if no processor handles the value.
+        :rtype: Union[type[BasePropertyProcessor], None]
+        """
+        if type(value) is list and column in self.processor_classes:
+            return self.processor_classes[column]
+        if time_fields:
+            return PropertyProcessorDates
+        if type(value) is list:
+            return None
+        return PropertyProcessorOne
+
+    def get(self, column: str, row_new_fields: dict, claim_direct_from_wd, property_for_new_field,
+            item_new_field, wbi: WikibaseIntegrator, time_fields: bool = False) -> Union[BasePropertyProcessor, None]:
+        """
+        Returns the processor for the column, reset with the state of the current row.
+
+        :param column: The column name.
+        :type column: str
+        :param row_new_fields: The row with the prepared value of the column.
+        :type row_new_fields: dict
+        :param claim_direct_from_wd: Values of the property already on the item.
+        :param property_for_new_field: The property of the column.
+        :param item_new_field: The item to add the values to.
+        :param wbi: WikibaseIntegrator used by the processor.
+        :type wbi: WikibaseIntegrator
+        :param time_fields: True if the value holds dates.
+        :type time_fields: bool
+        :return: The processor, or None if no processor handles the value.
+        :rtype: Union[BasePropertyProcessor, None]
+        """
+        processor_class = self.get_processor_class(column, row_new_fields[column], time_fields)
+        if processor_class is None:
+            return None
+        processor = self.instances.get(processor_class)
+        if processor is None:
+            processor = processor_class(column=column, row_new_fields=row_new_fields,
+                                        claim_direct_from_wd=claim_direct_from_wd,
+                                        property_for_new_field=property_for_new_field,
+                                        item_new_field=item_new_field, wbi=wbi, context=self.context)
+            self.instances[processor_class] = processor
+        else:
+            processor.reset(column, row_new_fields, claim_direct_from_wd, property_for_new_field, item_new_field, wbi)
+        return processor
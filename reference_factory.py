@@ -0,0 +1,77 @@
+"""
+Reference blocks of the claims added by the bot.
+
+Every claim gets the reference "stated in (P248) NK ČR AUT, NK ČR AUT ID (P691), retrieved
+(P813)". Building the three snaks from datatype objects for every added claim means
+formatting the date and round-tripping each snak through JSON. The ``ReferenceFactory``
+builds the P248 and P813 snaks once per run (so all references of a run carry the same
+date) and the P691 snak once per NK ČR ID; each claim gets its own ``References`` holding
+the shared snaks.
+"""
+
+from datetime import datetime
+from typing import Union
+
+from wikibaseintegrator.datatypes import Item, ExternalID, Time
+from wikibaseintegrator.models import References, Reference, Snaks, Snak
+from wikibaseintegrator.wbi_enums import WikibaseTimePrecision
+
+QID_NKCR_AUT = 'Q13550863'
+
+
+class ReferenceFactory:
+    """
+    Builds the reference block of added claims from cached snaks.
+
+    :ivar run_date: The retrieved date (P813) of all references.
+    :type run_date: datetime
+    :ivar stated_in: The stated in (P248) snak.
+    :type stated_in: Snak
+    :ivar retrieved: The retrieved (P813) snak.
+    :type retrieved: Snak
+    """
+
+    def __init__(self, run_date: Union[datetime, None] = None):
+        """
+        :param run_date: The retrieved date of all references, now if not set.
+        :type run_date: Union[datetime, None]
+        """
+        self.run_date: datetime = run_date or datetime.now()
+        self.stated_in: Snak = _snak(Item(value=QID_NKCR_AUT, prop_nr='P248'))
+        self.retrieved: Snak = _snak(Time(time=self.run_date.strftime('+%Y-%m-%dT00:00:00Z'), prop_nr='P813',
+                                          precision=WikibaseTimePrecision.DAY))
+        self._nkcr_aut: Union[str, None] = None
+        self._nkcr_aut_snak: Union[Snak, None] = None
+
+    def nkcr_aut_snak(self, nkcr_aut: str) -> Snak:
+        """
+        Returns the NK ČR AUT ID (P691) snak; the last one is kept, as one record adds several claims.
+
+        :param nkcr_aut: The NK ČR AUT ID.
+        :type nkcr_aut: str
+        :return: The snak.
+        :rtype: Snak
+        """
+        if nkcr_aut != self._nkcr_aut:
+            self._nkcr_aut_snak = _snak(ExternalID(value=nkcr_aut, prop_nr='P691'))
+            self._nkcr_aut = nkcr_aut
+        return self._nkcr_aut_snak
+
+    def references(self, nkcr_aut: str) -> References:
+        """
+        Returns a new reference block (P248, P691, P813) for a claim sourced from the record.
+
+        :param nkcr_aut: The NK ČR AUT ID of the record.
+        :type nkcr_aut: str
+        :return: The references of one claim.
+        :rtype: References
+        """
+        snaks = Snaks()
+        snaks.add(self.stated_in)
+        snaks.add(self.nkcr_aut_snak(nkcr_aut))
+        snaks.add(self.retrieved)
+        return References().add(Reference(snaks=snaks))
+
+
+def _snak(claim) -> Snak:
+    return Snak().from_json(claim.get_json()['mainsnak'])
@@ -0,0 +1,214 @@
+"""
+Maxlag-aware pacing of Wikidata edits.
+
+The ``WriteScheduler`` paces the background writer with a token bucket. The rate grows
+additively while edits go through and is cut multiplicatively whenever the API reports
+replication lag over ``maxlag`` or asks the bot to back off (``Retry-After``). The rate
+settles close to the highest rate the servers currently sustain instead of sleeping a
+fixed time after each failure. Lag is read from the responses of the login session
+through a requests response hook, so it also sees the retries wikibaseintegrator does
+on its own.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Union
+
+import requests
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the number of operations per second.
+
+    :ivar rate: Tokens added per second.
+    :type rate: float
+    :ivar capacity: Maximum number of tokens (the largest burst).
+    :type capacity: float
+    :ivar tokens: Tokens currently available (negative when reserved ahead).
+    :type tokens: float
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        :param rate: Tokens added per second.
+        :type rate: float
+        :param capacity: Maximum number of tokens (the largest burst).
+        :type capacity: float
+        :param clock: Monotonic clock, replaceable in tests.
+        :type clock: Callable[[], float]
+        :param sleep: Sleep function, replaceable in tests.
+        :type sleep: Callable[[float], None]
+        """
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated: float = clock()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        """
+        Changes the rate; tokens collected so far are kept.
+
+        :param rate: Tokens added per second.
+        :type rate: float
+        :return: None
+        """
+        with self.lock:
+            self._refill()
+            self.rate = rate
+
+    def acquire(self):
+        """
+        Takes one token, waiting until it is available.
+
+        The token is reserved right away (the bucket may go negative), so concurrent
+        callers queue up behind each other and each sleeps exactly once.
+
+        :return: None
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            self.sleep(wait)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class WriteScheduler:
+    """
+    Adaptive (AIMD) rate control of edits on top of a ``TokenBucket``.
+
+    :ivar maxlag: The maxlag parameter sent with every edit (seconds).
+    :type maxlag: int
+    :ivar rate: Current edit rate (edits per second).
+    :type rate: float
+    :ivar min_rate: Lower bound of the rate.
+    :type min_rate: float
+    :ivar max_rate: Upper bound of the rate.
+    :type max_rate: float
+    :ivar increase: Rate added after every successful edit.
+    :type increase: float
+    :ivar decrease: Factor the rate is multiplied by when the API is lagged.
+    :type decrease: float
+    :ivar paused_until: Clock time before which no edit is sent.
+    :type paused_until: float
+    :ivar throttled: Number of responses that reported lag or asked to retry later.
+    :type throttled: int
+    """
+
+    def __init__(self, maxlag: int = 5, rate: float = 1.0, min_rate: float = 0.05, max_rate: float = 5.0,
+                 increase: float = 0.05, decrease: float = 0.5, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        :param maxlag: The maxlag parameter sent with every edit (seconds).
+        :type maxlag: int
+        :param rate: Initial edit rate (edits per second).
+        :type rate: float
+        :param min_rate: Lower bound of the rate.
+        :type min_rate: float
+        :param max_rate: Upper bound of the rate.
+        :type max_rate: float
+        :param increase: Rate added after every successful edit.
+        :type increase: float
+        :param decrease: Factor the rate is multiplied by when the API is lagged.
+        :type decrease: float
+        :param clock: Monotonic clock, replaceable in tests.
+        :type clock: Callable[[], float]
+        :param sleep: Sleep function, replaceable in tests.
+        :type sleep: Callable[[float], None]
+        """
+        self.maxlag: int = maxlag
+        self.rate: float = rate
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self.clock = clock
+        self.sleep = sleep
+        self.paused_until: float = 0.0
+        self.throttled: int = 0
+        self.bucket = TokenBucket(rate, clock=clock, sleep=sleep)
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Waits until the next edit may be sent.
+
+        :return: None
+        """
+        wait = self.paused_until - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+        self.bucket.acquire()
+
+    def observe(self, lag: Union[float, None] = None, retry_after: Union[float, None] = None, edit: bool = False):
+        """
+        Adjusts the rate after a response.
+
+        :param lag: Replication lag reported by the API (seconds), if any.
+        :type lag: Union[float, None]
+        :param retry_after: Time the API asked to wait (seconds), if any.
+        :type retry_after: Union[float, None]
+        :param edit: True if the response belongs to an edit request (POST).
+        :type edit: bool
+        :return: None
+        """
+        with self.lock:
+            if retry_after is not None or (lag is not None and lag > self.maxlag):
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                pause = retry_after if retry_after is not None else lag
+                self.paused_until = max(self.paused_until, self.clock() + pause)
+                log.info('api lagged (lag: ' + str(lag) + ', retry-after: ' + str(retry_after)
+                         + '), edit rate: ' + format(self.rate, '.3f') + '/s')
+            elif edit:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                return
+            self.bucket.set_rate(self.rate)
+
+    def response_hook(self, response: requests.Response, *args, **kwargs):
+        """
+        Requests response hook reading ``X-Database-Lag`` and ``Retry-After`` headers.
+
+        :param response: A response of the MediaWiki API.
+        :type response: requests.Response
+        :return: None
+        """
+        self.observe(lag=_header_seconds(response, 'X-Database-Lag'),
+                     retry_after=_header_seconds(response, 'Retry-After'),
+                     edit=response.request is not None and response.request.method == 'POST')
+
+    def install(self, session: requests.Session):
+        """
+        Adds the response hook to the session (once).
+
+        :param session: Session of the bot login (``Login.get_session()``).
+        :type session: requests.Session
+        :return: None
+        """
+        hooks = session.hooks.setdefault('response', [])
+        if self.response_hook not in hooks:
+            hooks.append(self.response_hook)
+
+
+def _header_seconds(response: requests.Response, name: str) -> Union[float, None]:
+    value = response.headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,338 @@
+"""
+Sharded execution of the main loop.
+
+Rows are split across worker processes by a stable hash of the QID of the item they
+edit, so one item is never written by two workers at once. The parent reads the input
+once and passes every worker the rows of its shard. Workers are forked after the
+Loader finished, which lets them share the read-only ``PipelineContext`` copy-on-write.
+Each worker returns a ``ShardResult`` with its counters and tallies that the parent
+merges at the end of the run. The same target QID is used to group rows of one worker
+that edit the same item.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Union, TYPE_CHECKING
+
+import pandas
+
+from cleaners import clean_qid
+from nkcr_exceptions import BadItemException
+
+if TYPE_CHECKING:
+    from context import PipelineContext
+    from delta import DeltaIndex
+    from ledger import SyncLedger
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ShardResult:
+    """
+    Outcome of one shard of the main loop.
+
+    Attributes:
+        shard: Index of the shard.
+        count: Number of rows the shard went through.
+        inserts: Number of items the shard wrote.
+        not_found_occupations: Tally of occupations not found in the shard.
+        not_found_places: Tally of places not found in the shard.
+        log_file: Edit journal written by the shard.
+        stopped: True if the shard stopped early (``--max-runtime``).
+        error: Error message if the shard failed.
+    """
+    shard: int = 0
+    count: int = 0
+    inserts: int = 0
+    not_found_occupations: dict = field(default_factory=dict)
+    not_found_places: dict = field(default_factory=dict)
+    log_file: Union[str, None] = None
+    stopped: bool = False
+    error: Union[str, None] = None
+
+
+def shard_file_name(file_name: str, shard: int) -> str:
+    """
+    Returns the per-shard variant of a file name, e.g. ``debug.csv`` -> ``debug.shard2.csv``.
+
+    :param file_name: The file name used by a single-process run.
+    :type file_name: str
+    :param shard: Index of the shard.
+    :type shard: int
+    :return: The file name of the shard.
+    :rtype: str
+    """
+    root, extension = os.path.splitext(file_name)
+    return root + '.shard' + str(shard) + extension
+
+
+def get_target_qid(row: dict, context: 'PipelineContext') -> Union[str, None]:
+    """
+    Returns the QID of the item the row is going to edit.
+
+    That is the QID from the 0247a-wikidata column, or the item that already has the
+    NK ČR ID of the row.
+
+    :param row: A row of the NK ČR export.
+    :type row: dict
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :return: The QID, or None if the row does not map to any item.
+    :rtype: Union[str, None]
+    """
+    qid = row.get('0247a-wikidata')
+    # sharding runs on raw chunks, where empty cells are NaN
+    if isinstance(qid, str) and qid != '':
+        try:
+            return clean_qid(qid)
+        except BadItemException:
+            return None
+    item = context.non_deprecated_items.get(row['_id'])
+    if item is None:
+        return None
+    return item['qid']
+
+
+def group_rows_by_target(rows: list[dict], context: 'PipelineContext') -> list[tuple[Union[str, None], list[dict]]]:
+    """
+    Groups rows that edit the same item, so the item is loaded and written only once.
+
+    Groups are ordered by their first row; rows without a target item stay on their own.
+
+    :param rows: Rows of the NK ČR export (a window of the current chunk).
+    :type rows: list[dict]
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :return: Pairs of the target QID and the rows editing it.
+    :rtype: list[tuple[Union[str, None], list[dict]]]
+    """
+    groups = []
+    by_qid = {}
+    for row in rows:
+        qid = get_target_qid(row, context)
+        if qid is None:
+            groups.append((None, [row]))
+        elif qid in by_qid:
+            by_qid[qid].append(row)
+        else:
+            by_qid[qid] = [row]
+            groups.append((qid, by_qid[qid]))
+    return groups
+
+
+def apply_group(rows: list[dict], apply_row: Callable, writer, ledger: Union['SyncLedger', None] = None,
+                row_hashes: Union[dict, None] = None, delta_index: Union['DeltaIndex', None] = None) -> bool:
+    """
+    Applies rows editing the same item to one loaded item and queues a single write with a combined summary.
+
+    Rows that failed (or whose write failed) are dropped from the delta index, so the next delta run offers them again.
+
+    :param rows: Rows of one group of ``group_rows_by_target``.
+    :type rows: list[dict]
+    :param apply_row: Applies a row to the item loaded by an earlier row of the group (None for the first row),
+        returns the checked item (None if there is nothing to save), whether it changed, the changed properties
+        and whether the row failed.
+    :type apply_row: Callable[[dict, Union[ItemEntity, None]], tuple[Union[ItemEntity, None], bool, list[str], bool]]
+    :param writer: Queues the edit (``ItemWriter`` or ``PlanWriter``).
+    :param ledger: Records the written revision of every checked row, if set.
+    :type ledger: Union[SyncLedger, None]
+    :param row_hashes: Hashes of the rows by NK ČR ID, recorded in the ledger.
+    :type row_hashes: Union[dict, None]
+    :param delta_index: Drops the failed rows, if set.
+    :type delta_index: Union[DeltaIndex, None]
+    :return: True if an edit was queued.
+    :rtype: bool
+    """
+    item = None
+    changed = False
+    change_text_array = []
+    checked = []
+    for row in rows:
+        row_item, row_changed, row_changes, row_failed = apply_row(row, item)
+        if row_failed and delta_index is not None:
+            delta_index.discard(row['_id'])
+        if row_item is None:
+            continue
+        item = row_item
+        changed = changed or row_changed
+        change_text_array.extend(row_changes)
+        checked.append(row['_id'])
+
+    def on_written(written_item):
+        if ledger is not None:
+            for nkcr_aut in checked:
+                ledger.record(nkcr_aut, row_hashes[nkcr_aut], written_item.id, written_item.lastrevid)
+
+    def on_failed(failed_item):
+        if delta_index is not None:
+            for nkcr_aut in checked:
+                delta_index.discard(nkcr_aut)
+
+    if item is None:
+        return False
+    if changed:
+        writer.submit(item, "Update NK ČR – " + ', '.join(set(change_text_array)), on_written, on_failed)
+        return True
+    on_written(item)
+    return False
+
+
+def shard_of(key: Union[str, None], shards: int) -> int:
+    """
+    Maps a key to a shard using CRC32, which is stable across processes and runs
+    (unlike the salted built-in ``hash``).
+
+    :param key: The QID of the target item (or another stable key of the row).
+    :type key: Union[str, None]
+    :param shards: Number of shards.
+    :type shards: int
+    :return: Index of the shard.
+    :rtype: int
+    """
+    if key is None:
+        key = ''
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def filter_chunk_for_shard(chunk: pandas.DataFrame, context: 'PipelineContext', shard: int, shards: int) -> pandas.DataFrame:
+    """
+    Returns the rows of the chunk that belong to the given shard.
+
+    Rows without a target item are sharded by their NK ČR ID.
+
+    :param chunk: A chunk of NK ČR records.
+    :type chunk: pandas.DataFrame
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :param shard: Index of the shard.
+    :type shard: int
+    :param shards: Number of shards.
+    :type shards: int
+    :return: The rows of the shard.
+    :rtype: pandas.DataFrame
+    """
+    return partition_chunk(chunk, context, shards)[shard]
+
+
+def merge_tallies(target: dict, source: dict):
+    """
+    Adds the counts of one not-found tally to another.
+
+    :param target: The tally to update.
+    :type target: dict
+    :param source: The tally to add.
+    :type source: dict
+    :return: None
+    """
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+
+
+def partition_chunk(chunk: pandas.DataFrame, context: 'PipelineContext', shards: int) -> list[pandas.DataFrame]:
+    """
+    Splits a chunk into the rows of every shard (see ``filter_chunk_for_shard``) with one pass over it.
+
+    :param chunk: A chunk of NK ČR records.
+    :type chunk: pandas.DataFrame
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :param shards: Number of shards.
+    :type shards: int
+    :return: The rows of every shard, ordered by shard.
+    :rtype: list[pandas.DataFrame]
+    """
+    keys = [get_target_qid(row, context) or row['_id'] for row in chunk[['_id', '0247a-wikidata']].to_dict('records')]
+    assigned = pandas.Series([shard_of(key, shards) for key in keys], index=chunk.index, dtype=int)
+    return [chunk[assigned == shard] for shard in range(shards)]
+
+
+def _iter_chunk_queue(chunk_queue: multiprocessing.Queue) -> Iterator[pandas.DataFrame]:
+    while True:
+        chunk = chunk_queue.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _run_shard(worker: Callable[[int, Iterator[pandas.DataFrame]], ShardResult], shard: int,
+               chunk_queue: multiprocessing.Queue, results: multiprocessing.Queue):
+    try:
+        result = worker(shard, _iter_chunk_queue(chunk_queue))
+    except Exception as e:
+        log.exception('shard ' + str(shard) + ' failed')
+        result = ShardResult(shard=shard, error=str(e))
+    results.put(result)
+
+
+def _put_chunk(chunk_queue: multiprocessing.Queue, chunk: Union[pandas.DataFrame, None],
+               process: multiprocessing.Process):
+    # a worker that stopped early (finished shard, --max-runtime, error) does not take its chunks any more
+    while process.is_alive():
+        try:
+            chunk_queue.put(chunk, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+def run_sharded(worker: Callable[[int, Iterator[pandas.DataFrame]], ShardResult], shards: int,
+                chunks: Iterable[pandas.DataFrame], context: 'PipelineContext',
+                queue_size: int = 4) -> list[ShardResult]:
+    """
+    Runs ``worker(shard, chunks)`` in a forked process for every shard and collects the results.
+
+    The processes are forked (not spawned), so everything the parent loaded before the
+    call is shared with the workers copy-on-write. They are not daemonic, so a worker can
+    still start its own process pool. The input is read and parsed only once, by the parent:
+    it splits every chunk by shard and passes the parts to the workers through bounded queues.
+
+    :param worker: Function processing the chunks of one shard.
+    :type worker: Callable[[int, Iterator[pandas.DataFrame]], ShardResult]
+    :param shards: Number of shards.
+    :type shards: int
+    :param chunks: Chunks of the whole input; they are read after the workers were forked.
+    :type chunks: Iterable[pandas.DataFrame]
+    :param context: The loaded pipeline context.
+    :type context: PipelineContext
+    :param queue_size: Maximum number of chunks waiting for one worker.
+    :type queue_size: int
+    :return: Results ordered by shard; a shard that died without a result has ``error`` set.
+    :rtype: list[ShardResult]
+    """
+    mp_context = multiprocessing.get_context('fork')
+    results = mp_context.Queue()
+    chunk_queues = [mp_context.Queue(maxsize=queue_size) for _ in range(shards)]
+    processes = [mp_context.Process(target=_run_shard, args=(worker, shard, chunk_queues[shard], results),
+                                    name='shard-' + str(shard))
+                 for shard in range(shards)]
+    for process in processes:
+        process.start()
+
+    for chunk in chunks:
+        for shard, part in enumerate(partition_chunk(chunk, context, shards)):
+            if len(part) > 0:
+                _put_chunk(chunk_queues[shard], part, processes[shard])
+    for shard in range(shards):
+        _put_chunk(chunk_queues[shard], None, processes[shard])
+
+    collected = {}
+    while len(collected) < shards:
+        try:
+            result = results.get(timeout=10)
+            collected[result.shard] = result
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes) and results.empty():
+                break
+    for process in processes:
+        process.join()
+    for chunk_queue in chunk_queues:
+        # chunks left for a worker that stopped early are dropped, do not wait for them at exit
+        chunk_queue.cancel_join_thread()
+
+    return [collected.get(shard, ShardResult(shard=shard, error='worker exited without a result'))
+            for shard in range(shards)]
@@ -2,6 +2,7 @@
 # from typing import Union
 
 from context import PipelineContext
+from marc_reader import is_marc_xml_file, load_nkcr_items_from_marc, load_nkcr_items_from_marc_parallel
 from memory_profiler import log_memory, MemoryTracker, get_object_size_mb
 from tools import *
 log = logging.getLogger(__name__)
@@ -21,6 +22,8 @@ class Loader:
     :type limit: int
     :ivar file_name: Name of the file associated with the data.
     :type file_name: str
+    :ivar marc_workers: Number of processes parsing the MARC XML dump.
+    :type marc_workers: int
     """
     limit: int = 100000
 
@@ -35,6 +38,7 @@ class Loader:
             typically used for data storage or retrieval purposes.
         """
         self.file_name: str = ''
+        self.marc_workers: int = 1
 
     def set_limit(self, limit: int):
         """
@@ -56,6 +60,33 @@ class Loader:
         """
         self.file_name = file_name
 
+    def set_marc_workers(self, marc_workers: int):
+        """
+        Sets the number of processes used to parse the MARC XML dump.
+
+        :param marc_workers: Number of worker processes, 1 parses in the current process.
+        :type marc_workers: int
+        """
+        self.marc_workers = marc_workers
+
+    def load_records(self):
+        """
+        Opens the NK ČR records from the input file (CSV export or MARC XML dump).
+
+        :return: An iterator of DataFrame chunks.
+        """
+        if is_marc_xml_file(self.file_name) and self.marc_workers > 1:
+            log_with_date_time('nkcr marc xml opened for streaming, workers: ' + str(self.marc_workers))
+            return load_nkcr_items_from_marc_parallel(self.file_name, self.marc_workers)
+        elif is_marc_xml_file(self.file_name):
+            log_with_date_time('nkcr marc xml opened for streaming')
+            return load_nkcr_items_from_marc(self.file_name)
+        else:
+            with MemoryTracker('Loading CSV chunks'):
+                chunks = load_nkcr_items(self.file_name)
+            log_with_date_time('nkcr csv read')
+            return chunks
+
     def load(self) -> PipelineContext:
         """
         Loads various datasets and returns a PipelineContext containing all data.
@@ -80,6 +111,14 @@ class Loader:
         log_with_date_time('occupations read, size: ' + str(len(context.name_to_nkcr)))
         get_object_size_mb(context.name_to_nkcr, 'name_to_nkcr')
 
+        with MemoryTracker('Loading occupation classes'):
+            occupation_classes = load_sparql_query_by_chunks(limit_for_occupation, get_occupation_classes, 'occupation_classes')
+        # subclass checks of occupations from the export become in-memory lookups
+        context.set_class_closure(Config.class_occupation, qid_numbers(occupation_classes),
+                                  qid_numbers(context.name_to_nkcr.values()))
+        del occupation_classes
+        log_with_date_time('occupation classes read, size: ' + str(len(context.class_closures[Config.class_occupation])))
+
         with MemoryTracker('Loading language dict'):
             context.language_dict = load_language_dict_csv()
         log_with_date_time('loaded language dict from github')
@@ -106,12 +145,17 @@ class Loader:
         log_with_date_time('non deprecated items read, size: ' + str(len(context.non_deprecated_items)))
         get_object_size_mb(context.non_deprecated_items, 'non_deprecated_items')
 
+        with MemoryTracker('Loading deprecated_nkcr'):
+            deprecated_nkcr = load_sparql_query_by_chunks(self.limit, get_all_deprecated_nkcr, 'deprecated_nkcr')
+        # rows whose NK ČR ID is deprecated on their item are rejected before the item is fetched
+        context.set_deprecated_nkcr(split_deprecated_nkcr(deprecated_nkcr))
+        del deprecated_nkcr
+        log_with_date_time('deprecated nkcr read, size: ' + str(len(context.deprecated_nkcr)))
+
         context.qid_to_nkcr = make_qid_database(context.non_deprecated_items)
         log_with_date_time('qid_to_nkcr read, size: ' + str(len(context.qid_to_nkcr)))
 
-        with MemoryTracker('Loading CSV chunks'):
-            context.chunks = load_nkcr_items(self.file_name)
-        log_with_date_time('nkcr csv read')
+        context.chunks = self.load_records()
 
         log_memory('Loader.load() complete')
         return context
@@ -0,0 +1,145 @@
+"""
+Persistent cache of subclass checks.
+
+``is_item_subclass_of_wbi`` asks WDQS whether an item is a subclass (or an instance of a
+subclass) of a class. The answers rarely change, so they are kept across runs in a SQLite
+file: every entry expires after a TTL, the number of entries is limited (the oldest are
+evicted first) and the cache counts its hits and misses. Entries are loaded at startup
+and new answers are written when a checkpoint is committed.
+"""
+
+import logging
+import sqlite3
+import time
+from typing import Callable, Union
+
+log = logging.getLogger(__name__)
+
+
+class SubclassCache:
+    """
+    Subclass check results keyed by (class QID, item QID), persisted in SQLite.
+
+    :ivar file_name: Path of the SQLite file holding the cache.
+    :type file_name: str
+    :ivar ttl: Seconds after which an entry expires.
+    :type ttl: float
+    :ivar max_entries: Maximum number of entries kept in the file.
+    :type max_entries: int
+    :ivar entries: Loaded and new entries: (class QID, item QID) -> (result, time of the check).
+    :type entries: dict[tuple[str, str], tuple[bool, float]]
+    :ivar staged: Keys of new entries waiting for ``flush()``.
+    :type staged: set[tuple[str, str]]
+    :ivar hits: Number of lookups answered by the cache.
+    :type hits: int
+    :ivar misses: Number of lookups not in the cache (or expired).
+    :type misses: int
+    """
+    # shard workers write to the same file, wait for their locks instead of failing
+    connect_timeout: float = 60.0
+
+    def __init__(self, file_name: str, ttl: float = 30 * 24 * 3600, max_entries: int = 100000,
+                 clock: Callable[[], float] = time.time):
+        """
+        Opens (or creates) the cache file.
+
+        :param file_name: Path of the SQLite file holding the cache.
+        :type file_name: str
+        :param ttl: Seconds after which an entry expires.
+        :type ttl: float
+        :param max_entries: Maximum number of entries kept in the file.
+        :type max_entries: int
+        :param clock: Wall clock, replaceable in tests.
+        :type clock: Callable[[], float]
+        """
+        self.file_name: str = file_name
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.clock = clock
+        self.entries: dict[tuple[str, str], tuple[bool, float]] = {}
+        self.staged: set[tuple[str, str]] = set()
+        self.hits: int = 0
+        self.misses: int = 0
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS subclass ('
+                               'class_qid TEXT NOT NULL, item_qid TEXT NOT NULL, is_subclass INTEGER NOT NULL, '
+                               'checked_at REAL NOT NULL, PRIMARY KEY (class_qid, item_qid)) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS subclass_checked_at ON subclass (checked_at)')
+
+    def load(self):
+        """
+        Drops expired entries from the file and loads the rest.
+
+        :return: None
+        """
+        expired_before = self.clock() - self.ttl
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.execute('DELETE FROM subclass WHERE checked_at < ?', (expired_before,))
+            for class_qid, item_qid, is_subclass, checked_at in connection.execute(
+                    'SELECT class_qid, item_qid, is_subclass, checked_at FROM subclass'):
+                self.entries[(class_qid, item_qid)] = (bool(is_subclass), checked_at)
+        log.info('subclass cache loaded, entries: ' + str(len(self.entries)))
+
+    def get(self, class_qid: str, item_qid: str) -> Union[bool, None]:
+        """
+        Returns the cached result of a subclass check.
+
+        :param class_qid: The QID of the class.
+        :type class_qid: str
+        :param item_qid: The QID of the checked item.
+        :type item_qid: str
+        :return: The result, or None if it is not cached or expired.
+        :rtype: Union[bool, None]
+        """
+        entry = self.entries.get((class_qid, item_qid))
+        if entry is None or entry[1] < self.clock() - self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, class_qid: str, item_qid: str, is_subclass: bool):
+        """
+        Stores the result of a subclass check; it is written by ``flush()``.
+
+        :param class_qid: The QID of the class.
+        :type class_qid: str
+        :param item_qid: The QID of the checked item.
+        :type item_qid: str
+        :param is_subclass: The result of the check.
+        :type is_subclass: bool
+        :return: None
+        """
+        self.entries[(class_qid, item_qid)] = (is_subclass, self.clock())
+        self.staged.add((class_qid, item_qid))
+
+    def flush(self):
+        """
+        Writes the new entries and evicts the oldest entries over ``max_entries``.
+
+        :return: None
+        """
+        if not self.staged:
+            return
+        rows = [key + (int(self.entries[key][0]), self.entries[key][1]) for key in self.staged]
+        with sqlite3.connect(self.file_name, timeout=self.connect_timeout) as connection:
+            connection.executemany('INSERT OR REPLACE INTO subclass (class_qid, item_qid, is_subclass, checked_at) '
+                                   'VALUES (?, ?, ?, ?)', rows)
+            count = connection.execute('SELECT COUNT(*) FROM subclass').fetchone()[0]
+            if count > self.max_entries:
+                connection.execute('DELETE FROM subclass WHERE (class_qid, item_qid) IN ('
+                                   'SELECT class_qid, item_qid FROM subclass ORDER BY checked_at LIMIT ?)',
+                                   (count - self.max_entries,))
+        self.staged = set()
+
+    def stats(self) -> str:
+        """
+        Returns the hit and miss statistics for the log.
+
+        :return: The statistics.
+        :rtype: str
+        """
+        lookups = self.hits + self.misses
+        ratio = self.hits / lookups if lookups > 0 else 0.0
+        return ('subclass cache hits: ' + str(self.hits) + ', misses: ' + str(self.misses)
+                + ', hit ratio: ' + format(ratio, '.2f') + ', entries: ' + str(len(self.entries)))
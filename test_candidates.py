@@ -0,0 +1,89 @@
+import pandas
+
+from candidates import CandidateEngine, explode_column
+from cleaners import prepare_column_of_content
+from context import PipelineContext
+
+COLUMNS = ['_id', '100a', '0247a-wikidata', '0247a-isni', '0247a-orcid', '374a', '372a', '377a',
+           '370a', '370b', '370f', '046f', '046g', '678a']
+
+
+def make_context():
+    return PipelineContext(
+        name_to_nkcr={'lékaři': 'Q39631', 'spisovatelé': 'Q36180', 'Praha (Česko)': 'Q1085', 'Brno (Česko)': 'Q14960'},
+        language_dict={'cze': 'Q9056', 'ger': 'Q188'},
+        qid_to_nkcr={'Q1': ['jk01010001'], 'Q2': ['jk01010002']},
+        non_deprecated_items={
+            'jk01010001': {'qid': 'Q1', 'isni': ['0000000121200982'], 'orcid': [], 'birth': ['1900'], 'death': []},
+            'jk01010002': {'qid': 'Q2', 'isni': [], 'orcid': [], 'birth': [], 'death': []},
+        },
+        non_deprecated_items_field_of_work_and_occupation={
+            'jk01010001': {'qid': 'Q1', 'field': [], 'occup': ['Q39631']},
+            'jk01010002': {'qid': 'Q2', 'field': [], 'occup': ['Q39631', 'Q36180']},
+        },
+        non_deprecated_items_places={
+            'jk01010001': {'qid': 'Q1', 'birth': ['Q1085'], 'death': [], 'work': []},
+            'jk01010002': {'qid': 'Q2', 'birth': [], 'death': [], 'work': []},
+        },
+        non_deprecated_items_languages={
+            'jk01010001': {'qid': 'Q1', 'language': ['Q9056']},
+            'jk01010002': {'qid': 'Q2', 'language': ['Q9056']},
+        },
+    )
+
+
+def make_chunk():
+    return pandas.DataFrame([
+        ['jk01010001', 'Abraham, Jiří,', '', '0000 0001 2120 0982', '', 'lékaři|spisovatelé,', '', 'cze$ger',
+         'Praha, Česko', 'Brno, Česko', '', '1900', '', ''],
+        ['jk01010002', 'Abraham, Josef,', '', '', '', 'lékaři|spisovatelé', '', 'cze',
+         '', '', '', '', '', ''],
+        ['jk01010003', 'Adam, Karel,', 'Q3', '', '', 'lékaři', '', '', '', '', '', '', '', ''],
+        ['jk01010004', 'Adámek, Petr,', '', '', '', 'lékaři', '', '', '', '', '', '', '', ''],
+    ], columns=COLUMNS)
+
+
+def test_explode_column_matches_cleaners():
+    context = make_context()
+    chunk = make_chunk()
+    for column in ['0247a-isni', '374a', '377a', '370a', '370b']:
+        exploded = explode_column(chunk, column, context)
+        for row in chunk.to_dict('records'):
+            expected = prepare_column_of_content(column, dict(row), context)
+            expected = expected if type(expected) is list else [expected]
+            assert sorted(exploded[exploded['nkcr'] == row['_id']]['value']) == sorted(v for v in expected if v != '')
+
+
+def test_columns_by_row():
+    engine = CandidateEngine(make_context())
+    candidates = engine.find_candidates(make_chunk())
+
+    assert set(zip(candidates['nkcr'], candidates['column'], candidates['value'])) == {
+        ('jk01010001', '374a', 'Q36180'),
+        ('jk01010001', '377a', 'Q188'),
+        ('jk01010001', '370b', 'Q14960'),
+        ('jk01010003', '374a', 'Q39631'),
+    }
+    assert set(candidates[candidates['nkcr'] == 'jk01010003']['qid']) == {'Q3'}
+    assert set(candidates[candidates['column'] == '370b']['property']) == {'P20'}
+    # jk01010002 has nothing new, jk01010004 is not on Wikidata and names no item
+    assert engine.columns_by_row(make_chunk()) == {'jk01010001': {'374a', '377a', '370b'}, 'jk01010003': {'374a'}}
+
+
+def test_columns_by_row_finds_new_links_once(monkeypatch):
+    engine = CandidateEngine(make_context())
+    calls = []
+    find_new_links = engine.find_new_links
+    monkeypatch.setattr(engine, 'find_new_links', lambda chunk: calls.append(chunk) or find_new_links(chunk))
+
+    assert engine.columns_by_row(make_chunk()) == {'jk01010001': {'374a', '377a', '370b'}, 'jk01010003': {'374a'}}
+    assert len(calls) == 1
+
+
+def test_explode_column_uses_place_index():
+    context = make_context()
+    assert context.place_index is None
+    exploded = explode_column(make_chunk(), '370a', context)
+
+    assert list(exploded['value']) == ['Q1085']
+    assert context.place_index is not None
@@ -0,0 +1,51 @@
+import os
+
+from checkpoint import Checkpoint, find_checkpoint, load_checkpoint, load_context_snapshot, save_checkpoint, \
+    save_context_snapshot
+from context import PipelineContext
+from journal import EditJournal
+
+
+def test_checkpoint_round_trip(tmp_path):
+    file_name = str(tmp_path / 'checkpoint.json')
+    assert load_checkpoint(file_name) is None
+
+    checkpoint = Checkpoint(input_file='aut.xml.gz', position=2000, inserts=15, journal_offset=120,
+                            not_found_places={'Mars': 2})
+    save_checkpoint(checkpoint, file_name)
+
+    assert os.listdir(tmp_path) == ['checkpoint.json']
+    loaded = load_checkpoint(file_name)
+    assert loaded == checkpoint
+    assert loaded.saved_at != ''
+
+
+def test_resume_position_and_journal(tmp_path):
+    file_name = str(tmp_path / 'checkpoint.json')
+    journal = EditJournal(str(tmp_path / 'debug.csv'))
+    journal.reset(header=True)
+    journal.write({'item': 'Q1', 'prop': 'P106', 'value': 'Q36180', 'row': 'jk01010001'})
+    save_checkpoint(Checkpoint(input_file='aut.csv', position=1000, journal_offset=journal.offset()), file_name)
+    # rows after the checkpoint are written again by the resumed run
+    journal.write({'item': 'Q2', 'prop': 'P106', 'value': 'Q36180', 'row': 'jk01010002'})
+    journal.flush()
+
+    assert find_checkpoint(None, 'aut.csv') is None
+    assert find_checkpoint(file_name, 'other.csv') is None
+    checkpoint = find_checkpoint(file_name, 'aut.csv')
+    assert checkpoint.position == 1000
+    assert not checkpoint.finished
+
+    journal.truncate(checkpoint.journal_offset)
+    assert [record['item'] for record in journal.read()] == ['item', 'Q1']
+
+
+def test_context_snapshot_round_trip(tmp_path):
+    file_name = str(tmp_path / 'context.pickle')
+    context = PipelineContext(name_to_nkcr={'lékaři': 'Q39631'}, chunks=iter([]))
+    save_context_snapshot(context, file_name)
+
+    loaded = load_context_snapshot(file_name)
+    assert loaded.name_to_nkcr == {'lékaři': 'Q39631'}
+    assert loaded.chunks is None
+    assert context.chunks is not None
@@ -0,0 +1,145 @@
+from wikibaseintegrator import WikibaseIntegrator
+from wikibaseintegrator.datatypes import Item
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.wbi_enums import ActionIfExists
+
+import tools
+from claim_index import get_claim_index, summarize_time_values, time_value_key
+from cleaners import create_time_dict
+from journal import EditJournal
+from property_processor.property_processor_dates import PropertyProcessorDates
+from tools import get_claim_from_item_by_property_wbi, get_nkcr_auts_from_item_wbi
+
+
+def statement(property_number, datatype, datavalue, rank='normal'):
+    return {'mainsnak': {'snaktype': 'value', 'property': property_number, 'datatype': datatype,
+                         'datavalue': datavalue},
+            'type': 'statement', 'rank': rank, 'id': 'Q1$' + property_number + str(len(str(datavalue)))}
+
+
+def item_value(qid):
+    return {'value': {'entity-type': 'item', 'numeric-id': int(qid[1:]), 'id': qid}, 'type': 'wikibase-entityid'}
+
+
+def time_value(time, precision):
+    return {'time': time, 'timezone': 0, 'before': 0, 'after': 0, 'precision': precision,
+            'calendarmodel': 'http://www.wikidata.org/entity/Q1985727'}
+
+
+def load_item():
+    return ItemEntity(api=WikibaseIntegrator()).from_json(json_data={
+        'type': 'item', 'id': 'Q1', 'lastrevid': 1, 'labels': {}, 'descriptions': {}, 'aliases': {}, 'sitelinks': {},
+        'claims': {
+            'P31': [statement('P31', 'wikibase-item', item_value('Q5'))],
+            'P106': [statement('P106', 'wikibase-item', item_value('Q36180'))],
+            'P691': [statement('P691', 'external-id', {'value': 'jk01010001', 'type': 'string'}),
+                     statement('P691', 'external-id', {'value': 'jk01010002', 'type': 'string'}, 'deprecated')],
+            'P569': [statement('P569', 'time', {'value': time_value('+1900-01-01T00:00:00Z', 11), 'type': 'time'})],
+        },
+    })
+
+
+def test_claim_index_values():
+    item = load_item()
+    index = get_claim_index(item)
+
+    assert get_claim_index(item) is index
+    assert get_claim_from_item_by_property_wbi(item, 'P31') == ['Q5']
+    assert get_claim_from_item_by_property_wbi(item, 'P27') == []
+    assert get_nkcr_auts_from_item_wbi(item) == ['jk01010001', 'jk01010002']
+    assert index.deprecated_values('P691') == {'jk01010002'}
+    assert index.non_deprecated_values('P691') == {'jk01010001'}
+    assert get_claim_from_item_by_property_wbi(item, 'P569')[0]['property'] == 'P569'
+
+
+def test_claim_index_records_added_claims():
+    item = load_item()
+    index = get_claim_index(item)
+    assert not index.has_value('P106', 'Q1930187')
+
+    new_claim = Item(prop_nr='P106', value='Q1930187')
+    item.claims.add(new_claim, action_if_exists=ActionIfExists.APPEND_OR_REPLACE)
+    index.record_added(new_claim)
+
+    assert index.has_value('P106', 'Q1930187')
+    assert get_claim_from_item_by_property_wbi(item, 'P106') == ['Q36180', 'Q1930187']
+    assert index.added_properties == ['P106']
+
+    # an equal claim is updated in place, the item does not get a new claim
+    existing_claim = Item(prop_nr='P31', value='Q5')
+    item.claims.add(existing_claim, action_if_exists=ActionIfExists.APPEND_OR_REPLACE)
+    index.record_added(existing_claim)
+
+    assert index.added_properties == ['P106']
+
+
+def test_time_values_are_not_mutated():
+    item = load_item()
+    value = get_claim_from_item_by_property_wbi(item, 'P569')[0]
+
+    assert value['property'] == 'P569'
+    assert 'property' not in item.claims.get('P569')[0].mainsnak.datavalue['value']
+    assert time_value_key(value) == time_value_key(create_time_dict('P569', '+1900-01-01T00:00:00Z', 11))
+    assert summarize_time_values([value, 'Q5']) == {'P569': ({time_value_key(value)}, 11)}
+
+
+def test_dates_diff(monkeypatch, tmp_path):
+    monkeypatch.setattr(tools, 'journal', EditJournal(str(tmp_path / 'debug.csv')))
+    item = load_item()
+    claims = get_claim_from_item_by_property_wbi(item, 'P569')
+    known = create_time_dict('P569', '+1900-01-01T00:00:00Z', 11)
+    processor = PropertyProcessorDates('046f', {'_id': 'jk01010001', '046f': known}, claims, 'P569', item, None)
+    processor.process()
+    assert len(item.claims.get('P569')) == 1
+
+    year = create_time_dict('P570', '+1950-01-01T00:00:00Z', 9)
+    processor.reset('678a', {'_id': 'jk01010001', '678a': [known, year]}, claims, ['P569', 'P570'], item, None)
+    processor.process()
+    assert len(item.claims.get('P569')) == 1
+    assert get_claim_index(item).added_properties == ['P570']
+
+
+def test_time_value_key_compares_all_fields():
+    value = create_time_dict('P569', '+1900-01-01T00:00:00Z', 11)
+    keys, _ = summarize_time_values([value])['P569']
+
+    assert time_value_key(dict(value)) in keys
+    for field, other in [('timezone', 60), ('before', 1), ('after', 1), ('calendarmodel', 'Q1985786')]:
+        assert time_value_key(dict(value, **{field: other})) not in keys
+    assert time_value_key(value, 'P570') not in keys
+
+
+def test_dates_differing_only_in_timezone(monkeypatch, tmp_path):
+    journal = EditJournal(str(tmp_path / 'debug.csv'))
+    monkeypatch.setattr(tools, 'journal', journal)
+    item = load_item()
+    claims = get_claim_from_item_by_property_wbi(item, 'P569')
+    other = create_time_dict('P569', '+1900-01-01T00:00:00Z', 11, timezone=60)
+
+    # a single date is added only with a higher precision
+    processor = PropertyProcessorDates('046f', {'_id': 'jk01010001', '046f': other}, claims, 'P569', item, None)
+    processor.process()
+    assert journal.read() == []
+
+    # dates from a list are added whenever the item does not have the same value
+    processor.reset('678a', {'_id': 'jk01010001', '678a': [other]}, claims, ['P569', 'P570'], item, None)
+    processor.process()
+    assert [(r['prop'], r['value']) for r in journal.read()] == [('P569', '+1900-01-01T00:00:00Z')]
+
+
+def test_dates_remove_then_add(monkeypatch, tmp_path):
+    monkeypatch.setattr(tools, 'journal', EditJournal(str(tmp_path / 'debug.csv')))
+    item = load_item()
+    item.claims.get('P569')[0].mainsnak.datavalue['value'] = time_value('+1900-00-00T00:00:00Z', 9)
+    claims = get_claim_from_item_by_property_wbi(item, 'P569')
+    day = create_time_dict('P569', '+1900-01-01T00:00:00Z', 11)
+    next_day = create_time_dict('P569', '+1900-01-02T00:00:00Z', 11)
+
+    processor = PropertyProcessorDates('678a', {'_id': 'jk01010001', '678a': [day, next_day]}, claims, 'P569', item,
+                                       None)
+    processor.process()
+
+    # the precision is compared with the dates the item was loaded with, like before the summary: the
+    # year is removed by the first day, the second day (more precise than the year) replaces the first
+    values = [(claim.mainsnak.datavalue['value']['time'], claim.removed) for claim in item.claims.get('P569')]
+    assert sorted(values) == [('+1900-00-00T00:00:00Z', True), ('+1900-01-02T00:00:00Z', False)]
@@ -0,0 +1,76 @@
+import pytest
+from wikibaseintegrator.wbi_exceptions import MissingEntityException
+
+from context import PipelineContext
+import tools
+from tools import get_class_members, is_item_subclass_of_wbi, qid_numbers, resolve_subclasses_of_wbi
+
+
+def test_class_closure_lookup():
+    context = PipelineContext()
+    assert context.get_class_closure_result('Q12737077', 'Q36180') is None
+
+    context.set_class_closure('Q12737077', qid_numbers(['Q36180', 'Q39631']), qid_numbers(['Q36180', 'Q5', 'L1']))
+
+    assert context.get_class_closure_result('Q12737077', 'Q36180') is True
+    assert context.get_class_closure_result('Q12737077', 'Q39631') is True
+    assert context.get_class_closure_result('Q12737077', 'Q5') is False
+    # not covered by the closure, needs a query
+    assert context.get_class_closure_result('Q12737077', 'Q42') is None
+    assert context.get_class_closure_result('Q1', 'Q36180') is None
+
+
+def test_subclass_check_uses_closure():
+    context = PipelineContext()
+    context.set_class_closure('Q12737077', {36180}, {36180, 5})
+
+    assert is_item_subclass_of_wbi('Q36180', 'Q12737077', context)
+    assert not is_item_subclass_of_wbi('Q5', 'Q12737077', context)
+    assert context.subclass_cache == {}
+
+
+def test_batched_subclass_resolution(monkeypatch):
+    context = PipelineContext()
+    context.set_class_closure('Q12737077', {36180}, {36180, 5})
+    queries = []
+
+    def execute_sparql_query(query):
+        queries.append(query)
+        return {'results': {'bindings': [{'item': {'value': 'http://www.wikidata.org/entity/Q42'}}]}}
+
+    monkeypatch.setattr(tools.wbi_helpers, 'execute_sparql_query', execute_sparql_query)
+    resolved = resolve_subclasses_of_wbi(['Q36180', 'Q42', 'Q43', 'Q42', 'Q44', 'x'], 'Q12737077', context,
+                                         batch_size=2)
+
+    assert resolved == 3
+    assert len(queries) == 2
+    assert 'wd:Q42 wd:Q43' in queries[0]
+    assert context.subclass_cache == {'Q12737077': {'Q42': True, 'Q43': False, 'Q44': False}}
+    assert is_item_subclass_of_wbi('Q42', 'Q12737077', context)
+    assert resolve_subclasses_of_wbi(['Q42', 'Q44'], 'Q12737077', context) == 0
+
+
+def test_class_members_are_paged_in_order(monkeypatch):
+    queries = []
+
+    def execute_sparql_query(query, endpoint):
+        queries.append(query)
+        return {'results': {'bindings': [{'item': {'value': 'http://www.wikidata.org/entity/Q36180'}}]}}
+
+    monkeypatch.setattr(tools.wbi_helpers, 'execute_sparql_query', execute_sparql_query)
+
+    assert get_class_members('Q12737077', 1000, 2000) == {'Q36180': True}
+    # LIMIT/OFFSET pages are stable only over an ordered result
+    assert 'ORDER BY ?item LIMIT 1000 OFFSET 2000' in queries[0]
+
+
+def test_offline_subclass_check_does_not_query(monkeypatch):
+    context = PipelineContext(offline=True)
+    context.set_class_closure('Q12737077', {36180}, {36180, 5})
+    context.cache_subclass_result('Q12737077', 'Q43', True)
+    monkeypatch.setattr(tools.wbi_helpers, 'execute_sparql_query', lambda query: pytest.fail('queried offline'))
+
+    assert is_item_subclass_of_wbi('Q36180', 'Q12737077', context)
+    assert is_item_subclass_of_wbi('Q43', 'Q12737077', context)
+    with pytest.raises(MissingEntityException):
+        is_item_subclass_of_wbi('Q42', 'Q12737077', context)
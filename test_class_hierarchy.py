@@ -0,0 +1,72 @@
+from class_hierarchy import ClassHierarchy
+from context import PipelineContext
+from tools import is_item_subclass_of_wbi
+
+
+def make_hierarchy():
+    hierarchy = ClassHierarchy()
+    # writer -> author -> creator -> occupation, with a cycle between two classes
+    hierarchy.add_edge('Q36180', 'P279', 'Q482980')
+    hierarchy.add_edge('Q482980', 'P279', 'Q2500638')
+    hierarchy.add_edge('Q2500638', 'P279', 'Q12737077')
+    hierarchy.add_edge('Q1', 'P279', 'Q2')
+    hierarchy.add_edge('Q2', 'P279', 'Q1')
+    hierarchy.add_edge('Q42', 'P31', 'Q36180')
+    hierarchy.add_edge('Q5', 'P31', 'Q1')
+    hierarchy.add_edge('Q5', 'P106', 'Q36180')
+    return hierarchy
+
+
+def test_class_hierarchy_reachability():
+    hierarchy = make_hierarchy()
+    assert hierarchy.is_subclass_of('Q36180', 'Q12737077') is True
+    assert hierarchy.is_subclass_of('Q42', 'Q12737077') is True
+    # P31/P279+ like the SPARQL queries: a direct instance of the class does not count
+    assert hierarchy.is_subclass_of('Q42', 'Q36180') is False
+    assert hierarchy.is_subclass_of('Q12737077', 'Q36180') is None
+    assert hierarchy.is_subclass_of('Q5', 'Q12737077') is False
+    assert hierarchy.is_subclass_of('Q5', 'Q2') is True
+    assert hierarchy.ancestors(1) == frozenset({1, 2})
+
+
+def test_class_hierarchy_snapshot_and_context(tmp_path):
+    file_name = str(tmp_path / 'class_hierarchy.csv.gz')
+    make_hierarchy().save(file_name)
+    hierarchy = ClassHierarchy()
+    hierarchy.load(file_name)
+    assert hierarchy.superclasses == make_hierarchy().superclasses
+    assert hierarchy.classes == make_hierarchy().classes
+
+    context = PipelineContext()
+    context.set_class_hierarchy(hierarchy)
+    assert is_item_subclass_of_wbi('Q42', 'Q12737077', context)
+    assert not is_item_subclass_of_wbi('Q5', 'Q12737077', context)
+    assert context.subclass_cache == {}
+
+
+def test_class_hierarchy_from_dump(tmp_path):
+    file_name = tmp_path / 'dump.json'
+    file_name.write_text('[\n'
+                         '{"id": "Q36180", "claims": {"P279": [{"rank": "normal", "mainsnak": '
+                         '{"datavalue": {"value": {"id": "Q12737077"}}}}]}},\n'
+                         '{"id": "Q42", "claims": {"P31": [{"rank": "normal", "mainsnak": '
+                         '{"datavalue": {"value": {"id": "Q36180"}}}}]}},\n'
+                         '{"id": "Q43", "claims": {"P31": [{"rank": "normal", "mainsnak": '
+                         '{"datavalue": {"value": {"id": "Q36180"}}}}]}},\n'
+                         '{"id": "Q44", "claims": {"P279": [{"rank": "normal", "mainsnak": '
+                         '{"datavalue": {"value": {"id": "Q5"}}}}], '
+                         '"P31": [{"rank": "normal", "mainsnak": {"datavalue": {"value": {"id": "Q36180"}}}}]}}\n'
+                         ']\n')
+    hierarchy = ClassHierarchy()
+    hierarchy.load_dump(str(file_name), ['Q42'])
+    assert hierarchy.is_subclass_of('Q42', 'Q12737077') is True
+    assert hierarchy.is_subclass_of('Q43', 'Q12737077') is None
+    # Q44 reaches the class through its dropped P31 edge, the hierarchy must not answer False
+    assert hierarchy.is_subclass_of('Q44', 'Q12737077') is None
+
+    snapshot = str(tmp_path / 'class_hierarchy.csv')
+    hierarchy.save(snapshot)
+    loaded = ClassHierarchy()
+    loaded.load(snapshot)
+    assert loaded.is_subclass_of('Q44', 'Q12737077') is None
+    assert loaded.is_subclass_of('Q42', 'Q12737077') is True
@@ -52,3 +52,15 @@ def test_clean_last_comma(clean, result_clean):
 )
 def test_prepare_isni_from_nkcr(isni, result_isni):
     assert cleaners.prepare_isni_from_nkcr(isni, '0247a-isni') == result_isni
+
+
+def test_prepare_dates_from_descriptions():
+    descriptions = ['Narozena 29.2.1900, zemřela 29.2.2000.', 'narozen roku 1899 zemřel 1.2.1950, narozen 3. 4.1890',
+                    'Česká herečka.', None]
+    dates = cleaners.prepare_dates_from_descriptions(descriptions)
+    assert [date['time'] for date in dates[0]] == ['+2000-02-29T00:00:00Z']
+    assert [(date['property'], date['time'], date['precision']) for date in dates[1]] == [
+        ('P569', '+1890-04-03T00:00:00Z', 11), ('P569', '+1899-01-01T00:00:00Z', 9),
+        ('P570', '+1950-02-01T00:00:00Z', 11)]
+    assert dates[2] is None
+    assert dates[3] is None
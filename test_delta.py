@@ -0,0 +1,61 @@
+import pandas
+
+from delta import DeltaIndex
+
+
+def make_chunk(rows):
+    return pandas.DataFrame(rows, columns=['_id', '100a', '374a'])
+
+
+first_export = [
+    ['jk01010001', 'Abraham, Jiří,', 'lékaři'],
+    ['jk01010002', 'Abraham, Josef,', None],
+]
+
+
+def filtered_ids(index, rows, full=False):
+    return list(index.filter_chunk(make_chunk(rows), full)['_id'])
+
+
+def test_delta_index_emits_only_changed_records(tmp_path):
+    file_name = str(tmp_path / 'delta_index.sqlite')
+
+    index = DeltaIndex(file_name)
+    index.load()
+    assert filtered_ids(index, first_export) == ['jk01010001', 'jk01010002']
+    index.commit()
+
+    index = DeltaIndex(file_name)
+    index.load()
+    assert filtered_ids(index, first_export) == []
+
+    second_export = first_export + [['jk01010003', 'Novák, Jan,', None]]
+    second_export[1] = ['jk01010002', 'Abraham, Josef,', 'učitelé']
+    assert filtered_ids(index, second_export) == ['jk01010002', 'jk01010003']
+    assert filtered_ids(index, second_export, full=True) == ['jk01010001', 'jk01010002', 'jk01010003']
+
+
+def test_delta_index_uncommitted_run_is_offered_again(tmp_path):
+    file_name = str(tmp_path / 'delta_index.sqlite')
+
+    index = DeltaIndex(file_name)
+    index.load()
+    filtered_ids(index, first_export)
+
+    index = DeltaIndex(file_name)
+    index.load()
+    assert filtered_ids(index, first_export) == ['jk01010001', 'jk01010002']
+
+
+def test_delta_index_failed_record_is_offered_again(tmp_path):
+    file_name = str(tmp_path / 'delta_index.sqlite')
+
+    index = DeltaIndex(file_name)
+    index.load()
+    assert filtered_ids(index, first_export) == ['jk01010001', 'jk01010002']
+    index.discard('jk01010002')
+    index.commit()
+
+    index = DeltaIndex(file_name)
+    index.load()
+    assert filtered_ids(index, first_export) == ['jk01010002']
@@ -0,0 +1,32 @@
+import tools
+from context import PipelineContext
+from tools import get_all_deprecated_nkcr, split_deprecated_nkcr
+
+
+def test_deprecated_nkcr_index():
+    context = PipelineContext()
+    assert not context.is_nkcr_deprecated('jk01010001', 'Q1')
+
+    pairs = split_deprecated_nkcr(['jk01010001|Q1', 'jk01010001|Q2', 'jk01010002|Q3', 'jk01010003|L1'])
+    assert pairs[0] == ('jk01010001', 'Q1')
+    context.set_deprecated_nkcr(pairs)
+
+    assert context.deprecated_nkcr == {'jk01010001': {1, 2}, 'jk01010002': {3}}
+    assert context.is_nkcr_deprecated('jk01010001', 'Q2')
+    assert not context.is_nkcr_deprecated('jk01010002', 'Q1')
+    assert not context.is_nkcr_deprecated('jk01010003', 'L1')
+
+
+def test_deprecated_nkcr_are_paged_in_order(monkeypatch):
+    queries = []
+
+    def execute_sparql_query(query, endpoint):
+        queries.append(query)
+        return {'results': {'bindings': [{'item': {'value': 'http://www.wikidata.org/entity/Q1'},
+                                          'nkcr': {'value': 'jk01010001'}}]}}
+
+    monkeypatch.setattr(tools.wbi_helpers, 'execute_sparql_query', execute_sparql_query)
+
+    assert get_all_deprecated_nkcr(1000, 2000) == {'jk01010001|Q1': True}
+    # LIMIT/OFFSET pages are stable only over an ordered result
+    assert 'ORDER BY ?nkcr ?item LIMIT 1000 OFFSET 2000' in queries[0]
@@ -0,0 +1,81 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from journal import EditJournal
+
+
+def record(number):
+    return {'item': 'Q' + str(number), 'prop': 'P106', 'value': 'Q36180', 'row': 'jk0101000' + str(number)}
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_journal_buffers_and_truncates(tmp_path, compress):
+    journal = EditJournal(str(tmp_path / 'debug.csv'), 'run1', flush_records=3, flush_interval=3600,
+                          compress=compress, segment_size=60)
+    journal.reset(header=True)
+    journal.write(record(1))
+    journal.write(record(2))
+    assert len(journal.buffer) == 2
+
+    offset = journal.offset()
+    assert len(journal.buffer) == 0
+    for number in range(3, 9):
+        journal.write(record(number))
+    assert len(journal.segment_file_names()) > 1
+
+    journal.truncate(offset)
+    journal.write(record(9))
+    records = journal.read()
+
+    assert [r['item'] for r in records] == ['item', 'Q1', 'Q2', 'Q9']
+    assert records[1] == {'item': 'Q1', 'prop': 'P106', 'value': 'Q36180', 'run': 'run1', 'row': 'jk01010001'}
+    journal.close()
+
+
+def test_journal_appends_shard_journals(tmp_path):
+    journal = EditJournal(str(tmp_path / 'debug.csv'), 'run1')
+    journal.reset(header=True)
+    for shard in range(2):
+        shard_journal = EditJournal(str(tmp_path / ('debug.shard' + str(shard) + '.csv')), 'run1')
+        shard_journal.write(record(shard))
+        shard_journal.close()
+        journal.append_journal(shard_journal)
+        assert not os.path.isfile(shard_journal.file_name)
+
+    assert [r['item'] for r in journal.read()] == ['item', 'Q0', 'Q1']
+
+
+def test_journal_timer_flushes_quiet_buffer(tmp_path):
+    journal = EditJournal(str(tmp_path / 'debug.csv'), 'run1', flush_records=1000, flush_interval=0.1)
+    journal.reset()
+    journal.write(record(1))
+    assert len(journal.buffer) == 1
+
+    # no further record arrives, the timer writes the buffered one
+    deadline = time.monotonic() + 5
+    while journal.buffer and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert journal.buffer == []
+    assert os.path.getsize(journal.file_name) > 0
+    journal.close()
+    assert journal.stopped.is_set()
+
+
+def test_journal_is_written_on_sigterm(tmp_path):
+    file_name = str(tmp_path / 'debug.csv')
+    script = ('import os, signal, time, tools\n'
+              'tools.set_log_file(' + repr(file_name) + ')\n'
+              'signal.signal(signal.SIGTERM, tools.close_log_on_signal)\n'
+              "tools.write_log({'item': 'Q1', 'prop': 'P106', 'value': 'Q36180'})\n"
+              'os.kill(os.getpid(), signal.SIGTERM)\n'
+              'time.sleep(10)\n')
+    process = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             timeout=60)
+
+    assert process.returncode == -signal.SIGTERM
+    assert [r['item'] for r in EditJournal(file_name).read()] == ['Q1']
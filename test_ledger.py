@@ -0,0 +1,21 @@
+from ledger import SyncLedger
+
+
+def test_sync_ledger_skips_unchanged_rows_with_unchanged_revision(tmp_path):
+    ledger = SyncLedger(str(tmp_path / 'sync_ledger.sqlite'))
+    ledger.record('jk01010001', 11, 'Q1', 100)
+    ledger.record('jk01010002', 22, 'Q2', 200)
+    ledger.record('jk01010003', 33, 'Q3', 300)
+    ledger.commit()
+
+    requested = []
+
+    def get_revisions(qids):
+        requested.append(qids)
+        return {'Q1': 100, 'Q2': 201}
+
+    skippable = ledger.find_skippable(['jk01010001', 'jk01010002', 'jk01010003', 'jk01010004'], [11, 22, 34, 44],
+                                      get_revisions)
+
+    assert skippable == {'jk01010001'}
+    assert requested == [['Q1', 'Q2']]
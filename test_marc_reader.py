@@ -0,0 +1,70 @@
+import csv
+import gzip
+import shutil
+
+import pytest
+
+import marc_reader
+
+FIXTURE = 'testovaci_soubor.xml'
+
+# CSV catmandu writes for the fixture (derived from the fix rules), regenerate it with:
+# catmandu convert MARC --type XML --fix biografickapole-pro-frettieho.fix to CSV --fields "<CSV_FIELDS>" \
+#     < testovaci_soubor.xml > testovaci_soubor_catmandu.csv
+CATMANDU_CSV = 'testovaci_soubor_catmandu.csv'
+
+
+def read_csv_rows(file_name):
+    with open(file_name, newline='', encoding='utf-8') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+catmandu_rows = read_csv_rows(CATMANDU_CSV)
+
+
+def test_export_csv_header_matches_catmandu(tmp_path):
+    output = str(tmp_path / 'output.csv')
+    marc_reader.export_csv(FIXTURE, output)
+
+    assert read_csv_rows(output)[0] == catmandu_rows[0] == marc_reader.CSV_FIELDS
+
+
+@pytest.mark.parametrize("column", marc_reader.CSV_FIELDS)
+def test_export_csv_column_matches_catmandu(tmp_path, column):
+    output = str(tmp_path / 'output.csv')
+    marc_reader.export_csv(FIXTURE, output)
+    rows = read_csv_rows(output)
+
+    position = catmandu_rows[0].index(column)
+    assert len(rows) == len(catmandu_rows)
+    assert [row[position] for row in rows[1:]] == [row[position] for row in catmandu_rows[1:]]
+
+
+def test_iter_marc_records_matches_catmandu():
+    rows = list(marc_reader.iter_marc_records(FIXTURE))
+    expected = [dict(zip(catmandu_rows[0], row)) for row in catmandu_rows[1:]]
+
+    # empty CSV cells are None in the rows
+    assert [{column: value or '' for column, value in row.items()} for row in rows] == expected
+
+
+def test_load_nkcr_items_from_marc_gzip(tmp_path):
+    gzipped = tmp_path / 'aut.xml.gz'
+    with open(FIXTURE, 'rb') as source, gzip.open(gzipped, 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+    chunks = list(marc_reader.load_nkcr_items_from_marc(str(gzipped), chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert list(chunks[1].index) == [2]
+    assert list(chunks[0].columns) == marc_reader.CSV_FIELDS
+    assert list(chunks[0]['_id']) == ['jk01010001', 'jo20221152113123']
+
+
+def test_load_nkcr_items_from_marc_parallel():
+    sequential = list(marc_reader.load_nkcr_items_from_marc(FIXTURE, chunksize=1))
+    parallel = list(marc_reader.load_nkcr_items_from_marc_parallel(FIXTURE, workers=2, chunksize=1))
+
+    assert len(parallel) == len(sequential)
+    for parallel_chunk, sequential_chunk in zip(parallel, sequential):
+        assert parallel_chunk.equals(sequential_chunk)
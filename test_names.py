@@ -0,0 +1,22 @@
+import pandas
+
+import tools
+
+
+def test_split_name():
+    assert tools.split_name('Novák, Jan') == ('Jan', 'Novák')
+    assert tools.split_name('Dvořák, Antonín Leopold,') == ('Antonín Leopold', 'Dvořák')
+    assert tools.split_name('Karel IV.') == ('IV.', 'Karel')
+    assert tools.split_name(None) == (None, None)
+    assert tools.first_name('Čapek, Karel') == 'Karel'
+    assert tools.last_name('Čapek, Karel') == 'Čapek'
+
+
+def test_cs_labels_match_cs_label():
+    names = pandas.Series(['Novák, Jan', 'Dvořák, Antonín Leopold,', 'Karel IV.', 'Smith-Jones, A. B.', '', None],
+                          index=['a', 'b', 'c', 'd', 'e', 'f'])
+    labels = tools.cs_labels(names)
+    assert list(labels.index) == list(names.index)
+    assert labels.tolist() == [tools.cs_label(name) for name in names]
+    assert labels['a'] == 'Jan Novák'
+    assert labels['f'] is None
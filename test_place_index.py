@@ -0,0 +1,27 @@
+from cleaners import prepare_places_from_nkcr
+from context import PipelineContext
+from place_index import PlaceIndex, normalize_place
+
+
+def test_normalize_place():
+    assert normalize_place('Praha, Česko') == 'Praha (Česko)'
+    assert normalize_place(' Brno ') == 'Brno'
+    assert normalize_place('Most (Česko)') == 'Most (Česko)'
+
+
+def test_place_index_lookup():
+    index = PlaceIndex({'Praha (Česko)': 'Q1085', 'Brno (Česko)': 'Q14960', 'Olomouc': 'Q26987'}, max_size=2)
+    assert index.prebuilt['Praha, Česko'] == ('Praha (Česko)', 'Q1085')
+    assert index.lookup('Praha, Česko') == ('Praha (Česko)', 'Q1085')
+    assert index.lookup('Olomouc') == ('Olomouc', 'Q26987')
+    assert index.lookup('Brno,Česko') == ('Brno (Česko)', 'Q14960')
+    assert index.lookup('Nowhere, Land') == ('Nowhere (Land)', None)
+    assert index.lookup(' Olomouc ') == ('Olomouc', 'Q26987')
+    assert list(index.memo) == ['Nowhere, Land', ' Olomouc ']
+
+
+def test_prepare_places_uses_index():
+    context = PipelineContext(name_to_nkcr={'Praha (Česko)': 'Q1085', 'Brno (Česko)': 'Q14960'})
+    assert prepare_places_from_nkcr('Praha, Česko$Brno (Česko)$Ostrava, Česko', '370a', context) == ['Q1085', 'Q14960']
+    assert prepare_places_from_nkcr('Praha, Česko|Brno, Česko', '370f', context) == ['Q1085', 'Q14960']
+    assert context.not_found_places == {'Ostrava (Česko)': 1}
@@ -0,0 +1,133 @@
+import copy
+import json
+import sqlite3
+
+import pytest
+from wikibaseintegrator import WikibaseIntegrator
+from wikibaseintegrator.datatypes import Item
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.wbi_enums import ActionIfExists
+from wikibaseintegrator.wbi_exceptions import MissingEntityException
+from wikibaseintegrator.wbi_login import LoginError
+
+import tools
+from journal import EditJournal
+from planner import EntityCache, plan_item_changes, apply_item_changes, apply_plan
+
+
+def snak(property_number, qid):
+    return {'snaktype': 'value', 'property': property_number, 'datatype': 'wikibase-item',
+            'datavalue': {'value': {'entity-type': 'item', 'numeric-id': int(qid[1:]), 'id': qid},
+                          'type': 'wikibase-entityid'}}
+
+
+def statement(property_number, qid, statement_id):
+    return {'mainsnak': snak(property_number, qid), 'type': 'statement', 'rank': 'normal', 'id': statement_id}
+
+
+original_json = {
+    'type': 'item', 'id': 'Q1', 'lastrevid': 100,
+    'labels': {'en': {'language': 'en', 'value': 'Jiří Abraham'}},
+    'descriptions': {}, 'aliases': {}, 'sitelinks': {},
+    'claims': {
+        'P106': [statement('P106', 'Q5', 'Q1$a')],
+        'P101': [statement('P101', 'Q7', 'Q1$b')],
+    },
+}
+
+
+def load_item(wbi):
+    return ItemEntity(api=wbi).from_json(json_data=copy.deepcopy(original_json))
+
+
+def test_plan_and_apply_item_changes():
+    wbi = WikibaseIntegrator()
+    item = load_item(wbi)
+    item.labels.set('cs', 'Jiří Abraham')
+    item.claims.add(Item(prop_nr='P106', value='Q6'), action_if_exists=ActionIfExists.APPEND_OR_REPLACE)
+    item.claims.get('P101')[0].remove()
+
+    entry = json.loads(json.dumps(plan_item_changes(item, original_json)))
+
+    assert entry['qid'] == 'Q1'
+    assert entry['base_revid'] == 100
+    assert entry['labels'] == {'cs': 'Jiří Abraham'}
+    assert [claim['mainsnak']['datavalue']['value']['id'] for claim in entry['add']] == ['Q6']
+    assert entry['remove'] == [{'property': 'P101', 'id': 'Q1$b'}]
+
+    fresh = load_item(wbi)
+    apply_item_changes(fresh, [entry, entry])
+
+    assert fresh.labels.get('cs').value == 'Jiří Abraham'
+    assert [claim.mainsnak.datavalue['value']['id'] for claim in fresh.claims.get('P106')] == ['Q5', 'Q6']
+    assert fresh.claims.get('P101')[0].removed
+
+
+def test_entity_cache_offline(tmp_path):
+    file_name = str(tmp_path / 'entity_cache.sqlite')
+    cache = EntityCache(file_name, WikibaseIntegrator(), offline=True)
+    with pytest.raises(MissingEntityException):
+        cache.item.get('Q1')
+
+    with sqlite3.connect(file_name) as connection:
+        connection.execute('INSERT INTO entity (id, json) VALUES (?, ?)', ('Q1', json.dumps(original_json)))
+
+    item = cache.item.get('Q1')
+    assert item.lastrevid == 100
+    assert cache.hits == 1
+
+
+class FakeItems:
+    def __init__(self, wbi, writes, expired):
+        self.wbi = wbi
+        self.writes = writes
+        self.expired = expired
+
+    def get(self, qid):
+        item = ItemEntity(api=self.wbi).from_json(json_data=dict(copy.deepcopy(original_json), id=qid))
+
+        def write(summary, login, **kwargs):
+            if login in self.expired:
+                raise LoginError('session expired')
+            self.writes.append((qid, summary, login))
+
+        item.write = write
+        return item
+
+
+class FakeWikibaseIntegrator:
+    def __init__(self, writes, expired):
+        self.item = FakeItems(WikibaseIntegrator(), writes, expired)
+
+
+def test_apply_plan_relogs_in_once_and_retries(monkeypatch, tmp_path):
+    monkeypatch.setattr(tools, 'journal', EditJournal(str(tmp_path / 'debug.csv')))
+    plan_file = tmp_path / 'plan.jsonl'
+    plan_file.write_text(''.join(json.dumps({'qid': qid, 'base_revid': 100, 'labels': {}, 'add': [], 'remove': [],
+                                             'summary': 'Update NK ČR'}) + '\n' for qid in ['Q1', 'Q2', 'Q3']))
+    writes = []
+    logins = ['expired']
+    relogins = []
+
+    def relogin():
+        relogins.append(1)
+        logins.append('login' + str(len(relogins)))
+        return logins[-1]
+
+    written, failed = apply_plan(str(plan_file), FakeWikibaseIntegrator(writes, {'expired'}), lambda: logins[-1],
+                                 workers=3, relogin=relogin)
+
+    assert (written, failed) == (3, 0)
+    assert len(relogins) == 1
+    assert sorted(writes) == [(qid, 'Update NK ČR', 'login1') for qid in ['Q1', 'Q2', 'Q3']]
+
+
+def test_apply_plan_without_relogin_fails_the_item(monkeypatch, tmp_path):
+    journal = EditJournal(str(tmp_path / 'debug.csv'))
+    monkeypatch.setattr(tools, 'journal', journal)
+    plan_file = tmp_path / 'plan.jsonl'
+    plan_file.write_text(json.dumps({'qid': 'Q1', 'base_revid': 100, 'labels': {}, 'add': [], 'remove': [],
+                                     'summary': 'Update NK ČR'}) + '\n')
+
+    assert apply_plan(str(plan_file), FakeWikibaseIntegrator([], {'expired'}), lambda: 'expired') == (0, 1)
+    assert [(r['item'], r['prop']) for r in journal.read()] == [('Q1', 'write failed')]
@@ -0,0 +1,34 @@
+from property_processor.property_processor_370a import PropertyProcessor370a
+from property_processor.property_processor_374a import PropertyProcessor374a
+from property_processor.property_processor_dates import PropertyProcessorDates
+from property_processor.property_processor_one import PropertyProcessorOne
+from property_processor.registry import PropertyProcessorRegistry
+
+
+def test_registry_dispatch():
+    registry = PropertyProcessorRegistry()
+    assert registry.get_processor_class('374a', ['Q36180'], False) is PropertyProcessor374a
+    assert registry.get_processor_class('678a', [{'property': 'P569'}], True) is PropertyProcessorDates
+    assert registry.get_processor_class('046f', {'property': 'P569'}, True) is PropertyProcessorDates
+    assert registry.get_processor_class('0247a-isni', '0000000121200982', False) is PropertyProcessorOne
+    assert registry.get_processor_class('unknown', ['Q1'], False) is None
+
+    registry.register('unknown', PropertyProcessor370a)
+    assert registry.get_processor_class('unknown', ['Q1'], False) is PropertyProcessor370a
+
+
+def test_registry_reuses_instances():
+    registry = PropertyProcessorRegistry()
+    first_row = {'_id': 'jk01010001', '370a': ['Q1085']}
+    second_row = {'_id': 'jk01010002', '370a': ['Q14960']}
+
+    first = registry.get('370a', first_row, [], 'P19', None, None)
+    first.set_datas_from_wd('item')
+    second = registry.get('370a', second_row, ['Q1085'], 'P20', None, None)
+
+    assert type(second) is PropertyProcessor370a
+    assert second is first
+    assert second.row_new_fields is second_row
+    assert second.claim_direct_from_wd == ['Q1085']
+    assert second.property_for_new_field == 'P20'
+    assert second.datas_from_wd is None
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from wikibaseintegrator.datatypes import Item, ExternalID, Time
+from wikibaseintegrator.wbi_enums import WikibaseTimePrecision
+
+from reference_factory import ReferenceFactory
+
+
+def test_references_match_datatype_references():
+    run_date = datetime(2024, 5, 17, 13, 45)
+    factory = ReferenceFactory(run_date)
+
+    expected = Item(value='Q36180', prop_nr='P106', references=[[
+        Item(value='Q13550863', prop_nr='P248'),
+        ExternalID(value='jk01010001', prop_nr='P691'),
+        Time(time='+2024-05-17T00:00:00Z', prop_nr='P813', precision=WikibaseTimePrecision.DAY),
+    ]])
+    claim = Item(value='Q36180', prop_nr='P106', references=factory.references('jk01010001'))
+
+    assert claim.get_json() == expected.get_json()
+
+
+def test_references_share_snaks():
+    factory = ReferenceFactory()
+    first = factory.references('jk01010001')
+    second = factory.references('jk01010001')
+    other = factory.references('jk01010002')
+
+    assert first is not second
+    assert first.references[0].snaks.get('P813')[0] is other.references[0].snaks.get('P813')[0]
+    assert first.references[0].snaks.get('P691')[0] is second.references[0].snaks.get('P691')[0]
+    assert other.references[0].snaks.get('P691')[0].datavalue['value'] == 'jk01010002'
@@ -0,0 +1,115 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+from wikibaseintegrator import wbi_helpers
+from wikibaseintegrator.wbi_exceptions import MaxRetriesReachedException
+
+from scheduler import WriteScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """MediaWiki API answering edits with a maxlag error while the server is lagged."""
+
+    def do_POST(self):
+        data = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.server.maxlags.append(data['maxlag'][0])
+        if self.server.is_lagged():
+            body = {'error': {'code': 'maxlag', 'info': 'Waiting for a database server', 'lag': 7}}
+            headers = {'Retry-After': '1', 'X-Database-Lag': '7'}
+        else:
+            body = {'success': 1}
+            headers = {}
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeApiHandler)
+    server.maxlags = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def edit(server, session, max_retries=100):
+    url = 'http://127.0.0.1:' + str(server.server_address[1]) + '/w/api.php'
+    return wbi_helpers.mediawiki_api_call('POST', mediawiki_api_url=url, session=session,
+                                          data={'action': 'wbeditentity', 'maxlag': 5},
+                                          max_retries=max_retries, retry_after=0)
+
+
+def test_scheduler_backs_off_on_lag(fake_api):
+    lagged_responses = [True, True]
+    fake_api.is_lagged = lambda: bool(lagged_responses) and lagged_responses.pop()
+    clock = FakeClock()
+    scheduler = WriteScheduler(maxlag=5, rate=1.0, increase=0.05, decrease=0.5, clock=clock, sleep=clock.sleep)
+    session = requests.Session()
+    scheduler.install(session)
+    scheduler.install(session)
+
+    scheduler.acquire()
+    assert edit(fake_api, session) == {'success': 1}
+
+    assert fake_api.maxlags == ['5', '5', '5']
+    assert scheduler.throttled == 2
+    assert scheduler.rate == pytest.approx(1.0 * 0.5 * 0.5 + 0.05)
+    assert scheduler.paused_until == 1.0
+
+    scheduler.acquire()
+    assert clock.now >= 1.0
+
+
+def test_scheduler_settles_near_sustainable_rate(fake_api):
+    clock = FakeClock()
+    accepted = []
+
+    def is_lagged():
+        # the fake replicas keep up with at most 2 edits per second
+        if accepted and clock.now - accepted[-1] < 0.5:
+            return True
+        accepted.append(clock.now)
+        return False
+
+    fake_api.is_lagged = is_lagged
+    scheduler = WriteScheduler(maxlag=5, rate=0.5, max_rate=10.0, increase=0.1, clock=clock, sleep=clock.sleep)
+    session = requests.Session()
+    scheduler.install(session)
+
+    for _ in range(300):
+        scheduler.acquire()
+        try:
+            edit(fake_api, session, max_retries=1)
+        except MaxRetriesReachedException:
+            pass
+
+    recent = accepted[-100:]
+    achieved_rate = (len(recent) - 1) / (recent[-1] - recent[0])
+    assert 1.0 < achieved_rate <= 2.0
+    assert scheduler.throttled > 0
@@ -0,0 +1,150 @@
+import tools
+from context import PipelineContext
+from sharding import ShardResult, apply_group, filter_chunk_for_shard, get_target_qid, group_rows_by_target, \
+    merge_tallies, partition_chunk, run_sharded, shard_of
+
+
+def test_shard_of_is_stable():
+    assert [shard_of('Q113851460', 4) for _ in range(3)] == [shard_of('Q113851460', 4)] * 3
+    # CRC32, the same in every process and run
+    assert shard_of('Q42', 7) == 6
+    assert shard_of(None, 3) == shard_of('', 3)
+
+
+def test_get_target_qid_empty_cells():
+    context = PipelineContext(non_deprecated_items={'jk01010002': {'qid': 'Q2'}})
+    assert get_target_qid({'_id': 'jk01010001', '0247a-wikidata': float('nan')}, context) is None
+    assert get_target_qid({'_id': 'jk01010002', '0247a-wikidata': ''}, context) == 'Q2'
+    assert get_target_qid({'_id': 'jk01010001', '0247a-wikidata': 'Q1'}, context) == 'Q1'
+
+
+def test_filter_chunk_for_shard_on_raw_csv():
+    chunk = next(iter(tools.load_nkcr_items('testovaci_soubor.csv')))
+    context = PipelineContext()
+    shards = [filter_chunk_for_shard(chunk, context, shard, 2) for shard in range(2)]
+
+    ids = [list(part['_id']) for part in shards]
+    assert sorted(ids[0] + ids[1]) == sorted(chunk['_id'])
+    assert not set(ids[0]) & set(ids[1])
+
+
+def test_run_sharded_reads_input_once():
+    chunk = next(iter(tools.load_nkcr_items('testovaci_soubor.csv')))
+    context = PipelineContext()
+    reads = []
+
+    def chunks():
+        for _ in range(3):
+            reads.append(1)
+            yield chunk
+
+    def worker(shard, shard_chunks):
+        return ShardResult(shard=shard, count=sum(len(shard_chunk) for shard_chunk in shard_chunks))
+
+    results = run_sharded(worker, 2, chunks(), context)
+
+    assert len(reads) == 3
+    assert [result.error for result in results] == [None, None]
+    assert [result.count for result in results] == [3 * len(part) for part in partition_chunk(chunk, context, 2)]
+    assert sum(result.count for result in results) == 3 * len(chunk)
+
+
+def test_merge_tallies():
+    target = {'lékaři': 1}
+    merge_tallies(target, {'lékaři': 2, 'učitelé': 1})
+    assert target == {'lékaři': 3, 'učitelé': 1}
+
+
+class FakeItem:
+    def __init__(self, qid):
+        self.id = qid
+        self.lastrevid = 100
+        self.rows = []
+
+
+class FakeWriter:
+    def __init__(self):
+        self.edits = []
+
+    def submit(self, item, summary, on_written=None, on_failed=None):
+        self.edits.append((item, summary))
+        on_written(item)
+
+
+class FakeLedger:
+    def __init__(self):
+        self.records = []
+
+    def record(self, nkcr_aut, row_hash, qid, lastrevid):
+        self.records.append((nkcr_aut, qid, lastrevid))
+
+
+def test_group_rows_by_target():
+    context = PipelineContext(non_deprecated_items={'jk01010003': {'qid': 'Q1'}})
+    rows = [
+        {'_id': 'jk01010001', '0247a-wikidata': 'Q1'},
+        {'_id': 'jk01010002', '0247a-wikidata': ''},
+        {'_id': 'jk01010003', '0247a-wikidata': ''},
+        {'_id': 'jk01010004', '0247a-wikidata': 'Q2'},
+        {'_id': 'jk01010005', '0247a-wikidata': ''},
+    ]
+    groups = group_rows_by_target(rows, context)
+    assert [(qid, [row['_id'] for row in group]) for qid, group in groups] == [
+        ('Q1', ['jk01010001', 'jk01010003']),
+        (None, ['jk01010002']),
+        ('Q2', ['jk01010004']),
+        (None, ['jk01010005']),
+    ]
+
+
+def test_apply_group_merges_rows_into_one_edit():
+    changes = {'jk01010001': ['P106'], 'jk01010003': ['P569', 'P106']}
+    loaded = []
+
+    def apply_row(row, item):
+        if item is None:
+            item = FakeItem('Q1')
+            loaded.append(item)
+        item.rows.append(row['_id'])
+        return item, True, changes[row['_id']], False
+
+    writer = FakeWriter()
+    ledger = FakeLedger()
+    rows = [{'_id': 'jk01010001'}, {'_id': 'jk01010003'}]
+    assert apply_group(rows, apply_row, writer, ledger, {'jk01010001': 1, 'jk01010003': 3})
+
+    assert len(loaded) == 1
+    assert len(writer.edits) == 1
+    item, summary = writer.edits[0]
+    assert item.rows == ['jk01010001', 'jk01010003']
+    assert summary.startswith('Update NK ČR – ')
+    assert sorted(summary[len('Update NK ČR – '):].split(', ')) == ['P106', 'P569']
+    assert ledger.records == [('jk01010001', 'Q1', 100), ('jk01010003', 'Q1', 100)]
+
+
+def test_apply_group_without_changes_or_target():
+    writer = FakeWriter()
+    ledger = FakeLedger()
+
+    # a row without a target item has nothing to save
+    assert not apply_group([{'_id': 'jk01010002'}], lambda row, item: (None, False, [], False), writer, ledger, {})
+    # an unchanged item is recorded in the ledger without an edit
+    assert not apply_group([{'_id': 'jk01010001'}], lambda row, item: (FakeItem('Q1'), False, [], False), writer,
+                           ledger, {'jk01010001': 1})
+    assert writer.edits == []
+    assert ledger.records == [('jk01010001', 'Q1', 100)]
+
+
+def test_run_sharded_worker_stopping_early():
+    chunk = next(iter(tools.load_nkcr_items('testovaci_soubor.csv')))
+
+    def worker(shard, shard_chunks):
+        if shard == 0:
+            # e.g. a shard finished by an earlier run, its chunks are not taken
+            return ShardResult(shard=shard, stopped=True)
+        return ShardResult(shard=shard, count=sum(len(shard_chunk) for shard_chunk in shard_chunks))
+
+    results = run_sharded(worker, 2, (chunk for _ in range(10)), PipelineContext(), queue_size=1)
+
+    assert results[0].stopped
+    assert results[1].count == 10 * len(partition_chunk(chunk, PipelineContext(), 2)[1])
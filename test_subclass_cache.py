@@ -0,0 +1,49 @@
+from context import PipelineContext
+from subclass_cache import SubclassCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_subclass_cache_round_trip_and_ttl(tmp_path):
+    file_name = str(tmp_path / 'subclass_cache.sqlite')
+    clock = Clock()
+    context = PipelineContext()
+    context.set_subclass_store(SubclassCache(file_name, ttl=100, clock=clock))
+    assert context.get_cached_subclass_result('Q12737077', 'Q36180') is None
+    context.cache_subclass_result('Q12737077', 'Q36180', True)
+    context.cache_subclass_result('Q12737077', 'Q5', False)
+    assert context.get_cached_subclass_result('Q12737077', 'Q36180') is True
+    context.subclass_store.flush()
+    assert (context.subclass_store.hits, context.subclass_store.misses) == (1, 1)
+
+    clock.now = 1050.0
+    store = SubclassCache(file_name, ttl=100, clock=clock)
+    store.load()
+    assert store.get('Q12737077', 'Q36180') is True
+    assert store.get('Q12737077', 'Q5') is False
+
+    clock.now = 1200.0
+    assert store.get('Q12737077', 'Q36180') is None
+    store = SubclassCache(file_name, ttl=100, clock=clock)
+    store.load()
+    assert store.entries == {}
+
+
+def test_subclass_cache_evicts_oldest(tmp_path):
+    file_name = str(tmp_path / 'subclass_cache.sqlite')
+    clock = Clock()
+    store = SubclassCache(file_name, max_entries=2, clock=clock)
+    for number in range(3):
+        clock.now += 1
+        store.put('Q12737077', 'Q' + str(number), True)
+    store.flush()
+
+    store = SubclassCache(file_name, max_entries=2, clock=clock)
+    store.load()
+    assert set(store.entries) == {('Q12737077', 'Q1'), ('Q12737077', 'Q2')}
@@ -0,0 +1,98 @@
+import threading
+
+from wikibaseintegrator.wbi_exceptions import MWApiError
+from wikibaseintegrator.wbi_login import LoginError
+
+import writer
+from writer import ItemWriter
+
+
+class FakeItem:
+    """Item whose ``write`` records the calls instead of calling the API."""
+
+    def __init__(self, qid, writes, errors=(), release=None):
+        self.id = qid
+        self.writes = writes
+        self.errors = list(errors)
+        self.release = release
+        self.lastrevid = 0
+
+    def write(self, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        self.lastrevid += 1
+        self.writes.append((self.id, kwargs['summary'], kwargs['login']))
+
+
+def make_writer(logins=None):
+    logins = logins if logins is not None else []
+    return ItemWriter(lambda: 'login', lambda: logins.append('relogin') or 'relogin', queue_size=10)
+
+
+def test_writer_commits_in_submission_order():
+    writes = []
+    written = []
+    item_writer = make_writer()
+    for number in range(5):
+        item_writer.submit(FakeItem('Q' + str(number), writes), 'edit ' + str(number), written.append)
+    item_writer.flush()
+
+    assert [qid for qid, _, _ in writes] == ['Q0', 'Q1', 'Q2', 'Q3', 'Q4']
+    assert [item.id for item in written] == ['Q0', 'Q1', 'Q2', 'Q3', 'Q4']
+    assert item_writer.written == 5
+    item_writer.close()
+    assert not item_writer.thread.is_alive()
+
+
+def test_writer_wait_for_blocks_until_the_item_is_saved():
+    writes = []
+    release = threading.Event()
+    item_writer = make_writer()
+    item_writer.submit(FakeItem('Q1', writes, release=release), 'edit')
+    item_writer.wait_for('Q2')
+    assert writes == []
+
+    waited = threading.Event()
+    waiter = threading.Thread(target=lambda: (item_writer.wait_for('Q1'), waited.set()))
+    waiter.start()
+    assert not waited.wait(0.2)
+    release.set()
+    assert waited.wait(5)
+    assert writes == [('Q1', 'edit', 'login')]
+    item_writer.close()
+
+
+def test_writer_retries_once_after_relogin():
+    writes = []
+    logins = []
+    item_writer = make_writer(logins)
+    item_writer.submit(FakeItem('Q1', writes, [LoginError('expired')]), 'login error')
+    bot_right = MWApiError({'code': 'permissiondenied', 'info': 'You need the "bot" right'})
+    item_writer.submit(FakeItem('Q2', writes, [bot_right]), 'bot right')
+    item_writer.close()
+
+    assert logins == ['relogin', 'relogin']
+    assert writes == [('Q1', 'login error', 'relogin'), ('Q2', 'bot right', 'relogin')]
+    assert item_writer.failed == 0
+
+
+def test_writer_reports_failed_writes(monkeypatch):
+    records = []
+    monkeypatch.setattr(writer, 'write_log', records.append)
+    writes = []
+    written = []
+    failed = []
+    item_writer = make_writer()
+    # the retry after relogin fails as well
+    item_writer.submit(FakeItem('Q1', writes, [LoginError('expired'), LoginError('still expired')]), 'edit',
+                       written.append, failed.append)
+    other_error = MWApiError({'code': 'failed-save', 'info': 'Edit conflict'})
+    item_writer.submit(FakeItem('Q2', writes, [other_error]), 'edit', written.append, failed.append)
+    item_writer.close()
+
+    assert writes == [] and written == []
+    assert [item.id for item in failed] == ['Q1', 'Q2']
+    assert item_writer.failed == 2
+    assert [(record['item'], record['prop']) for record in records] == [('Q1', 'write failed'), ('Q2', 'write failed')]
@@ -1,8 +1,9 @@
-import csv
+import atexit
 import gc
 import logging
 import os
 import re
+import signal
 from datetime import datetime
 from json import JSONDecodeError
 from typing import Union, Any, TYPE_CHECKING
@@ -18,66 +19,166 @@ from wikibaseintegrator import wbi_helpers
 from wikibaseintegrator.datatypes import Item, ExternalID, Time, String
 from wikibaseintegrator.entities import ItemEntity
 from wikibaseintegrator.models import References, Snaks, Claim, Snak, Reference
-from wikibaseintegrator.wbi_enums import WikibaseTimePrecision, WikibaseDatatype, ActionIfExists
+from wikibaseintegrator.wbi_enums import ActionIfExists
+from wikibaseintegrator.wbi_exceptions import MissingEntityException
 
 import mySparql
 import pywikibot_extension
+from claim_index import get_claim_index
 from cleaners import clean_last_comma
 from config import Config
+from journal import EditJournal
 from memory_profiler import get_tracemalloc_usage_mb
+from reference_factory import ReferenceFactory
 
 if TYPE_CHECKING:
     from context import PipelineContext
 log = logging.getLogger(__name__)
 
+log_file_name = 'debug.csv'
+# shard workers forked from one run share its ID
+run_id = datetime.now().strftime('%Y%m%dT%H%M%S') + '-' + str(os.getpid())
+journal_options: dict = {}
+journal = EditJournal(log_file_name, run_id)
+# references of all claims added in one run share the retrieved date
+reference_factory = ReferenceFactory()
+
 
 def write_log(fields, create_file=False):
     """
-    Writes a log entry to a CSV file and a logger. The function either appends to or creates a
-    new CSV file depending on the specified flag.
+    Writes a record to the edit journal (``debug.csv`` by default). Records are buffered and
+    written in batches, see ``journal.EditJournal``.
 
-    :param fields: The dictionary containing field names as keys and corresponding values to
-        be written to the log file.
+    :param fields: The dictionary with the item, prop and value of the record and optionally the NK ČR ID
+        of the row (row).
     :type fields: dict
-    :param create_file: Optional boolean flag that determines whether to create a new CSV file
-        or append to an existing file. Defaults to False (append mode).
+    :param create_file: Optional boolean flag that starts a new journal with a header record instead of
+        appending the record. Defaults to False (append mode).
     :type create_file: bool
     :return: None
     """
-    mode = 'w' if create_file else 'a'
-    with open('debug.csv', mode) as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['item', 'prop', 'value'])
-        writer.writerow(fields)
-    log.info(fields)
+    if create_file:
+        journal.reset(header=True)
+    else:
+        journal.write(fields)
+    log.debug(fields)
 
 
 def reset_debug_file():
     """
     Resets the content of the debug file by creating or overwriting it.
 
-    This function opens a file named 'debug.csv' in write mode, effectively clearing
-    any existing content or creating the file if it does not already exist.
-    The file is then closed immediately, ensuring no further action is performed.
+    This function empties the edit journal (``log_file_name``, 'debug.csv' by default), removing
+    all of its segments, or creates it if it does not already exist.
+
+    :return: None
+    """
+    journal.reset()
+
+
+def set_journal_options(**options):
+    """
+    Sets options of the edit journal (see ``journal.EditJournal``: flush_records, flush_interval,
+    compress, segment_size) and reopens it with them.
+
+    :return: None
+    """
+    journal_options.update(options)
+    set_log_file(log_file_name)
+
+
+def set_log_file(file_name: str):
+    """
+    Sets the debug file used by ``write_log`` and the other journal functions. Shard workers
+    each write to their own file, which are merged by ``merge_logs`` at the end of the run.
+
+    :param file_name: Path of the debug file.
+    :type file_name: str
+    :return: None
+    """
+    global log_file_name, journal
+    journal.close()
+    log_file_name = file_name
+    journal = EditJournal(file_name, run_id, **journal_options)
+
+
+def flush_log():
+    """
+    Writes the buffered records of the edit journal.
+
+    :return: None
+    """
+    journal.flush()
+
+
+def close_log():
+    """
+    Writes the buffered records of the edit journal and closes it.
+
+    :return: None
+    """
+    journal.close()
+
+
+atexit.register(close_log)
+
+
+def close_log_on_signal(signum, frame):
+    """
+    Signal handler (SIGTERM, SIGHUP) that writes the buffered records of the edit journal before the
+    process ends; atexit handlers do not run when a process is terminated by a signal.
+
+    :param signum: The received signal.
+    :param frame: The interrupted frame.
+    :return: None
+    """
+    close_log()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def merge_logs(file_names: list[str]):
+    """
+    Appends the given debug files to the current debug file in order and removes them.
+
+    :param file_names: Paths of the debug files written by shard workers.
+    :type file_names: list[str]
+    :return: None
+    """
+    for file_name in file_names:
+        journal.append_journal(EditJournal(file_name, run_id, **journal_options))
+
 
+def get_log_offset() -> int:
+    """
+    Flushes the debug file and returns its size (of all segments), used as the journal offset in checkpoints.
+
+    :return: Size of the debug file in bytes, 0 if the file does not exist.
+    :rtype: int
+    """
+    return journal.offset()
+
+
+def truncate_log(offset: int):
+    """
+    Truncates the debug file to the given offset, dropping entries written after a checkpoint.
+
+    :param offset: The journal offset stored in the checkpoint.
+    :type offset: int
     :return: None
     """
-    with open('debug.csv', 'w'):
-        pass
+    journal.truncate(offset)
 
 
-def read_log() -> csv.DictReader:
+def read_log() -> list[dict]:
     """
-    Reads data from a CSV file and returns a CSV dictionary reader object. This function opens a file
-    named 'debug.csv' in read mode and uses the `csv.DictReader` class to parse the file's content.
-    The expected fields in the CSV file are 'item', 'prop', and 'value'.
+    Reads the records of the edit journal ('debug.csv' by default, all segments). The fields are
+    'item', 'prop', 'value', 'run' and 'row'.
 
-    :return: A CSV dictionary reader to iterate over rows of the input file, where each row is
-             represented as a dictionary with keys corresponding to 'item', 'prop', and 'value'.
-    :rtype: csv.DictReader
+    :return: A list of the records, where each record is represented as a dictionary.
+    :rtype: list[dict]
     """
-    with open('debug.csv', 'r') as csvfile:
-        reader = csv.DictReader(csvfile, fieldnames=['item', 'prop', 'value'])
-        return list(reader)
+    return journal.read()
 
 
 def print_info(debug: bool):
@@ -119,38 +220,28 @@ def add_new_field_to_item_wbi(
     :return: The modified Wikibase item containing the newly added claim.
     :rtype: ItemEntity
     """
-    try:
-        claims_by_property = item_new_field.claims.get('P691')
-        for claim in claims_by_property:
-            if claim.rank.value == 'deprecated' and nkcr_aut_new_field == claim.mainsnak.datavalue['value']:
-                # deprecated so not add
-                return item_new_field
-    except KeyError:
+    index = get_claim_index(item_new_field)
+    if nkcr_aut_new_field in index.deprecated_values('P691'):
+        # deprecated so not add
         return item_new_field
 
-    now = datetime.now()
-
-    references = [
-        [
-            Item(value='Q13550863', prop_nr='P248'),
-            ExternalID(value=nkcr_aut_new_field, prop_nr='P691'),
-            Time(time=now.strftime('+%Y-%m-%dT00:00:00Z'), prop_nr='P813', precision=WikibaseTimePrecision.DAY),
-        ]
-    ]
+    references = reference_factory.references(nkcr_aut_new_field)
 
     if property_new_field in ['P213', 'P496']:
         # external string
-        final = {'item': item_new_field.id, 'prop': property_new_field, 'value': value}
+        final = {'item': item_new_field.id, 'prop': property_new_field, 'value': value, 'row': nkcr_aut_new_field}
         new_claim = ExternalID(value=value, prop_nr=property_new_field, references=references)
     elif property_new_field in ['P569', 'P570'] or property_new_field == ['P569', 'P570']:
         #Time
-        final = {'item': item_new_field.id, 'prop': value.get('property'), 'value': value.get('time')}
+        final = {'item': item_new_field.id, 'prop': value.get('property'), 'value': value.get('time'),
+                 'row': nkcr_aut_new_field}
         new_claim = Time(time=value.get('time'), prop_nr=value.get('property'), precision=value.get('precision'), references=references)
     else:
-        final = {'item': item_new_field.id, 'prop': property_new_field, 'value': value}
+        final = {'item': item_new_field.id, 'prop': property_new_field, 'value': value, 'row': nkcr_aut_new_field}
         new_claim = Item(value=value, prop_nr=property_new_field, references=references)
     write_log(final)
     item_new_field.claims.add(new_claim, action_if_exists=ActionIfExists.APPEND_OR_REPLACE)
+    index.record_added(new_claim)
 
     return item_new_field
 
@@ -175,24 +266,17 @@ def add_nkcr_aut_to_item_wbi(
     :return: The updated Wikibase item containing the new claim.
     :rtype: ItemEntity
     """
-    now = datetime.now()
-
-    references = [
-        [
-            Item(value='Q13550863', prop_nr='P248'),
-            ExternalID(value=nkcr_aut_to_add, prop_nr='P691'),
-            Time(time=now.strftime('+%Y-%m-%dT00:00:00Z'), prop_nr='P813', precision=WikibaseTimePrecision.DAY),
-        ]
-    ]
+    references = reference_factory.references(nkcr_aut_to_add)
 
     qualifier = [
         String(value=clean_last_comma(name_to_add), prop_nr='P1810'),
     ]
 
-    final = {'item': item_to_add.id, 'prop': 'P691', 'value': nkcr_aut_to_add}
+    final = {'item': item_to_add.id, 'prop': 'P691', 'value': nkcr_aut_to_add, 'row': nkcr_aut_to_add}
     write_log(final)
     new_claim = ExternalID(value=nkcr_aut_to_add, prop_nr='P691', references=references, qualifiers=qualifier)
     item_to_add.claims.add(new_claim, action_if_exists=ActionIfExists.APPEND_OR_REPLACE)
+    get_claim_index(item_to_add).record_added(new_claim)
     return item_to_add
 
 
@@ -212,18 +296,7 @@ def get_nkcr_auts_from_item_wbi(datas) -> list:
         are found, an empty list is returned.
     :rtype: list
     """
-    nkcr_auts_from_data = []
-    try:
-        claims_from_wd = datas.claims.get('P691')
-    except KeyError:
-        return []
-    for claim in claims_from_wd:
-        if claim.mainsnak.datatype == WikibaseDatatype.EXTERNALID.value:
-            nkcr_auts_from_data.append(claim.mainsnak.datavalue['value'])
-        else:
-            nkcr_auts_from_data.append(claim.mainsnak.datavalue['value']['literal'])
-
-    return nkcr_auts_from_data
+    return get_claim_index(datas).values('P691')
 
 
 def make_qid_database(items: dict) -> dict[str, list[str]]:
@@ -304,6 +377,102 @@ def get_occupations(limit: Union[int, None] = None, offset: Union[int, None] = N
     return occupation_dictionary
 
 
+def get_class_members(class_qid: str, limit: Union[int, None] = None, offset: Union[int, None] = None) -> dict[str, bool]:
+    """
+    Retrieves the subclasses of a class and the instances of its subclasses (the items
+    ``is_item_subclass_of_wbi`` accepts), at any depth. The result is ordered, so the pages of
+    ``load_sparql_query_by_chunks`` neither skip nor repeat members; a missing member would be
+    taken as "not a subclass" for every QID the closure covers.
+
+    :param class_qid: The QID of the class.
+    :type class_qid: str
+    :param limit: The maximum number of items to retrieve.
+    :param offset: The number of items to skip from the start of the query result.
+    :return: A dictionary with the QIDs of the items as keys (the values are always True).
+    :rtype: dict[str, bool]
+    """
+    query = """
+    select distinct ?item where {
+        { ?item wdt:P279+ wd:""" + class_qid + """ . } union
+        { ?item wdt:P31/wdt:P279+ wd:""" + class_qid + """ . }
+    } ORDER BY ?item LIMIT """ + str(limit) + """ OFFSET """ + str(offset) + """
+    """
+
+    try:
+        data = wbi_helpers.execute_sparql_query(query=query, endpoint="https://query-main.wikidata.org/sparql")
+    except Exception as e:
+        log_with_date_time('get class members Exception: ' + str(e))
+        raise Exception(str(e))
+
+    members: dict[str, bool] = {}
+    for row in data['results']['bindings']:
+        members[row['item']['value'].replace('http://www.wikidata.org/entity/', '')] = True
+    return members
+
+
+def get_occupation_classes(limit: Union[int, None] = None, offset: Union[int, None] = None) -> dict[str, bool]:
+    """
+    Retrieves the subclasses and instances of occupation (``Config.class_occupation``), see ``get_class_members``.
+
+    :param limit: The maximum number of items to retrieve.
+    :param offset: The number of items to skip from the start of the query result.
+    :return: A dictionary with the QIDs of the items as keys.
+    :rtype: dict[str, bool]
+    """
+    return get_class_members(Config.class_occupation, limit, offset)
+
+
+def get_all_deprecated_nkcr(limit: Union[int, None] = None, offset: Union[int, None] = None) -> dict[str, bool]:
+    """
+    Retrieves the (item, NK ČR ID) pairs of deprecated P691 claims. The result is ordered, so the
+    pages of ``load_sparql_query_by_chunks`` neither skip nor repeat pairs.
+
+    :param limit: The maximum number of pairs to retrieve.
+    :param offset: The number of pairs to skip from the start of the query result.
+    :return: A dictionary with ``nkcr|qid`` keys (the values are always True), see ``split_deprecated_nkcr``.
+    :rtype: dict[str, bool]
+    """
+    query = """
+    select ?item ?nkcr where {
+        ?item p:P691 [ps:P691 ?nkcr ; wikibase:rank wikibase:DeprecatedRank ] .
+    } ORDER BY ?nkcr ?item LIMIT """ + str(limit) + """ OFFSET """ + str(offset) + """
+    """
+
+    try:
+        data = wbi_helpers.execute_sparql_query(query=query, endpoint="https://query-main.wikidata.org/sparql")
+    except Exception as e:
+        log_with_date_time('get deprecated nkcr Exception: ' + str(e))
+        raise Exception(str(e))
+
+    pairs: dict[str, bool] = {}
+    for row in data['results']['bindings']:
+        qid = row['item']['value'].replace('http://www.wikidata.org/entity/', '')
+        pairs[row['nkcr']['value'] + '|' + qid] = True
+    return pairs
+
+
+def split_deprecated_nkcr(pairs) -> list[tuple[str, str]]:
+    """
+    Converts the keys returned by ``get_all_deprecated_nkcr`` to (NK ČR ID, QID) pairs.
+
+    :param pairs: An iterable of ``nkcr|qid`` keys.
+    :return: The pairs.
+    :rtype: list[tuple[str, str]]
+    """
+    return [tuple(pair.rsplit('|', 1)) for pair in pairs]
+
+
+def qid_numbers(qids) -> set[int]:
+    """
+    Converts QIDs to their numeric IDs (``Q42`` -> 42), skipping anything that is not a QID.
+
+    :param qids: An iterable of QIDs.
+    :return: The numeric IDs.
+    :rtype: set[int]
+    """
+    return {int(qid[1:]) for qid in qids if type(qid) is str and qid.startswith('Q') and qid[1:].isdigit()}
+
+
 def _fetch_non_deprecated_sparql(query: str, optional_fields: list[str],
                                  entity_fields: list[str], log_label: str) -> dict:
     """
@@ -466,43 +635,18 @@ def get_claim_from_item_by_property_wbi(datas: ItemEntity, property_of_item: Any
     :type property_of_item: Any
     :return: A list of extracted claim values from the ItemEntity, processed based on their datatype. For EXTERNALID
         and TIME datatypes, specific processing is applied. For TIME datatype, when a single property is provided, the
-        property is included in the returned result.
+        property is included in the returned result. The values come from the claim index of the item, built
+        once per item.
     :rtype: list
     """
+    index = get_claim_index(datas)
     if type(property_of_item) is list:
         claims_from_data = []
         for prop in property_of_item:
-            try:
-                claims_by_property = datas.claims.get(prop)
-            except KeyError:
-                pass
-            for claim in claims_by_property:
-                if claim.mainsnak.datatype == WikibaseDatatype.EXTERNALID.value:
-                    claims_from_data.append(claim.mainsnak.datavalue['value'])
-                elif claim.mainsnak.datatype == WikibaseDatatype.TIME.value:
-                    value: dict = claim.mainsnak.datavalue['value']
-                    claims_from_data.append(value)
-                else:
-                    claims_from_data.append(claim.mainsnak.datavalue['value']['id'])
-
+            claims_from_data.extend(index.values(prop))
         return claims_from_data
     else:
-        claims_from_data = []
-        try:
-            claims_by_property = datas.claims.get(property_of_item)
-        except KeyError:
-            return []
-        for claim in claims_by_property:
-            if claim.mainsnak.datatype == WikibaseDatatype.EXTERNALID.value:
-                claims_from_data.append(claim.mainsnak.datavalue['value'])
-            elif claim.mainsnak.datatype == WikibaseDatatype.TIME.value:
-                value: dict = claim.mainsnak.datavalue['value']
-                value.update({'property': property_of_item})
-                claims_from_data.append(value)
-            else:
-                claims_from_data.append(claim.mainsnak.datavalue['value']['id'])
-
-        return claims_from_data
+        return index.values(property_of_item)
 
 def is_item_subclass_of_wbi(item_qid: str, subclass_qid: str, context: 'PipelineContext'):
     """
@@ -510,7 +654,9 @@ def is_item_subclass_of_wbi(item_qid: str, subclass_qid: str, context: 'Pipeline
     The function checks if the given `item_qid` is either a direct or indirect subclass
     of the given `subclass_qid`. The relationship can be through multiple levels within
     the Wikidata property hierarchy. A cache mechanism is utilized to enhance performance
-    by storing previous results in the context.
+    by storing previous results in the context. Items covered by a class closure precomputed by
+    the Loader (``get_class_members``) or by the local class hierarchy (``class_hierarchy``) are
+    looked up in memory without a query. With ``context.offline`` nothing else is queried.
 
     :param item_qid: The QID of the item being checked (e.g., "Q42" for Douglas Adams).
     :type item_qid: str
@@ -519,28 +665,28 @@ def is_item_subclass_of_wbi(item_qid: str, subclass_qid: str, context: 'Pipeline
     :param context: Pipeline context containing the subclass cache.
     :return: `True` if `item_qid` is a subclass of `subclass_qid`, otherwise `False`.
     :rtype: bool
+    :raises MissingEntityException: If the result is not known locally and the context is offline.
     """
+    in_closure = context.get_class_closure_result(subclass_qid, item_qid)
+    if in_closure is not None:
+        return in_closure
+
+    in_hierarchy = context.get_class_hierarchy_result(subclass_qid, item_qid)
+    if in_hierarchy is not None:
+        return in_hierarchy
+
     cached = context.get_cached_subclass_result(subclass_qid, item_qid)
     if cached is not None:
         return cached
+    if context.offline:
+        raise MissingEntityException('subclass check not cached: ' + item_qid + ' ' + subclass_qid)
 
     query_first = """
         select distinct ?item where  {
             values ?item {wd:""" + item_qid + """}
 
-            {?item wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-
-            {?item wdt:P31/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P31/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P31/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P31/wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P31/wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .} union
-            {?item wdt:P31/wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279/wdt:P279 wd:""" + subclass_qid + """ .}
+            {?item wdt:P279+ wd:""" + subclass_qid + """ .} union
+            {?item wdt:P31/wdt:P279+ wd:""" + subclass_qid + """ .}
         }
     """
 
@@ -551,6 +697,82 @@ def is_item_subclass_of_wbi(item_qid: str, subclass_qid: str, context: 'Pipeline
     return is_subclass
 
 
+def resolve_subclasses_of_wbi(item_qids, subclass_qid: str, context: 'PipelineContext', batch_size: int = 200) -> int:
+    """
+    Resolves subclass checks of many items with batched ``VALUES`` queries and stores the results in the
+    subclass cache, so ``is_item_subclass_of_wbi`` answers them without a query per item. Items covered by
+    the class closure or already cached are skipped. A failed batch is left to ``is_item_subclass_of_wbi``.
+
+    :param item_qids: The QIDs of the items to check.
+    :param subclass_qid: The QID of the potential superclass.
+    :type subclass_qid: str
+    :param context: Pipeline context containing the subclass cache.
+    :param batch_size: Number of items checked in one query.
+    :type batch_size: int
+    :return: Number of items resolved by the queries.
+    :rtype: int
+    """
+    unknown = []
+    for item_qid in dict.fromkeys(item_qids):
+        if type(item_qid) is not str or not item_qid.startswith('Q') or not item_qid[1:].isdigit():
+            continue
+        if context.get_class_closure_result(subclass_qid, item_qid) is not None:
+            continue
+        if context.get_class_hierarchy_result(subclass_qid, item_qid) is not None:
+            continue
+        if context.get_cached_subclass_result(subclass_qid, item_qid) is not None:
+            continue
+        unknown.append(item_qid)
+
+    resolved = 0
+    for start in range(0, len(unknown), batch_size):
+        batch = unknown[start:start + batch_size]
+        query = """
+        select distinct ?item where {
+            values ?item { wd:""" + ' wd:'.join(batch) + """ }
+            { ?item wdt:P279+ wd:""" + subclass_qid + """ . } union
+            { ?item wdt:P31/wdt:P279+ wd:""" + subclass_qid + """ . }
+        }
+        """
+        try:
+            data = wbi_helpers.execute_sparql_query(query=query)
+        except Exception as e:
+            log_with_date_time('resolve subclasses Exception: ' + str(e))
+            continue
+        subclasses = {row['item']['value'].replace('http://www.wikidata.org/entity/', '')
+                      for row in data['results']['bindings']}
+        for item_qid in batch:
+            context.cache_subclass_result(subclass_qid, item_qid, item_qid in subclasses)
+        resolved += len(batch)
+    return resolved
+
+
+def get_last_revisions(qids: list[str], batch_size: int = 50) -> dict[str, int]:
+    """
+    Fetches the current revision ids of items with batched ``prop=info`` queries.
+
+    This is much cheaper than downloading the entities and is used to find out whether
+    an item changed since it was last checked.
+
+    :param qids: The QIDs of the items.
+    :type qids: list[str]
+    :param batch_size: Number of titles sent in one API request (50 is the API limit for non-bots).
+    :type batch_size: int
+    :return: A dictionary mapping QIDs to their last revision id. Missing items are omitted.
+    :rtype: dict[str, int]
+    """
+    revisions: dict[str, int] = {}
+    for start in range(0, len(qids), batch_size):
+        batch = qids[start:start + batch_size]
+        data = wbi_helpers.mediawiki_api_call_helper(
+            data={'action': 'query', 'prop': 'info', 'titles': '|'.join(batch)},
+            allow_anonymous=True)
+        for page in data.get('query', {}).get('pages', {}).values():
+            if 'lastrevid' in page:
+                revisions[page['title']] = page['lastrevid']
+    return revisions
+
+
 def log_with_date_time(message: str = ''):
     """
     Logs a message with the current date and time stamp.
@@ -713,6 +935,64 @@ def get_bot_password(filename):
         first_line = file.readline()
     return first_line
 
+NAME_PATTERN = re.compile(r"(.*),\W+([\w‘ \.]*)(,*)", re.IGNORECASE)
+
+
+def split_name(name) -> tuple[Union[str, None], Union[str, None]]:
+    """
+    Splits an NK ČR name (``Surname, Given names``) into the first and last name with one match of
+    ``NAME_PATTERN``. Names without a comma fall back to their last and first word.
+
+    :param name: The full name (100a).
+    :type name: str
+    :return: The first name and the last name, (None, None) if the name is not a string.
+    :rtype: tuple[Union[str, None], Union[str, None]]
+    """
+    if not isinstance(name, str):
+        return None, None
+    match = NAME_PATTERN.search(name)
+    if match is not None:
+        return match.group(2), match.group(1)
+    splits = name.replace(',', '').split(' ')
+    return splits[-1], splits[0]
+
+
+def cs_label(name) -> Union[str, None]:
+    """
+    Returns the cs label (``Given names Surname``) built from an NK ČR name.
+
+    :param name: The full name (100a).
+    :type name: str
+    :return: The label, or None if the name is not a string.
+    :rtype: Union[str, None]
+    """
+    first, last = split_name(name)
+    if first is None:
+        return None
+    return first + ' ' + last
+
+
+def cs_labels(names: pandas.Series) -> pandas.Series:
+    """
+    Builds the cs labels of a whole column of names at once, the same way as ``cs_label``.
+
+    :param names: The 100a column of a chunk (empty cells are empty strings).
+    :type names: pandas.Series
+    :return: The labels with the index of the column (None for values that are not strings).
+    :rtype: pandas.Series
+    """
+    # object dtype keeps the matching on the re module (\w is Unicode-aware)
+    names = pandas.Series(names.to_numpy(dtype=object), index=names.index, dtype=object)
+    is_string = names.map(lambda name: isinstance(name, str)).astype(bool)
+    names = names.where(is_string, '')
+    parts = names.str.extract(NAME_PATTERN)
+    splits = names.str.replace(',', '', regex=False).str.split(' ')
+    matched = parts[0].notna()
+    first = parts[1].where(matched, splits.str[-1])
+    last = parts[0].where(matched, splits.str[0])
+    return (first + ' ' + last).where(is_string, None)
+
+
 def first_name(name):
     """
     Extracts and returns the first name from a given string. The function parses the input string
@@ -725,27 +1005,9 @@ def first_name(name):
         parsing fails.
     :rtype: Optional[str]
     """
-    try:
-        assert isinstance(name, str)
-        splits = name.replace(',','').split(' ')
-        length = len(splits)
-        ret = splits[len(splits)-1]
+    first, _ = split_name(name)
+    return first
 
-        regex = r"(.*),\W+([\w‘ \.]*)(,*)"
-        matches = re.search(regex, name, re.IGNORECASE)
-        try:
-            groups = matches.groups()
-            name = groups[1]
-        except AttributeError as e:
-            name = ret
-        except ValueError as e:
-            name = ret
-    except TypeError:
-        name = None
-    except KeyError:
-        name = None
-
-    return name
 
 def last_name(name):
     """
@@ -761,24 +1023,5 @@ def last_name(name):
     :return: The last name extracted from the input string, or None if extraction fails.
     :rtype: str or None
     """
-    try:
-        assert isinstance(name, str)
-        splits = name.replace(',', '').split(' ')
-        length = len(splits)
-        ret = splits[0]
-
-        regex = r"(.*),\W+([\w‘ \.]*)(,*)"
-        matches = re.search(regex, name, re.IGNORECASE)
-        try:
-            groups = matches.groups()
-            name = groups[0]
-        except AttributeError as e:
-            name = ret
-        except ValueError as e:
-            name = ret
-    except TypeError:
-        name = None
-    except KeyError:
-        name = None
-
-    return name
\ No newline at end of file
+    _, last = split_name(name)
+    return last
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Background writer for item edits.
+
+The main loop hands finished ``ItemEntity`` edits to an ``ItemWriter``, which commits them
+in submission order from a dedicated thread, so processing of the next rows continues
+while the API round trips (and their retries) are in flight.
+"""
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Union
+
+import requests
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.wbi_exceptions import MWApiError, ModificationFailed, SaveFailed, NonExistentEntityError, \
+    MaxRetriesReachedException, MissingEntityException
+from wikibaseintegrator.wbi_login import LoginError, _Login
+
+from scheduler import WriteScheduler
+from tools import write_log
+
+log = logging.getLogger(__name__)
+
+TAGS = ['Czech-Authorities-Sync']
+
+
+@dataclass
+class WriteTask:
+    """
+    One queued edit.
+
+    Attributes:
+        item: The edited item.
+        summary: Edit summary.
+        on_written: Called with the item once it was saved (e.g. to record its new revision).
+        on_failed: Called with the item if it could not be saved.
+    """
+    item: ItemEntity
+    summary: str
+    on_written: Union[Callable[[ItemEntity], None], None] = None
+    on_failed: Union[Callable[[ItemEntity], None], None] = None
+
+
+class ItemWriter:
+    """
+    Commits item edits from a bounded queue in a dedicated thread.
+
+    ``submit()`` blocks when the queue is full, so the main loop cannot run arbitrarily far
+    ahead of the API. Failed writes are logged and reported to the edit journal.
+
+    :ivar get_login: Returns the current login of the bot.
+    :type get_login: Callable[[], _Login]
+    :ivar relogin: Logs the bot in again and returns the new login.
+    :type relogin: Callable[[], _Login]
+    :ivar scheduler: Paces the edits, if set.
+    :type scheduler: Union[WriteScheduler, None]
+    :ivar written: Number of saved items.
+    :type written: int
+    :ivar failed: Number of items that could not be saved.
+    :type failed: int
+    """
+
+    def __init__(self, get_login: Callable[[], _Login], relogin: Callable[[], _Login], queue_size: int = 100,
+                 scheduler: Union[WriteScheduler, None] = None):
+        """
+        :param get_login: Returns the current login of the bot.
+        :type get_login: Callable[[], _Login]
+        :param relogin: Logs the bot in again and returns the new login.
+        :type relogin: Callable[[], _Login]
+        :param queue_size: Maximum number of edits waiting for the writer.
+        :type queue_size: int
+        :param scheduler: Paces the edits by the lag reported by the API; without it edits
+            are sent as soon as they are queued.
+        :type scheduler: Union[WriteScheduler, None]
+        """
+        self.get_login = get_login
+        self.relogin = relogin
+        self.scheduler = scheduler
+        self.written: int = 0
+        self.failed: int = 0
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.pending: dict[str, int] = {}
+        self.pending_changed = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name='item-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, item: ItemEntity, summary: str, on_written: Union[Callable[[ItemEntity], None], None] = None,
+               on_failed: Union[Callable[[ItemEntity], None], None] = None):
+        """
+        Queues an edit of the item.
+
+        :param item: The edited item; it must not be modified after it was submitted.
+        :type item: ItemEntity
+        :param summary: Edit summary.
+        :type summary: str
+        :param on_written: Called from the writer thread with the item once it was saved.
+        :type on_written: Union[Callable[[ItemEntity], None], None]
+        :param on_failed: Called from the writer thread with the item if it could not be saved.
+        :type on_failed: Union[Callable[[ItemEntity], None], None]
+        :return: None
+        """
+        with self.pending_changed:
+            self.pending[item.id] = self.pending.get(item.id, 0) + 1
+        self.queue.put(WriteTask(item, summary, on_written, on_failed))
+
+    def wait_for(self, qid: Union[str, None]):
+        """
+        Blocks until no edit of the item is waiting, so it can be loaded again without
+        losing the queued changes.
+
+        :param qid: QID of the item.
+        :type qid: Union[str, None]
+        :return: None
+        """
+        with self.pending_changed:
+            while self.pending.get(qid, 0) > 0:
+                self.pending_changed.wait()
+
+    def flush(self):
+        """
+        Blocks until every queued edit was committed (or failed).
+
+        :return: None
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        Drains the queue and stops the writer thread.
+
+        :return: None
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                self.queue.task_done()
+                return
+            try:
+                self._commit(task)
+            finally:
+                with self.pending_changed:
+                    self.pending[task.item.id] -= 1
+                    if self.pending[task.item.id] == 0:
+                        del self.pending[task.item.id]
+                    self.pending_changed.notify_all()
+                self.queue.task_done()
+
+    def _commit(self, task: WriteTask):
+        try:
+            try:
+                self._write(task, self.get_login())
+            except MWApiError as e:
+                msg = str(e)
+                if '"bot" right' not in msg and 'permissiondenied' not in msg.lower():
+                    raise
+                log.error('MWApiError – chybí bot právo, pokus o relogin a retry: ' + msg)
+                self._write(task, self.relogin())
+            except LoginError as e:
+                log.error('LoginError: ' + str(e))
+                self._write(task, self.relogin())
+        except (MWApiError, LoginError, SaveFailed, ModificationFailed, NonExistentEntityError, MissingEntityException,
+                MaxRetriesReachedException, requests.exceptions.RequestException) as e:
+            self._report_failure(task, e)
+        except Exception as e:
+            log.exception('unexpected error while writing ' + str(task.item.id))
+            self._report_failure(task, e)
+
+    def _write(self, task: WriteTask, login: _Login):
+        if self.scheduler is None:
+            task.item.write(summary=task.summary, is_bot=True, retry_after=10, tags=TAGS, login=login)
+        else:
+            # a new login comes with a new session, the hook is added only once per session
+            self.scheduler.install(login.get_session())
+            self.scheduler.acquire()
+            task.item.write(summary=task.summary, is_bot=True, retry_after=10, tags=TAGS, login=login,
+                            maxlag=self.scheduler.maxlag)
+        self.written += 1
+        if task.on_written is not None:
+            task.on_written(task.item)
+
+    def _report_failure(self, task: WriteTask, error: Exception):
+        self.failed += 1
+        log.error('zápis selhal: ' + str(task.item.id) + ' – ' + str(error))
+        write_log({'item': task.item.id, 'prop': 'write failed', 'value': str(error)})
+        if task.on_failed is not None:
+            task.on_failed(task.item)